@@ -12,7 +12,9 @@ class ETFCompositeLoss(nn.Module):
         self.beta = beta    # Poids pour la KL divergence
         self.mse = nn.MSELoss()
         
-    def forward(self, preds, targets, vae_outputs=None, original_input=None):
+    def forward(self, preds, targets, vae_outputs=None, original_input=None, return_supervised=False):
+        """Avec return_supervised=True, retourne (loss, supervised_loss) pour
+        réutiliser le terme supervisé sans recalculer la MSE."""
         # Ensure tensors have compatible shapes
         if preds.dim() != targets.dim():
             if preds.dim() == 2 and targets.dim() == 1:
@@ -43,6 +45,7 @@ class ETFCompositeLoss(nn.Module):
         recon_loss = F.mse_loss(recon_x, original_input, reduction='mean')
         kld_loss = -0.5 * torch.sum(1 + logvar - mu.pow(2) - logvar.exp())
         
-        return (self.alpha * supervised_loss + 
+        loss = (self.alpha * supervised_loss + 
                 (1-self.alpha) * recon_loss + 
-                self.beta * kld_loss)
\ No newline at end of file
+                self.beta * kld_loss)
+        return (loss, supervised_loss) if return_supervised else loss
\ No newline at end of file
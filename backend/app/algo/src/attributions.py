@@ -0,0 +1,128 @@
+"""
+Attributions par gradient du modèle de notation (alternative rapide à SHAP DeepExplainer)
+"""
+
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+
+from embedding_cache import model_fingerprint
+
+logger = logging.getLogger(__name__)
+
+ATTRIBUTION_METHODS = ('gradient_x_input', 'integrated_gradients')
+
+
+def _input_gradients(model: nn.Module, inputs: torch.Tensor) -> torch.Tensor:
+    """Gradient de la sortie scalaire par rapport à chaque ligne (un seul backward)"""
+    inputs = inputs.detach().requires_grad_(True)
+    model(inputs).sum().backward()
+    return inputs.grad
+
+
+def compute_attributions(model: nn.Module, features: torch.Tensor, method: str = 'integrated_gradients',
+                         baseline: Optional[torch.Tensor] = None, steps: int = 32,
+                         batch_size: int = 16384) -> np.ndarray:
+    """Attributions [N, F] des features au score de chaque ETF.
+
+    Args:
+        model: Modèle dont la sortie est un score [N, 1] (ETFSemiSupervisedModel)
+        features: Features [N, F]
+        method: 'gradient_x_input' (un passage) ou 'integrated_gradients'
+            (steps interpolations évaluées dans le même passage batché)
+        baseline: Référence [F] ou [N, F] des gradients intégrés (moyenne des features
+            par défaut, comme le fond de SHAP; zéro est dégénéré avec LayerNorm)
+        steps: Nombre de points de la règle des trapèzes (au moins 2)
+        batch_size: Lignes (interpolations comprises) par passage autograd
+    """
+    if method not in ATTRIBUTION_METHODS:
+        raise ValueError(f"Méthode d'attribution inconnue: {method} (attendu: {ATTRIBUTION_METHODS})")
+    if method == 'integrated_gradients' and steps < 2:
+        raise ValueError(f"steps doit valoir au moins 2 pour les gradients intégrés, reçu {steps}")
+
+    device = next(model.parameters()).device
+    features = features.detach().to(device, torch.float32)
+    baseline = features.mean(dim=0) if baseline is None else baseline.to(device, torch.float32)
+    baseline = baseline.expand_as(features)
+
+    was_training = model.training
+    model.eval()
+    try:
+        # Paramètres figés: seuls les gradients d'entrée sont calculés
+        requires_grad = [p.requires_grad for p in model.parameters()]
+        for p in model.parameters():
+            p.requires_grad_(False)
+
+        if method == 'gradient_x_input':
+            grads = torch.cat([_input_gradients(model, chunk) for chunk in features.split(batch_size)])
+            return (grads * features).cpu().numpy()
+
+        # Gradients intégrés: chemins [N, steps, F] aplatis, moyenne trapézoïdale des gradients
+        alphas = torch.linspace(0.0, 1.0, steps, device=device).view(1, -1, 1)
+        weights = torch.full((steps,), 1.0 / (steps - 1), device=device)
+        weights[[0, -1]] /= 2
+        rows_per_pass = max(1, batch_size // steps)
+
+        attributions = []
+        for x, x0 in zip(features.split(rows_per_pass), baseline.split(rows_per_pass)):
+            delta = x - x0
+            path = (x0.unsqueeze(1) + alphas * delta.unsqueeze(1)).reshape(-1, x.shape[1])
+            grads = _input_gradients(model, path).view(x.shape[0], steps, -1)
+            attributions.append(delta * torch.einsum('nsf,s->nf', grads, weights))
+        return torch.cat(attributions).cpu().numpy()
+    finally:
+        for p, flag in zip(model.parameters(), requires_grad):
+            p.requires_grad_(flag)
+        model.train(was_training)
+
+
+def top_k_features(attributions: np.ndarray, k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices [N, k] des k contributions les plus positives et les plus négatives par ligne,
+    triées par amplitude (np.argpartition sur toute la matrice, sans boucle par ligne)"""
+    k = min(k, attributions.shape[1])
+    rows = np.arange(attributions.shape[0])[:, None]
+
+    top_pos = np.argpartition(-attributions, k - 1, axis=1)[:, :k]
+    top_pos = top_pos[rows, np.argsort(-attributions[rows, top_pos], axis=1)]
+    top_neg = np.argpartition(attributions, k - 1, axis=1)[:, :k]
+    top_neg = top_neg[rows, np.argsort(attributions[rows, top_neg], axis=1)]
+    return top_pos, top_neg
+
+
+class ETFAttributionCache:
+    """Matrices d'attributions précalculées, clé (version du modèle, méthode, features).
+
+    Tant que les poids et les features ne changent pas, une explication se réduit
+    à une lecture de lignes.
+    """
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max(1, max_entries)
+        self._entries: Dict[Tuple[str, str, int], pd.DataFrame] = {}
+
+    def key(self, model: nn.Module, features: pd.DataFrame, method: str) -> Tuple[str, str, int]:
+        features_hash = int(pd.util.hash_pandas_object(features, index=True).sum())
+        return model_fingerprint(model), method, features_hash
+
+    def get_or_compute(self, model: nn.Module, features: pd.DataFrame,
+                       method: str = 'integrated_gradients', **kwargs) -> pd.DataFrame:
+        """Attributions (index et colonnes de features), calculées uniquement si absentes"""
+        key = self.key(model, features, method)
+        if key in self._entries:
+            return self._entries[key]
+
+        logger.info(f"Attribution cache miss, computing {method} for {len(features)} ETFs")
+        values = compute_attributions(model, torch.from_numpy(features.to_numpy(np.float32, copy=True)), method=method, **kwargs)
+        attributions = pd.DataFrame(values, index=features.index, columns=features.columns)
+
+        if len(self._entries) >= self.max_entries:
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = attributions
+        return attributions
+
+    def invalidate(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,255 @@
+"""
+Backtest walk-forward du moteur de notation: folds entraînés en parallèle et
+évalués contre les rendements futurs de l'historique de prix
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import torch
+
+from config import BACKTEST
+from memory_optimizer import available_cpu_cores, configure_cpu_threads
+
+logger = logging.getLogger(__name__)
+
+
+def forward_returns(prices: pd.DataFrame, dates: pd.DatetimeIndex, horizon_days: int) -> pd.DataFrame:
+    """Rendements futurs [dates, ETFs] sur horizon_days observations de prix.
+
+    Le prix de départ est le dernier connu à chaque date (asof); les rendements dont
+    la fin dépasse l'historique sont NaN. L'attribut attrs['end_dates'] donne la date
+    de fin de chaque fenêtre (embargo des folds).
+    """
+    prices = prices.sort_index().ffill()
+    start = prices.index.searchsorted(dates, side='right') - 1
+    end = start + horizon_days
+    valid = (start >= 0) & (end < len(prices))
+
+    values = prices.to_numpy(dtype=np.float64)
+    returns = np.full((len(dates), prices.shape[1]), np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[valid] = values[end[valid]] / values[start[valid]] - 1
+
+    result = pd.DataFrame(returns, index=dates, columns=prices.columns)
+    result.attrs['end_dates'] = pd.Series(
+        [prices.index[e] if ok else pd.NaT for e, ok in zip(end, valid)], index=dates)
+    return result
+
+
+def walk_forward_folds(dates: pd.DatetimeIndex, end_dates: pd.Series, train_dates: int, test_dates: int,
+                       expanding: bool = False) -> List[Dict]:
+    """Découpage walk-forward: chaque fold teste test_dates dates consécutives et
+    s'entraîne sur les dates précédentes dont le rendement futur est connu avant le
+    début du test (pas de fuite de l'horizon).
+
+    Fenêtre glissante: exactement les train_dates dernières de ces dates. Fenêtre
+    croissante (expanding): toutes ces dates, à partir du premier fold qui en compte
+    au moins train_dates.
+    """
+    dates = pd.DatetimeIndex(sorted(dates))
+    folds = []
+    for test_start in range(1, len(dates), test_dates):
+        test = dates[test_start:test_start + test_dates]
+        known = [d for d in dates[:test_start] if pd.notna(end_dates[d]) and end_dates[d] <= test[0]]
+        train = known if expanding else known[-train_dates:]
+        if len(train) >= train_dates:
+            folds.append({'fold': len(folds), 'train': list(train), 'test': list(test)})
+    return folds
+
+
+class FoldPreprocessor:
+    """Prétraitement ajusté sur l'entraînement d'un fold: médianes (valeurs manquantes)
+    puis centrage-réduction, appliqués tels quels aux dates de test"""
+
+    def fit(self, X: np.ndarray) -> 'FoldPreprocessor':
+        self.medians = np.nan_to_num(np.nanmedian(X, axis=0))
+        filled = np.where(np.isnan(X), self.medians, X)
+        self.center = filled.mean(axis=0)
+        self.scale = np.where(filled.std(axis=0) > 1e-12, filled.std(axis=0), 1.0)
+        return self
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        return ((np.where(np.isnan(X), self.medians, X) - self.center) / self.scale).astype(np.float32)
+
+
+def rank_targets(returns: pd.DataFrame) -> pd.DataFrame:
+    """Cibles d'entraînement: rang centile des rendements futurs à chaque date (dans [0, 1])"""
+    return returns.rank(axis=1, pct=True)
+
+
+def fold_metrics(scores: pd.DataFrame, returns: pd.DataFrame, top_fraction: float = 0.2) -> Dict:
+    """Rank IC, taux de réussite et rotation moyens sur les dates de test.
+
+    - rank IC: corrélation de Spearman scores / rendements futurs
+    - hit rate: part des ETFs du bon côté de la médiane (score et rendement)
+    - turnover: part renouvelée du top top_fraction d'une date de test à la suivante
+    """
+    ics, hits, turnovers = [], [], []
+    previous_top = None
+    for date in scores.index:
+        valid = scores.loc[date].notna() & returns.loc[date].notna()
+        score, ret = scores.loc[date][valid], returns.loc[date][valid]
+        if len(score) < 2:
+            continue
+        ics.append(score.rank().corr(ret.rank()))
+        hits.append(float(((score > score.median()) == (ret > ret.median())).mean()))
+
+        top = set(score.nlargest(max(1, int(round(len(score) * top_fraction)))).index)
+        if previous_top is not None:
+            turnovers.append(1 - len(top & previous_top) / len(top))
+        previous_top = top
+    return {
+        'rank_ic': float(np.nanmean(ics)) if ics else float('nan'),
+        'hit_rate': float(np.mean(hits)) if hits else float('nan'),
+        'turnover': float(np.mean(turnovers)) if turnovers else float('nan'),
+        'num_test_dates': len(ics)
+    }
+
+
+def _fold_key(fold: Dict, features: pd.DataFrame, returns: pd.DataFrame) -> str:
+    """Clé de cache du prétraitement: dates du fold et contenu des données utilisées"""
+    digest = hashlib.blake2b(digest_size=16)
+    dates = fold['train'] + fold['test']
+    digest.update(repr([str(d) for d in dates]).encode())
+    digest.update(repr(list(features.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(features.loc[dates], index=True).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(returns.loc[fold['train']], index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _prepare_fold(fold: Dict, features: pd.DataFrame, returns: pd.DataFrame,
+                  cache_dir: Optional[str]) -> Dict:
+    """Matrices d'entraînement/test prétraitées du fold (lues depuis le cache si présentes)"""
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, f"fold_{_fold_key(fold, features, returns)}.npz")
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                return {name: cached[name] for name in cached.files}
+
+    train = features.loc[fold['train']]
+    targets = rank_targets(returns.loc[fold['train']]).stack(future_stack=True).reindex(train.index)
+    keep = targets.notna().to_numpy()
+
+    preprocessor = FoldPreprocessor().fit(train.to_numpy(dtype=np.float64)[keep])
+    prepared = {
+        'X_train': preprocessor.transform(train.to_numpy(dtype=np.float64)[keep]),
+        'y_train': targets.to_numpy(dtype=np.float32)[keep],
+        'X_test': preprocessor.transform(features.loc[fold['test']].to_numpy(dtype=np.float64))
+    }
+    if cache_path:
+        tmp_path = f"{cache_path}.tmp.npz"
+        np.savez(tmp_path, **prepared)
+        os.replace(tmp_path, cache_path)
+    return prepared
+
+
+def _run_fold(config: Dict, fold: Dict, prepared: Dict, test_index: pd.MultiIndex, test_returns: pd.DataFrame,
+              epochs: int, seed: int, num_threads: int, top_fraction: float) -> Dict:
+    """Corps d'un processus: entraîne un moteur sur le fold puis note les dates de test"""
+    from rating_model import ETFScoringEngine
+
+    torch.manual_seed(seed + fold['fold'])
+    # Cœurs partagés entre les processus: pas de sursouscription des pools de threads
+    configure_cpu_threads(num_threads, 1)
+    engine = ETFScoringEngine({**config, 'checkpoint_path': None})
+
+    X_train = pd.DataFrame(prepared['X_train'])
+    training = engine.train(X=X_train, y=pd.Series(prepared['y_train']), epochs=epochs)
+
+    engine.semi_supervised_model.eval()
+    with torch.no_grad():
+        raw = engine.semi_supervised_model(torch.from_numpy(prepared['X_test']).to(engine.device))
+    scores = pd.Series(raw.cpu().numpy().reshape(-1), index=test_index).unstack()
+
+    return {
+        'fold': fold['fold'],
+        'train_start': fold['train'][0], 'train_end': fold['train'][-1],
+        'test_start': fold['test'][0], 'test_end': fold['test'][-1],
+        'num_train_samples': len(X_train),
+        'val_loss': training.get('val_loss'),
+        **fold_metrics(scores, test_returns.reindex(index=scores.index, columns=scores.columns), top_fraction)
+    }
+
+
+class WalkForwardBacktest:
+    """Backtest walk-forward du modèle semi-supervisé d'ETFScoringEngine, un fold par processus.
+
+    Périmètre réduit: les features sont fournies déjà construites, chaque fold les
+    prétraite avec FoldPreprocessor (médianes et centrage-réduction ajustés sur son
+    entraînement) et note les dates de test avec la sortie brute du modèle. Ni le
+    DataPipeline du moteur, ni le GNN, ni la notation ETFScoring (cache d'embeddings,
+    agrégation des scores) ne sont évalués.
+    """
+
+    def __init__(self, config: Dict, horizon_days: int = 20, train_dates: int = 12, test_dates: int = 3,
+                 expanding: bool = False, epochs: int = 30, top_fraction: float = 0.2,
+                 max_workers: Optional[int] = None, cache_dir: Optional[str] = BACKTEST['cache_dir'], seed: int = 0):
+        """
+        Args:
+            config: Configuration du moteur (build_engine_config)
+            horizon_days: Horizon des rendements futurs (en observations de prix)
+            train_dates / test_dates: Dates de notation par fenêtre d'entraînement / de test
+            expanding: Fenêtre d'entraînement croissante au lieu de glissante
+            epochs: Époques d'entraînement par fold
+            top_fraction: Part des ETFs du portefeuille top pour la rotation
+            max_workers: Processus parallèles (défaut: cœurs physiques, au plus le nombre de folds)
+            cache_dir: Cache disque du prétraitement par fold (None = désactivé)
+        """
+        self.config = config
+        self.horizon_days = horizon_days
+        self.train_dates = train_dates
+        self.test_dates = test_dates
+        self.expanding = expanding
+        self.epochs = epochs
+        self.top_fraction = top_fraction
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.seed = seed
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def run(self, features: pd.DataFrame, prices: pd.DataFrame) -> pd.DataFrame:
+        """Exécute tous les folds.
+
+        Args:
+            features: Features du modèle indexées par (date, ETF), une ligne par ETF et par date de notation,
+                avant normalisation (le prétraitement est ajusté par fold)
+            prices: Historique de prix ou de NAV [dates, ETFs] (colonnes = identifiants du second niveau)
+
+        Returns:
+            Une ligne par fold: dates, rank_ic, hit_rate, turnover, num_test_dates, val_loss
+        """
+        features = features.sort_index()
+        dates = features.index.get_level_values(0).unique()
+        etfs = features.index.get_level_values(1).unique()
+        returns = forward_returns(prices.reindex(columns=etfs), dates, self.horizon_days)
+        folds = walk_forward_folds(dates, returns.attrs['end_dates'], self.train_dates, self.test_dates,
+                                   self.expanding)
+        if not folds:
+            raise ValueError("Historique insuffisant pour former un fold walk-forward")
+
+        cores = available_cpu_cores()
+        workers = self.max_workers or max(1, min(len(folds), cores))
+        num_threads = max(1, cores // workers)
+        logger.info(f"Walk-forward backtest: {len(folds)} folds on {workers} processes")
+
+        # spawn: pas d'état torch hérité du parent; chaque fold ne reçoit que ses propres données
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = []
+            for fold in folds:
+                prepared = _prepare_fold(fold, features, returns, self.cache_dir)
+                test_index = features.loc[fold['test']].index
+                futures.append(pool.submit(
+                    _run_fold, self.config, fold, prepared, test_index, returns.loc[fold['test']],
+                    self.epochs, self.seed, num_threads, self.top_fraction))
+            results = [future.result() for future in futures]
+
+        return pd.DataFrame(results).sort_values('fold').reset_index(drop=True)
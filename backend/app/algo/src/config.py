@@ -2,6 +2,13 @@
 Configuration centrale du système
 """
 
+import os
+
+# Répertoire de base des artefacts générés (caches, registre de modèles, profils, backtests).
+# Chemin absolu, indépendant du répertoire courant du processus; surcharge: ETF_CACHE_DIR
+CACHE_DIR = os.path.abspath(os.path.expanduser(
+    os.environ.get('ETF_CACHE_DIR') or os.path.join('~', '.cache', 'zoometf')))
+
 # Catégories d'ETFs
 DEFAULT_ETF_CATEGORIES = [
     'Equity', 'Fixed Income', 'Commodity', 
@@ -42,7 +49,22 @@ MODEL_CONFIG = {
     'alpha': 0.7,
     'beta': 0.3,
     'batch_size': 64,
-    'gnn_output_dim': 32
+    'compile_model': False,  # torch.compile du forward d'entraînement semi-supervisé
+    # Validation, early stopping et checkpoint du meilleur modèle
+    'validation_split': 0.2,
+    'early_stopping_patience': 5,
+    'early_stopping_min_delta': 1e-4,
+    'lr_scheduler_factor': 0.5,  # ReduceLROnPlateau sur la perte de validation
+    'lr_scheduler_patience': 2,
+    'checkpoint_path': None,  # chemin de sauvegarde du meilleur état (None = en mémoire uniquement)
+    'gnn_output_dim': 32,
+    # Entraînement GNN par mini-batchs (au-delà de gnn_minibatch_min_nodes nœuds)
+    'gnn_minibatch_min_nodes': 50000,
+    'gnn_batch_size': 512,  # ETFs graines par mini-batch
+    'gnn_fan_out': [10, 5],  # voisins échantillonnés par saut
+    # Les arêtes vont ETF -> actif: sans parcours inverse, une graine ETF n'a aucun voisin
+    'gnn_sample_undirected': True,
+    'gnn_epochs': 1
 }
 
 
@@ -114,10 +136,61 @@ STRESS_SCENARIOS = [
     {
         'name': 'Interest Rate Hike', 
         'type': 'rate_increase', 
-        'increase': 0.02  # +2% de taux
+        'increase': 0.02,  # +2% de taux
+        'duration': 6.0  # duration du facteur obligataire (agg): rendement = -duration × hausse
     }
 ]
 
+
+# Stress Monte Carlo / rejeu historique (distribution des scores par ETF)
+MONTE_CARLO_STRESS = {
+    'enabled': False,  # calcul nocturne: coûteux pour une analyse interactive
+    'method': 'monte_carlo',  # 'monte_carlo' ou 'historical'
+    'num_scenarios': 2000,
+    'horizon_days': 10,
+    'chunk_size': 250,  # scénarios notés par passage forward
+    'quantiles': [0.01, 0.05, 0.5],
+    'degrees_of_freedom': 5,  # queues de Student-t (None = gaussien)
+    'seed': 0,
+    # Facteurs de marché de riskAnalysis.correlations
+    'factors': ['spx', 'agg', 'gld'],
+    'factor_volatilities': [0.18, 0.06, 0.15],  # annualisées
+    'factor_correlations': [
+        [1.0, 0.1, 0.05],
+        [0.1, 1.0, 0.3],
+        [0.05, 0.3, 1.0]
+    ],
+    # Réponse linéaire des colonnes au rendement simulé (en écarts-types de la colonne
+    # par écart-type de rendement de référence)
+    'column_sensitivities': {
+        'riskAnalysis.volatility.30d': -0.5,
+        'riskAnalysis.drawdowns.maxDrawdown': 0.5,
+        'alternativeData.flows.30dNetFlow': 0.3
+    }
+}
+
+# Profilage des étapes de run_full_analysis (profiling.PipelineProfiler)
+# Activable sans changer la configuration: ETF_PROFILE=1
+PROFILING = {
+    'enabled': False,
+    'output_dir': os.path.join(CACHE_DIR, 'profiles'),  # un sous-dossier par exécution (stages.json, stacks.folded)
+    'sample_interval': 0.005,  # secondes entre deux échantillons de pile
+    'torch_profiler': False  # trace Chrome torch.profiler en plus (coûteux)
+}
+
+# Backtest walk-forward (backtesting.WalkForwardBacktest)
+BACKTEST = {
+    'horizon_days': 20,        # horizon des rendements futurs (observations de prix)
+    'train_dates': 12,         # dates de notation par fenêtre d'entraînement
+    'test_dates': 3,           # dates de notation par fold de test
+    'expanding': False,        # fenêtre d'entraînement croissante
+    'epochs': 30,
+    'top_fraction': 0.2,       # portefeuille top pour la rotation
+    'max_workers': None,       # None = cœurs physiques
+    'cache_dir': os.path.join(CACHE_DIR, 'backtest'),
+    'seed': 0
+}
+
 #colonne  requis pour la configuration du système
 REQUIRED_COLUMNS = [
     # Données de coûts
@@ -163,10 +236,27 @@ REQUIRED_COLUMNS = [
 ADVANCED_SETTINGS = {
     'memory_safety_factor': 0.7,
     'shap_background_size': 50,
+    'embedding_cache_dir': os.path.join(CACHE_DIR, 'etf_embeddings'),  # embeddings GNN des ETFs (float32 mappés en mémoire)
+    'model_registry_dir': os.path.join(CACHE_DIR, 'model_registry'),  # versions de modèles (model_registry.ModelRegistry)
+    'attribution_method': 'integrated_gradients',  # 'integrated_gradients', 'gradient_x_input' ou 'shap'
+    'explanation_top_k': 3,  # contributions positives/négatives retournées par ETF
+    'monitor_capacity': 1024,  # valeurs récentes conservées par métrique du moniteur
+    'prometheus_metrics': True,  # publication dans le registre prometheus_client (si installé)
     'max_processing_time': 30  # secondes
 }
 
 
+# Profil d'exécution CPU (pas de GPU en production)
+CPU_PROFILE = {
+    'intra_op_threads': None,  # None = un thread par cœur physique
+    'inter_op_threads': None,  # None = 2
+    'prefetch_batches': 2,  # batchs préparés d'avance par le PrefetchTensorLoader
+    'autotune_batch_size': False,  # mesure du débit au lieu de MODEL_CONFIG['batch_size']
+    'batch_size_candidates': [32, 64, 128, 256, 512],
+    'bf16_autocast': False  # autocast bfloat16 (gain si le CPU supporte AVX512-BF16/AMX)
+}
+
+
 # Flags de fonctionnalités
 FEATURE_FLAGS = {
     'USE_ALTERNATIVE_DATA': True,
@@ -213,3 +303,51 @@ COLUMN_MAPPING = {
     'fund_age_years': 'metadata.creationDate'
     # Add mappings for ter_acceptable and liquidity_acceptable if needed
 }
+
+
+def build_engine_config() -> dict:
+    """Configuration consolidée attendue par ETFScoringEngine"""
+    return {
+        # Import direct des configurations principales
+        'MODEL_CONFIG': MODEL_CONFIG,
+        'RISK_PARAMETERS': RISK_PARAMETERS,
+        'VALIDATION_THRESHOLDS': VALIDATION_THRESHOLDS,
+        'REQUIRED_COLUMNS': REQUIRED_COLUMNS,
+        'GRAPH_CONFIG': GRAPH_CONFIG,
+        'FEATURE_FLAGS': FEATURE_FLAGS,
+        'CPU_PROFILE': CPU_PROFILE,
+        
+        # Paramètres dérivés (avec valeurs par défaut si manquantes)
+        'weight_decay': MODEL_CONFIG.get('weight_decay', 1e-5),
+        'gnn_input_dim': MODEL_CONFIG.get('gnn_input_dim', len(GRAPH_CONFIG['etf_features'])),
+        
+        # Scénarios de stress (peuvent être modifiés)
+        'stress_scenarios': STRESS_SCENARIOS,
+        'alpha' : MODEL_CONFIG['alpha'],
+        'beta':MODEL_CONFIG['beta'],
+        'learning_rate':MODEL_CONFIG['learning_rate'],
+        'batch_size':MODEL_CONFIG['batch_size'],
+        'input_dim': MODEL_CONFIG['input_dim'],
+        'combined_dim': MODEL_CONFIG['combined_dim'],
+        'gnn_minibatch_min_nodes': MODEL_CONFIG['gnn_minibatch_min_nodes'],
+        'gnn_batch_size': MODEL_CONFIG['gnn_batch_size'],
+        'gnn_fan_out': MODEL_CONFIG['gnn_fan_out'],
+        'gnn_sample_undirected': MODEL_CONFIG['gnn_sample_undirected'],
+        'gnn_epochs': MODEL_CONFIG['gnn_epochs'],
+        'compile_model': MODEL_CONFIG['compile_model'],
+        'validation_split': MODEL_CONFIG['validation_split'],
+        'early_stopping_patience': MODEL_CONFIG['early_stopping_patience'],
+        'early_stopping_min_delta': MODEL_CONFIG['early_stopping_min_delta'],
+        'lr_scheduler_factor': MODEL_CONFIG['lr_scheduler_factor'],
+        'lr_scheduler_patience': MODEL_CONFIG['lr_scheduler_patience'],
+        'checkpoint_path': MODEL_CONFIG['checkpoint_path'],
+        'embedding_cache_dir': ADVANCED_SETTINGS['embedding_cache_dir'],
+        'model_registry_dir': ADVANCED_SETTINGS['model_registry_dir'],
+        'attribution_method': ADVANCED_SETTINGS['attribution_method'],
+        'explanation_top_k': ADVANCED_SETTINGS['explanation_top_k'],
+        'monitor_capacity': ADVANCED_SETTINGS['monitor_capacity'],
+        'prometheus_metrics': ADVANCED_SETTINGS['prometheus_metrics'],
+        'MONTE_CARLO_STRESS': MONTE_CARLO_STRESS,
+        'BACKTEST': BACKTEST,
+        'PROFILING': PROFILING
+    }
@@ -2,39 +2,131 @@
 Pipeline avancé de traitement des données ETFs (corrigé et optimisé)
 """
 
+from typing import Any, Dict, List, Optional
+
 import numpy as np
 import pandas as pd
-from sklearn.discriminant_analysis import StandardScaler
-from sklearn.preprocessing import QuantileTransformer, OrdinalEncoder
-from sklearn.experimental import enable_iterative_imputer
-from sklearn.impute import IterativeImputer
-from sklearn.ensemble import RandomForestRegressor
-from scipy.stats import boxcox
-from scipy.special import inv_boxcox
-from sklearn.preprocessing import PowerTransformer
+from sklearn.preprocessing import OrdinalEncoder, PowerTransformer, QuantileTransformer, StandardScaler
+
+from config import REQUIRED_COLUMNS, GRAPH_CONFIG
+
+
+# Chemins pointés extraits par défaut des ETFs bruts (identifiant + colonnes du modèle + features du graphe)
+DEFAULT_SCHEMA_PATHS = list(dict.fromkeys(
+    ['etfId'] + REQUIRED_COLUMNS + GRAPH_CONFIG['etf_features']
+))
 
 
 class ETFDataPipeline:
     
-    def __init__(self):
+    def __init__(self, schema_paths: Optional[List[str]] = None):
         self.quantile_transformer = QuantileTransformer(
             output_distribution='normal',
             n_quantiles=10 )
-        self.imputer = IterativeImputer(estimator=RandomForestRegressor(), random_state=42)
+        self._imputer = None
         self.encoder = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1)
         
         # Pour traquer les colonnes
         self.cat_cols = []
         self.num_cols = []
 
-    def process(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Pipeline principal : aplatissement, nettoyage, encodage, normalisation"""
-        df = self.flatten_nested_structures(df) 
+        # Schéma compilé une seule fois : arbre {clé: [index de colonne, sous-arbre]}
+        self.schema_paths = list(dict.fromkeys(schema_paths or DEFAULT_SCHEMA_PATHS))
+        self._schema = self._compile_schema(self.schema_paths)
+
+    @property
+    def imputer(self):
+        """IterativeImputer (forêt aléatoire), construit au premier usage: les imports
+        sklearn.experimental/ensemble sont coûteux et inutiles sans valeurs manquantes"""
+        if self._imputer is None:
+            from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+            from sklearn.impute import IterativeImputer
+            from sklearn.ensemble import RandomForestRegressor
+            self._imputer = IterativeImputer(estimator=RandomForestRegressor(), random_state=42)
+        return self._imputer
+
+    def process(self, df: pd.DataFrame, flatten: bool = True) -> pd.DataFrame:
+        """Pipeline principal : aplatissement, nettoyage, encodage, normalisation
+        Args:
+            df: Données ETFs (imbriquées ou déjà aplaties)
+            flatten: False si df provient déjà de flatten_records"""
+        if flatten:
+            df = self.flatten_nested_structures(df)
         df = self.add_temporal_features(df)
         df = self.handle_missing_and_encoding(df)
         df = self.process_numerical_features(df)
         return df
 
+    @staticmethod
+    def _compile_schema(paths: List[str]) -> Dict[str, list]:
+        """Compile les chemins pointés en arbre de clés partagé"""
+        root = {}
+        for col_idx, path in enumerate(paths):
+            node = root
+            keys = path.split('.')
+            for key in keys[:-1]:
+                node = node.setdefault(key, [None, {}])[1]
+            node.setdefault(keys[-1], [None, {}])[0] = col_idx
+        return root
+
+    def flatten_records(self, records: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Aplatissement en une seule passe des ETFs bruts selon le schéma compilé.
+
+        Chaque ETF n'est parcouru qu'une fois, uniquement le long des chemins configurés,
+        et les valeurs sont écrites directement dans des colonnes NumPy préallouées.
+        Les colonnes absentes de tous les ETFs sont omises (comme json_normalize).
+        """
+        n_rows, n_cols = len(records), len(self.schema_paths)
+        numeric = np.full((n_cols, n_rows), np.nan, dtype=np.float64)
+        seen = np.zeros(n_cols, dtype=bool)
+        integral = np.ones(n_cols, dtype=bool)
+        objects: Dict[int, np.ndarray] = {}
+
+        for row, record in enumerate(records):
+            if isinstance(record, dict):
+                self._fill_row(record, self._schema, row, numeric, seen, integral, objects)
+
+        columns = {}
+        for col_idx, path in enumerate(self.schema_paths):
+            if not seen[col_idx]:
+                continue
+            values = numeric[col_idx]
+            if col_idx in objects:
+                column = objects[col_idx]
+                fill = pd.isna(column) & ~np.isnan(values)
+                column[fill] = values[fill]
+            elif integral[col_idx] and not np.isnan(values).any():
+                column = values.astype(np.int64)
+            else:
+                column = values
+            columns[path] = column
+
+        return pd.DataFrame(columns, index=pd.RangeIndex(n_rows))
+
+    def _fill_row(self, data: Dict, node: Dict, row: int, numeric: np.ndarray,
+                  seen: np.ndarray, integral: np.ndarray, objects: Dict[int, np.ndarray]) -> None:
+        """Descend le schéma compilé dans un ETF et remplit la ligne correspondante"""
+        for key, (col_idx, children) in node.items():
+            value = data.get(key)
+            if value is None:
+                continue
+            if col_idx is not None and not isinstance(value, dict):
+                seen[col_idx] = True
+                if isinstance(value, bool):
+                    numeric[col_idx, row] = float(value)
+                    integral[col_idx] = False
+                elif isinstance(value, (int, float)):
+                    numeric[col_idx, row] = value
+                    if not isinstance(value, int):
+                        integral[col_idx] = False
+                else:
+                    if col_idx not in objects:
+                        objects[col_idx] = np.full(numeric.shape[1], None, dtype=object)
+                    # Les listes sont sérialisées comme dans flatten_nested_structures
+                    objects[col_idx][row] = '|'.join(map(str, value)) if isinstance(value, list) else value
+            if children and isinstance(value, dict):
+                self._fill_row(value, children, row, numeric, seen, integral, objects)
+
     def flatten_nested_structures(self, df: pd.DataFrame) -> pd.DataFrame:
         """Aplatissement récursif des colonnes de type dict et list"""
         # D'abord traiter les dictionnaires
@@ -63,8 +155,8 @@ class ETFDataPipeline:
             if not df[col].map(lambda x: isinstance(x, (dict, list))).any()
         ]
         
-        # Imputation numérique
-        if self.num_cols:
+        # Imputation numérique (sans valeur manquante, l'imputer renverrait les données inchangées)
+        if self.num_cols and df[self.num_cols].isna().values.any():
             df[self.num_cols] = self.imputer.fit_transform(df[self.num_cols])
         
         # Imputation et encodage catégoriel
@@ -158,6 +250,7 @@ class ETFDataPipeline:
                 lmbda = self.transformers[col]['lambda']
                 shift = self.transformers[col]['shift']
                 # Inverse Box-Cox
+                from scipy.special import inv_boxcox
                 df[col] = inv_boxcox(df[col], lmbda) - shift
         
         return df
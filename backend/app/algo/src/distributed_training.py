@@ -0,0 +1,229 @@
+"""
+Entraînement data-parallèle multi-processus (CPU, backend gloo) du moteur de notation
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from torch.utils.data import DistributedSampler, TensorDataset
+from torch_geometric.data import Data
+
+from memory_optimizer import PrefetchTensorLoader, available_cpu_cores, configure_cpu_threads
+
+logger = logging.getLogger(__name__)
+
+
+def broadcast_parameters(*models: torch.nn.Module) -> None:
+    """Aligne paramètres et buffers de tous les rangs sur ceux du rang 0"""
+    for model in models:
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            dist.broadcast(tensor.data, src=0)
+
+
+def allreduce_gradients(params: List[torch.Tensor]) -> None:
+    """Moyenne des gradients entre rangs en un seul all-reduce (buffer aplati).
+
+    Un paramètre sans gradient sur un rang mais pas sur un autre reçoit un
+    gradient nul, pour que tous les rangs réduisent le même buffer.
+    """
+    world_size = dist.get_world_size()
+    params = [p for p in params if p.requires_grad]
+    has_grad = torch.tensor([p.grad is not None for p in params], dtype=torch.int32)
+    dist.all_reduce(has_grad)
+
+    synced = [p for p, count in zip(params, has_grad.tolist()) if count > 0]
+    if not synced:
+        return
+    for p in synced:
+        if p.grad is None:
+            p.grad = torch.zeros_like(p)
+
+    flat = torch.cat([p.grad.reshape(-1) for p in synced])
+    dist.all_reduce(flat)
+    flat /= world_size
+
+    offset = 0
+    for p in synced:
+        numel = p.grad.numel()
+        p.grad.copy_(flat[offset:offset + numel].view_as(p.grad))
+        offset += numel
+
+
+def reduce_metrics(metrics: Dict) -> Dict:
+    """Moyenne des métriques scalaires entre rangs"""
+    names = sorted(metrics)
+    values = torch.tensor([float(metrics[name]) for name in names], dtype=torch.float64)
+    dist.all_reduce(values)
+    values /= dist.get_world_size()
+    return dict(zip(names, values.tolist()))
+
+
+def _threads_per_rank(world_size: int) -> int:
+    return max(1, available_cpu_cores() // world_size)
+
+
+def _run_worker(rank: int, world_size: int, config: Dict, data: Dict, epochs: int, seed: int,
+                result_path: Optional[str], init_method: str) -> None:
+    """Corps d'un processus: semi-supervisé puis fine-tuning GNN, gradients moyennés à chaque pas"""
+    from rating_model import ETFScoringEngine  # import différé: rating_model importe ce module
+
+    dist.init_process_group('gloo', init_method=init_method, rank=rank, world_size=world_size)
+    try:
+        # Les cœurs sont partagés entre les rangs; seul le rang 0 écrit des checkpoints
+        config = dict(config)
+        config['CPU_PROFILE'] = {**config.get('CPU_PROFILE', {}), 'intra_op_threads': _threads_per_rank(world_size)}
+        configure_cpu_threads(config['CPU_PROFILE']['intra_op_threads'], config['CPU_PROFILE'].get('inter_op_threads'))
+        if rank != 0:
+            config['checkpoint_path'] = None
+
+        torch.manual_seed(seed)
+        engine = ETFScoringEngine(config)
+        broadcast_parameters(engine.semi_supervised_model, engine.gnn_model)
+        engine.optimizer.register_step_pre_hook(
+            lambda optimizer, args, kwargs: allreduce_gradients(
+                [p for group in optimizer.param_groups for p in group['params']]))
+
+        # Partition des échantillons d'entraînement, nouvelle permutation à chaque époque
+        X_train, y_train = data['X_train'], data['y_train']
+        sampler = DistributedSampler(TensorDataset(X_train, y_train), num_replicas=world_size,
+                                     rank=rank, shuffle=True, seed=seed)
+        batch_size = config['batch_size']
+        prefetch = config['CPU_PROFILE'].get('prefetch_batches', 2)
+
+        def epoch_batches(epoch: int):
+            sampler.set_epoch(epoch)
+            indices = torch.tensor(list(sampler))
+            return PrefetchTensorLoader(X_train[indices], y_train[indices], batch_size=batch_size,
+                                        shuffle=False, prefetch=prefetch)
+
+        engine.monitor.log_operation_start('distributed_training')
+        metrics = engine._fit_semi_supervised(epoch_batches, data['X_val'], data['y_val'], epochs,
+                                              reduce_metrics=reduce_metrics)
+
+        graph_data = data.get('graph_data')
+        if graph_data is not None:
+            gnn_metrics = engine.gnn_model.train_minibatch(
+                graph_data=graph_data,
+                targets=data['targets'],
+                downstream_model=engine.semi_supervised_model,
+                loss_fn=engine.loss_fn,
+                optimizer=engine.optimizer,
+                device=engine.device,
+                epochs=config.get('gnn_epochs', 1),
+                batch_size=config.get('gnn_batch_size', 512),
+                fan_out=config.get('gnn_fan_out', [10, 5]),
+                undirected=config.get('gnn_sample_undirected', True),
+                seed=seed,
+                num_shards=world_size,
+                shard=rank)
+            metrics.update(reduce_metrics(gnn_metrics))
+        engine.monitor.log_operation_success('distributed_training')
+
+        if rank == 0 and result_path:
+            engine.save(result_path)
+            with open(f"{result_path}.json", 'w') as f:
+                json.dump({**metrics, 'world_size': world_size}, f)
+    finally:
+        dist.destroy_process_group()
+
+
+def _split_data(X: torch.Tensor, y: torch.Tensor, validation_split: float, seed: int) -> Dict:
+    """Jeu de validation commun à tous les rangs (même décision d'early stopping partout)"""
+    num_val = int(len(X) * validation_split)
+    perm = torch.randperm(len(X), generator=torch.Generator().manual_seed(seed))
+    if num_val < 1 or num_val >= len(X):
+        return {'X_train': X, 'y_train': y, 'X_val': None, 'y_val': None}
+    val_idx, train_idx = perm[:num_val], perm[num_val:]
+    return {'X_train': X[train_idx], 'y_train': y[train_idx], 'X_val': X[val_idx], 'y_val': y[val_idx]}
+
+
+def train_distributed(config: Dict, X: pd.DataFrame, y: pd.Series, graph_data: Optional[Data] = None,
+                      epochs: int = 100, world_size: Optional[int] = None, seed: int = 0,
+                      result_path: Optional[str] = None, master_addr: str = '127.0.0.1',
+                      master_port: int = 29500) -> Dict:
+    """Lance world_size processus locaux (gloo) et entraîne le moteur en data-parallèle.
+
+    Chaque rang traite 1/world_size des échantillons par époque avec config['batch_size']
+    par pas (batch global = world_size × batch_size).
+
+    Returns:
+        Métriques d'entraînement (moyennées entre rangs) et 'state_path', l'état
+        du moteur sauvegardé par le rang 0 (à recharger avec ETFScoringEngine.load)
+    """
+    world_size = world_size or max(1, min(4, available_cpu_cores()))
+    if result_path is None:
+        result_path = os.path.join(tempfile.mkdtemp(prefix='etf_ddp_'), 'engine_state.pt')
+    os.makedirs(os.path.dirname(os.path.abspath(result_path)), exist_ok=True)
+
+    X_tensor = torch.as_tensor(np.asarray(X.values, dtype=np.float32))
+    y_tensor = torch.as_tensor(np.asarray(y.values, dtype=np.float32))
+    data = _split_data(X_tensor, y_tensor, config.get('validation_split', 0.2), seed)
+    data['graph_data'] = graph_data.cpu() if graph_data is not None else None
+    data['targets'] = y_tensor
+
+    logger.info(f"Starting distributed training on {world_size} processes")
+    mp.spawn(_run_worker,
+             args=(world_size, config, data, epochs, seed, result_path, f"tcp://{master_addr}:{master_port}"),
+             nprocs=world_size, join=True)
+
+    with open(f"{result_path}.json") as f:
+        metrics = json.load(f)
+    metrics['state_path'] = result_path
+    return metrics
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Point d'entrée: `python distributed_training.py --data etf.json --nproc 4`
+    ou sous torchrun (`torchrun --nproc_per_node 4 distributed_training.py --data etf.json`)"""
+    from config import build_engine_config
+    from data_utils import DataPreprocessor
+    from rating_model import ETFScoringEngine
+
+    parser = argparse.ArgumentParser(description="Entraînement distribué du moteur de notation ETF")
+    parser.add_argument('--data', required=True, help="Fichier JSON des ETFs bruts")
+    parser.add_argument('--nproc', type=int, default=None, help="Nombre de processus (ignoré sous torchrun)")
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='engine_state.pt', help="Chemin de l'état entraîné")
+    parser.add_argument('--no-gnn', action='store_true', help="Sans fine-tuning GNN")
+    args = parser.parse_args(argv)
+
+    config = build_engine_config()
+    with open(args.data) as f:
+        raw_etf_data = json.load(f)
+
+    # Préparation identique à run_full_analysis (déterministe: même seed sur tous les rangs)
+    torch.manual_seed(args.seed)
+    engine = ETFScoringEngine(config)
+    flattened = engine.data_pipeline.flatten_records(raw_etf_data)
+    processed = engine.data_pipeline.process(DataPreprocessor().process_numerical_data(flattened), flatten=False)
+    features = engine._prepare_etf_features(processed)
+    targets = pd.Series(np.random.default_rng(args.seed).random(len(features)))  # cibles proxy
+    graph_data = None if args.no_gnn else engine.graph_processor.build_graph_from_raw(raw_etf_data)
+
+    if 'RANK' in os.environ and 'WORLD_SIZE' in os.environ:
+        # Lancé par torchrun: ce processus est un rang
+        X_tensor = torch.as_tensor(np.asarray(features.values, dtype=np.float32))
+        y_tensor = torch.as_tensor(np.asarray(targets.values, dtype=np.float32))
+        data = _split_data(X_tensor, y_tensor, config.get('validation_split', 0.2), args.seed)
+        data.update(graph_data=graph_data, targets=y_tensor)
+        _run_worker(int(os.environ['RANK']), int(os.environ['WORLD_SIZE']), config, data,
+                    args.epochs, args.seed, args.output, 'env://')
+    else:
+        metrics = train_distributed(config, features, targets, graph_data=graph_data, epochs=args.epochs,
+                                    world_size=args.nproc, seed=args.seed, result_path=args.output)
+        logger.info(f"Distributed training finished: {metrics}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
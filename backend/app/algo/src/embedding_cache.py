@@ -0,0 +1,151 @@
+"""
+Cache des embeddings GNN des ETFs pour la notation
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+
+def model_fingerprint(model: nn.Module) -> str:
+    """Empreinte des poids d'un modèle (change à chaque mise à jour des paramètres)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for name, tensor in model.state_dict().items():
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def graph_fingerprint(graph_data) -> str:
+    """Empreinte du contenu d'un graphe (features, arêtes et positions des ETFs)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for name in ('x', 'edge_index', 'etf_index'):
+        tensor = getattr(graph_data, name, None)
+        if tensor is not None:
+            digest.update(name.encode())
+            digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ETFEmbeddingTable:
+    """Embeddings des nœuds ETF (matrice float32 mappée en mémoire) indexés par etfId"""
+
+    def __init__(self, key: str, embeddings: np.ndarray, etf_ids: Sequence):
+        self.key = key
+        self.embeddings = embeddings
+        self.etf_ids = list(etf_ids)
+        self.positions = {etf_id: pos for pos, etf_id in enumerate(self.etf_ids)}
+
+    def __len__(self) -> int:
+        return len(self.etf_ids)
+
+    def lookup(self, etf_ids: Sequence) -> np.ndarray:
+        """Lignes d'embeddings pour les ETFs demandés (KeyError si inconnu)"""
+        return self.embeddings[[self.positions[etf_id] for etf_id in etf_ids]]
+
+    def as_tensor(self, etf_ids: Sequence, device: torch.device = torch.device('cpu')) -> torch.Tensor:
+        """Lignes demandées en tenseur (seules ces lignes sont copiées hors du mapping)"""
+        return torch.from_numpy(np.ascontiguousarray(self.lookup(etf_ids), dtype=np.float32)).to(device)
+
+
+class ETFEmbeddingCache:
+    """Cache disque des embeddings ETF clé (empreinte du modèle, version du graphe).
+
+    Les embeddings ne dépendent que des poids et du graphe: tant que ni l'un ni
+    l'autre ne change, la notation se réduit à une lecture de lignes.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 4):
+        """
+        Args:
+            cache_dir: Répertoire des fichiers .npy/.json du cache
+            max_entries: Nombre d'entrées conservées sur disque
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max(1, max_entries)
+        self._tables: Dict[str, ETFEmbeddingTable] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, model: nn.Module, graph_data) -> str:
+        graph_version = getattr(graph_data, 'version', None) or graph_fingerprint(graph_data)
+        return f"{model_fingerprint(model)}-{graph_version}"
+
+    def get(self, model: nn.Module, graph_data) -> Optional[ETFEmbeddingTable]:
+        """Table en cache pour ce modèle et ce graphe, ou None"""
+        return self._load(self.key(model, graph_data))
+
+    def get_or_compute(self, model: nn.Module, graph_data) -> ETFEmbeddingTable:
+        """Table en cache, calculée par un forward complet uniquement si absente"""
+        key = self.key(model, graph_data)
+        table = self._load(key)
+        if table is not None:
+            return table
+
+        logger.info(f"Embedding cache miss ({key}), computing ETF embeddings")
+        embeddings = model.etf_embeddings(graph_data).detach().cpu().numpy().astype(np.float32)
+        return self._store(key, embeddings, list(graph_data.etf_ids))
+
+    def invalidate(self) -> None:
+        """Vide le cache mémoire et disque"""
+        self._tables.clear()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(('.npy', '.json')):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.npy", f"{base}.json"
+
+    def _load(self, key: str) -> Optional[ETFEmbeddingTable]:
+        if key in self._tables:
+            return self._tables[key]
+
+        data_path, meta_path = self._paths(key)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        table = ETFEmbeddingTable(key, np.load(data_path, mmap_mode='r'), meta['etf_ids'])
+        self._tables[key] = table
+        return table
+
+    def _store(self, key: str, embeddings: np.ndarray, etf_ids: List) -> ETFEmbeddingTable:
+        data_path, meta_path = self._paths(key)
+
+        # Écriture atomique: fichier temporaire puis renommage
+        tmp_path = f"{data_path}.tmp"
+        mapped = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=embeddings.shape)
+        mapped[:] = embeddings
+        mapped.flush()
+        del mapped
+        os.replace(tmp_path, data_path)
+
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump({'etf_ids': [etf_id if isinstance(etf_id, str) else int(etf_id) for etf_id in etf_ids],
+                       'shape': list(embeddings.shape)}, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+        self._evict(keep=key)
+        return self._load(key)
+
+    def _evict(self, keep: str) -> None:
+        """Supprime les entrées les plus anciennes au-delà de max_entries"""
+        entries = sorted(
+            (os.path.getmtime(os.path.join(self.cache_dir, name)), name[:-len('.npy')])
+            for name in os.listdir(self.cache_dir) if name.endswith('.npy')
+        )
+        for _, key in entries[:max(0, len(entries) - self.max_entries)]:
+            if key == keep:
+                continue
+            self._tables.pop(key, None)
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.remove(path)
@@ -1,3 +1,5 @@
+import warnings
+
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -5,61 +7,73 @@ from config import REQUIRED_COLUMNS
 
 
 class ETFFeatureBuilder:
+    FACTORS = ["beta", "size", "value", "momentum", "quality"]
+    
+    # Features calculées à partir d'une seule colonne brute: (feature, colonne, transformation)
+    #   norm: min-max | inverse: 1 - min-max | log: min-max de log1p | shifted: 1 + min-max
+    #   max_ter / min_liquidity: indicateur de seuil (RISK_PARAMETERS)
+    BASE_FEATURES = [
+        # Coût
+        ("cost_score", "fundamentals.costs.ter", "inverse"),
+        ("tracking_error_score", "fundamentals.costs.trackingError", "inverse"),
+        # Liquidité
+        ("liquidity_score", "fundamentals.liquidity.avgDailyVolume", "log"),
+        ("bid_ask_score", "fundamentals.liquidity.avgBidAskSpread", "inverse"),
+        ("market_impact_score", "fundamentals.liquidity.marketImpactScore", "inverse"),
+        # Risque
+        ("volatility_30d", "riskAnalysis.volatility.30d", "norm"),
+        ("max_drawdown_score", "riskAnalysis.drawdowns.maxDrawdown", "shifted"),  # drawdown négatif
+        ("recovery_time_score", "riskAnalysis.drawdowns.recoveryTimeDays", "inverse"),
+        # Flows / Sentiment
+        ("flow_score", "alternativeData.flows.30dNetFlow", "log"),
+        ("sentiment_news", "alternativeData.sentiment.newsSentiment", "norm"),
+        ("sentiment_social", "alternativeData.sentiment.socialMediaSentiment", "norm"),
+        ("analyst_consensus", "alternativeData.sentiment.analystConsensus", "norm"),
+    ]
+    TRAILING_FEATURES = [
+        # Structure / technique
+        ("sampling_error_score", "replication.optimization.samplingError", "inverse"),
+        ("lending_revenue_score", "replication.lending.lendingRevenue", "norm"),
+        # Divers
+        ("institutional_score", "alternativeData.ownership.institutionalPercentage", "norm"),
+        ("coverage_score", "replication.optimization.coverage", "norm"),
+        ("basket_liquidity_score", "riskAnalysis.liquidityRisk.basketLiquidityScore", "norm"),
+        # Seuils de configuration
+        ("ter_acceptable", "fundamentals.costs.ter", "max_ter"),
+        ("liquidity_acceptable", "fundamentals.liquidity.avgDailyVolume", "min_liquidity"),
+    ]
+    
     def __init__(self, config=None):
         self.config = config or {}
         self.required_columns = self.config.get('REQUIRED_COLUMNS', REQUIRED_COLUMNS)
         self.risk_params = self.config.get('RISK_PARAMETERS', {})
 
-    def transform(self, etf_data: pd.DataFrame) -> pd.DataFrame:
-        """Transforme les données brutes d'ETFs en features prêtes pour le modèle"""
-        features = pd.DataFrame(index=etf_data.index)
-
-        # Coût
-        features["cost_score"] = 1 - self._normalize(etf_data["fundamentals.costs.ter"])
-        features["tracking_error_score"] = 1 - self._normalize(etf_data["fundamentals.costs.trackingError"])
-
-        # Liquidité
-        features["liquidity_score"] = self._normalize(np.log1p(etf_data["fundamentals.liquidity.avgDailyVolume"]))
-        features["bid_ask_score"] = 1 - self._normalize(etf_data["fundamentals.liquidity.avgBidAskSpread"])
-        features["market_impact_score"] = 1 - self._normalize(etf_data["fundamentals.liquidity.marketImpactScore"])
-
-        # Risque
-        features["volatility_30d"] = self._normalize(etf_data["riskAnalysis.volatility.30d"])
-        features["max_drawdown_score"] = 1 + self._normalize(etf_data["riskAnalysis.drawdowns.maxDrawdown"])  # drawdown négatif
-        features["recovery_time_score"] = 1 - self._normalize(etf_data["riskAnalysis.drawdowns.recoveryTimeDays"])
+    def column_features(self, input_columns=None) -> list:
+        """Spécifications (feature, colonne, transformation) dans l'ordre de transform"""
+        input_columns = set(self.required_columns if input_columns is None else input_columns)
+        factors = [(f"factor_{factor}", f"portfolio.characteristics.factorExposures.{factor}", "norm")
+                   for factor in self.FACTORS
+                   if f"portfolio.characteristics.factorExposures.{factor}" in input_columns]
+        return self.BASE_FEATURES + factors + self.TRAILING_FEATURES
 
-        # Flows / Sentiment
-        features["flow_score"] = self._normalize(np.log1p(etf_data["alternativeData.flows.30dNetFlow"]))
-        features["sentiment_news"] = self._normalize(etf_data["alternativeData.sentiment.newsSentiment"])
-        features["sentiment_social"] = self._normalize(etf_data["alternativeData.sentiment.socialMediaSentiment"])
-        features["analyst_consensus"] = self._normalize(etf_data["alternativeData.sentiment.analystConsensus"])
+    def output_columns(self, input_columns=None) -> list:
+        """Features produites par transform pour ces colonnes d'entrée (required_columns par défaut),
+        sans transformer de données"""
+        input_columns = set(self.required_columns if input_columns is None else input_columns)
+        fund_age = ["fund_age_years"] if "metadata.creationDate" in input_columns else []
+        return [name for name, _, _ in self.column_features(input_columns)] + fund_age
 
-        # Facteurs (expositions)
-        for factor in ["beta", "size", "value", "momentum", "quality"]:
-            col = f"portfolio.characteristics.factorExposures.{factor}"
-            if col in etf_data.columns:
-                features[f"factor_{factor}"] = self._normalize(etf_data[col])
+    @property
+    def output_dim(self) -> int:
+        """Nombre de features produites pour required_columns"""
+        return len(self.output_columns())
 
-        # Structure / technique
-        features["sampling_error_score"] = 1 - self._normalize(etf_data["replication.optimization.samplingError"])
-        features["lending_revenue_score"] = self._normalize(etf_data["replication.lending.lendingRevenue"])
+    def transform(self, etf_data: pd.DataFrame) -> pd.DataFrame:
+        """Transforme les données brutes d'ETFs en features prêtes pour le modèle"""
+        features = pd.DataFrame(index=etf_data.index)
 
-        # Divers
-        features["institutional_score"] = self._normalize(etf_data["alternativeData.ownership.institutionalPercentage"])
-        features["coverage_score"] = self._normalize(etf_data["replication.optimization.coverage"])
-        features["basket_liquidity_score"] = self._normalize(etf_data["riskAnalysis.liquidityRisk.basketLiquidityScore"])
-        
-        
-        # Ajouter des features basées sur les seuils de configuration
-        features["ter_acceptable"] = (
-            etf_data["fundamentals.costs.ter"] <= self.risk_params.get('max_ter', 0.05)
-        ).astype(int)
-        
-        features["liquidity_acceptable"] = (
-            etf_data["fundamentals.liquidity.avgDailyVolume"] >= 
-            self.risk_params.get('min_liquidity', 1e6)
-        ).astype(int)
-        
+        for name, column, kind in self.column_features(etf_data.columns):
+            features[name] = self._column_feature(kind, etf_data[column].to_numpy(dtype=np.float64))
         
         # Âge du fonds
         if "metadata.creationDate" in etf_data.columns:
@@ -69,14 +83,82 @@ class ETFFeatureBuilder:
 
         return features
 
+    def transform_stressed(self, etf_data: pd.DataFrame, shocks: list,
+                           base_features: pd.DataFrame = None) -> np.ndarray:
+        """Features [scénarios, ETFs, features] (float32) sous des chocs colonne par colonne.
+
+        Args:
+            etf_data: Données brutes (non copiées ni modifiées)
+            shocks: Un dict par scénario {colonne: (multiplicateur, additif)}; chaque terme
+                est un scalaire ou un tableau [ETFs] (choc propre à chaque ETF)
+            base_features: Résultat de transform(etf_data) s'il est déjà calculé
+        """
+        num_etfs = len(etf_data)
+        shocked_columns = {column for shock in shocks for column in shock if column in etf_data.columns}
+        stressed = {}
+        for column in shocked_columns:
+            terms = [shock.get(column, (1.0, 0.0)) for shock in shocks]
+            multiplier = np.stack([np.broadcast_to(np.asarray(m, dtype=np.float64), (num_etfs,)) for m, _ in terms])
+            additive = np.stack([np.broadcast_to(np.asarray(a, dtype=np.float64), (num_etfs,)) for _, a in terms])
+            stressed[column] = etf_data[column].to_numpy(dtype=np.float64)[None, :] * multiplier + additive
+        return self.transform_columns(etf_data, stressed, len(shocks), base_features=base_features)
+
+    def transform_columns(self, etf_data: pd.DataFrame, stressed_columns: dict, num_scenarios: int,
+                          base_features: pd.DataFrame = None) -> np.ndarray:
+        """Features [scénarios, ETFs, features] (float32) à partir de colonnes choquées.
+
+        Args:
+            etf_data: Données brutes (non copiées ni modifiées)
+            stressed_columns: {colonne: valeurs [scénarios, ETFs]}; les autres colonnes
+                gardent leurs valeurs de base
+            num_scenarios: Nombre de scénarios
+            base_features: Résultat de transform(etf_data) s'il est déjà calculé
+
+        Seules les features dont la colonne source est choquée sont recalculées,
+        pour tous les scénarios à la fois (normalisation min-max par scénario).
+        """
+        if base_features is None:
+            base_features = self.transform(etf_data)
+        stacked = np.repeat(base_features.to_numpy(dtype=np.float32)[None], num_scenarios, axis=0)
+
+        for name, source, kind in self.column_features(etf_data.columns):
+            if source in stressed_columns:
+                stacked[:, :, base_features.columns.get_loc(name)] = self._column_feature(kind, stressed_columns[source])
+        return stacked
+
+    def _column_feature(self, kind: str, values: np.ndarray) -> np.ndarray:
+        """Applique une transformation le long du dernier axe (ETFs)"""
+        if kind == "max_ter":
+            return (values <= self.risk_params.get('max_ter', 0.05)).astype(int)
+        if kind == "min_liquidity":
+            return (values >= self.risk_params.get('min_liquidity', 1e6)).astype(int)
+        if kind == "log":
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return self._normalize_array(np.log1p(values))
+        norm = self._normalize_array(values)
+        if kind == "inverse":
+            return 1 - norm
+        if kind == "shifted":
+            return 1 + norm
+        return norm
+
+    @staticmethod
+    def _normalize_array(values: np.ndarray) -> np.ndarray:
+        """Min-max le long du dernier axe (NaN ignorés, 0.5 si constant)"""
+        if values.shape[-1] == 0:
+            return values.copy()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # colonne entièrement NaN
+            min_val = np.nanmin(values, axis=-1, keepdims=True)
+            max_val = np.nanmax(values, axis=-1, keepdims=True)
+        constant = max_val == min_val
+        with np.errstate(invalid='ignore', divide='ignore'):
+            norm = (values - min_val) / (max_val - min_val)
+        return np.where(constant, 0.5, norm)
+
     def _normalize(self, series: pd.Series, inverse: bool = False) -> pd.Series:
         """Normalise une série entre 0 et 1"""
-        series = series.astype(float)
-        min_val = series.min()
-        max_val = series.max()
-        if max_val == min_val:
-            return pd.Series(0.5, index=series.index)  # constante
-        norm = (series - min_val) / (max_val - min_val)
+        norm = pd.Series(self._normalize_array(series.to_numpy(dtype=np.float64)), index=series.index)
         return 1 - norm if inverse else norm
     
     
@@ -5,6 +5,7 @@ from torch_geometric.data import Data
 import logging
 from dataclasses import dataclass
 from config import MODEL_CONFIG
+from embedding_cache import graph_fingerprint
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -26,6 +27,8 @@ class ETFGraphProcessor:
         self.feature_stats = {}
         self.etf_node_indices = {}  # {etf_id: index dans le tableau de nœuds}
         self.asset_node_indices = {}  # {asset_id: index dans le tableau de nœuds}
+        self.etf_records = {}  # {etf_id: données brutes de l'ETF}
+        self._etf_accessors = None  # Tuples de clés compilés depuis la configuration
         
     def build_graph_from_raw(self, etf_data: List[Dict[str, Any]]) -> Data:
         """Construction du graphe avec gestion robuste des dimensions"""
@@ -56,13 +59,15 @@ class ETFGraphProcessor:
                 
             # 6. Construction du graphe
             graph_data = Data(
-                x=torch.FloatTensor(all_features).to(self.config.device),
-                edge_index=torch.LongTensor(edge_index).t().contiguous().to(self.config.device),
+                x=torch.as_tensor(all_features, dtype=torch.float32).to(self.config.device),
+                edge_index=torch.from_numpy(edge_index).to(self.config.device),
                 etf_ids=etf_ids,
                 asset_ids=asset_ids,
-                edge_attr=torch.FloatTensor(edge_attr).to(self.config.device) if edge_attr else None,
-                temporal_features=temp_features
+                edge_attr=torch.as_tensor(edge_attr, dtype=torch.float32).to(self.config.device) if edge_attr.shape[1] else None,
+                temporal_features=temp_features,
+                etf_index=torch.arange(len(etf_ids), device=self.config.device)
             )
+            graph_data.version = graph_fingerprint(graph_data)
             logger.info(f"Graph built with {graph_data.num_nodes} nodes and {graph_data.num_edges} edges")
 
 
@@ -79,148 +84,149 @@ class ETFGraphProcessor:
             raise
         
 
+    def _compile_accessors(self) -> None:
+        """Compile une seule fois les chemins configurés en tuples de clés"""
+        self._etf_accessors = tuple(tuple(path.split('.')) for path in self.config.etf_features)
+        self._asset_accessors = tuple(self.config.asset_features)
+        self._edge_accessors = tuple(self.config.edge_attributes or ())
+        self._sector_codes = {sector: float(i + 1) for i, sector in enumerate(self.config.sectors or [])}
+
     def _extract_base_elements(self, etf_data: List[Dict[str, Any]]) -> Tuple:
         """Extraction basée sur la configuration avec gestion robuste des données"""
         # Vérification de la configuration
         if not self.config.etf_features or not self.config.asset_features:
             raise ValueError("Graph feature configuration is missing")
         
+        # First, ensure etf_data is a list of dictionaries
+        if not isinstance(etf_data, list):
+            raise ValueError("etf_data should be a list of ETF dictionaries")
+        
+        if self._etf_accessors is None:
+            self._compile_accessors()
+        
         # Réinitialiser les indices
         self.etf_node_indices = {} 
         self.asset_node_indices = {}
+        self.etf_records = {}
         
         # Dimensions
-        NUM_ETF_FEATURES = len(self.config.etf_features)
-        NUM_ASSET_FEATURES = len(self.config.asset_features)
-        TOTAL_FEATURES = NUM_ETF_FEATURES + NUM_ASSET_FEATURES
-        
-        node_features = []
-        edge_index = [[], []]
-        etf_ids = []
-        asset_ids = []
-        holdings_info = []
-        asset_info = {}
-        edge_attributes = []
-        current_idx = 0
+        TOTAL_FEATURES = len(self._etf_accessors) + len(self._asset_accessors)
         
-        # First, ensure etf_data is a list of dictionaries
-        if not isinstance(etf_data, list):
-            raise ValueError("etf_data should be a list of ETF dictionaries")
-        
-        # Premier passage: traiter tous les ETFs
+        # Premier passage (comptage): ETFs valides, actifs uniques et arêtes
+        valid_etfs = []
+        asset_info = {}
+        num_edges = 0
         for etf in etf_data:
-            if not isinstance(etf, dict):
-                logger.warning("Skipping non-dictionary ETF data")
+            etf_id = self._parse_etf_id(etf)
+            if etf_id is None:
                 continue
             
-            
-            try:
-                etf_id = int(etf.get('etfId'))  
-                if etf_id == 0:
-                    logger.warning("Skipping ETF with missing or invalid ID")
-                    continue
-                
-                self.etf_node_indices[etf_id] = current_idx
-                etf_ids.append(etf_id)
-                
-                # Features des ETFs basées sur la configuration
-                etf_features = [0.0] * TOTAL_FEATURES
-                
-                for i, feature_path in enumerate(self.config.etf_features):
-                    value = self._get_nested_value(etf, feature_path)
-                    etf_features[i] = float(value) if value is not None else 0.0
-                    
-                node_features.append(etf_features)
-                current_idx += 1
-                
-                # Collecter les holdings pour traitement ultérieur
-                portfolio = etf.get('portfolio', {})
-                holdings = portfolio.get('holdings', []) if isinstance(portfolio, dict) else []
-                
-                for holding in holdings:
-                    if not isinstance(holding, dict):
-                        continue
-                    asset_id = holding.get('assetId')
-                    
-                    if asset_id:
-                        holdings_info.append((etf_id, asset_id, holding))
-                        
-                        # Stocker les infos de l'actif
-                        if asset_id not in asset_info:
-                            asset_info[asset_id] = {}
-                            for feature in self.config.asset_features:
-                                asset_info[asset_id][feature] = holding.get(feature)
-            
-            except (KeyError, ValueError, TypeError) as e:
-                logger.warning(f"Error processing ETF data: {str(e)}")
-                continue
+            holdings = self._valid_holdings(etf)
+            for holding in holdings:
+                # Les infos de l'actif proviennent de sa première occurrence
+                asset_info.setdefault(holding['assetId'], holding)
+            num_edges += len(holdings)
+            valid_etfs.append((etf_id, etf, holdings))
         
+        num_etfs = len(valid_etfs)
+        node_features = np.zeros((num_etfs + len(asset_info), TOTAL_FEATURES), dtype=np.float32)
+        edge_index = np.empty((2, num_edges), dtype=np.int64)
+        edge_attr = np.zeros((num_edges, len(self._edge_accessors)), dtype=np.float32)
+        etf_ids = [etf_id for etf_id, _, _ in valid_etfs]
+        asset_ids = list(asset_info)
         
-        # Deuxième passage: créer les nœuds d'actifs
-        for asset_id, info in asset_info.items():
-            if not isinstance(info, dict):
-                continue
-            
-            self.asset_node_indices[asset_id] = current_idx
-            asset_ids.append(asset_id)
-            
-            # Features des actifs basées sur la configuration
-            asset_features = [0.0] * TOTAL_FEATURES
-            
-            for i, feature in enumerate(self.config.asset_features):
-                value = info.get(feature, '')
-                col_idx = NUM_ETF_FEATURES + i
-                
-                # Encodage spécial pour le secteur
-                if feature == 'sector' and self.config.sectors:
-                    if value in self.config.sectors:
-                        asset_features[col_idx] = float(self.config.sectors.index(value) + 1)
-                
-                else: 
-                    # Conversion en float pour les autres caractéristique
-                    try:
-                        asset_features[col_idx] = float(value) if isinstance(value, (int, float)) else 0.0
-                    except (ValueError, TypeError):
-                        asset_features[col_idx] = 0.0
-            
-            node_features.append(asset_features)
-            current_idx += 1
-            
+        # Deuxième passage: features des ETFs écrites directement dans la matrice
+        for etf_idx, (etf_id, etf, _) in enumerate(valid_etfs):
+            self.etf_node_indices[etf_id] = etf_idx
+            self.etf_records[etf_id] = etf
+            self._fill_etf_row(node_features[etf_idx], etf)
         
-        # Troisième passage: créer les connections et attributs d'arête
-        for etf_id, asset_id, holding in holdings_info:
-            etf_idx = self.etf_node_indices.get(etf_id)
-            asset_idx = self.asset_node_indices.get(asset_id)
-            
-            if etf_idx is not None and asset_idx is not None:
-                edge_index[0].append(etf_idx)
-                edge_index[1].append(asset_idx)
-                
-                # Attributs d'arête basés sur la configuration
-                edge_attr = []
-                for attr in self.config.edge_attributes:
-                    value = holding.get(attr, 0.0)
-                    
-                    try:
-                        edge_attr.append(float(value))
-                    except (ValueError, TypeError):
-                        edge_attr.append(0.0)
-                edge_attributes.append(edge_attr)
+        # Troisième passage: nœuds d'actifs
+        for asset_idx, (asset_id, holding) in enumerate(asset_info.items(), start=num_etfs):
+            self.asset_node_indices[asset_id] = asset_idx
+            self._fill_asset_row(node_features[asset_idx], holding)
+        
+        # Quatrième passage: connections et attributs d'arête
+        edge_pos = 0
+        for etf_id, _, holdings in valid_etfs:
+            etf_idx = self.etf_node_indices[etf_id]
+            for holding in holdings:
+                edge_index[0, edge_pos] = etf_idx
+                edge_index[1, edge_pos] = self.asset_node_indices[holding['assetId']]
+                self._fill_edge_attr(edge_attr[edge_pos], holding)
+                edge_pos += 1
         
         return (
-            np.array(node_features, dtype=np.float32),
+            node_features,
             edge_index, 
             etf_ids, 
             asset_ids,
-            edge_attributes
+            edge_attr
             )
     
 
 
 
+    def _parse_etf_id(self, etf: Any) -> Optional[int]:
+        """Identifiant entier de l'ETF, ou None s'il est invalide"""
+        if not isinstance(etf, dict):
+            logger.warning("Skipping non-dictionary ETF data")
+            return None
+        try:
+            etf_id = int(etf.get('etfId'))
+        except (KeyError, ValueError, TypeError) as e:
+            logger.warning(f"Error processing ETF data: {str(e)}")
+            return None
+        if etf_id == 0:
+            logger.warning("Skipping ETF with missing or invalid ID")
+            return None
+        return etf_id
+
+    @staticmethod
+    def _valid_holdings(etf: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Holdings exploitables (dictionnaires avec un assetId)"""
+        portfolio = etf.get('portfolio', {})
+        holdings = portfolio.get('holdings', []) if isinstance(portfolio, dict) else []
+        return [h for h in holdings if isinstance(h, dict) and h.get('assetId')]
+
+    def _fill_etf_row(self, row: np.ndarray, etf: Dict[str, Any]) -> None:
+        """Écrit les features configurées d'un ETF dans une ligne de la matrice"""
+        for i, keys in enumerate(self._etf_accessors):
+            try:
+                row[i] = float(self._get_compiled_value(etf, keys))
+            except (ValueError, TypeError, OverflowError):
+                pass  # valeur absente ou non numérique: la feature reste à 0
+
+    def _fill_asset_row(self, row: np.ndarray, holding: Dict[str, Any]) -> None:
+        """Écrit les features configurées d'un actif dans une ligne de la matrice"""
+        offset = len(self._etf_accessors)
+        for i, feature in enumerate(self._asset_accessors):
+            value = holding.get(feature, '')
+            
+            # Encodage spécial pour le secteur
+            if feature == 'sector' and self._sector_codes:
+                row[offset + i] = self._sector_codes.get(value, 0.0)
+            elif isinstance(value, (int, float)):
+                try:
+                    row[offset + i] = float(value)
+                except (ValueError, TypeError, OverflowError):
+                    pass  # entier hors de la plage float64: la feature reste à 0
+
+    def _fill_edge_attr(self, row: np.ndarray, holding: Dict[str, Any]) -> None:
+        """Écrit les attributs d'arête configurés d'un holding"""
+        for i, attr in enumerate(self._edge_accessors):
+            try:
+                row[i] = float(holding.get(attr, 0.0))
+            except (ValueError, TypeError, OverflowError):
+                pass
+
     def _get_nested_value(self, data: Dict, path: str) -> Any:
         """Accès sécurisé aux valeurs imbriquées avec conversion en float"""
-        keys = path.split('.')
+        return self._get_compiled_value(data, tuple(path.split('.')))
+
+    @staticmethod
+    def _get_compiled_value(data: Dict, keys: Tuple[str, ...]) -> Any:
+        """Accès aux valeurs imbriquées via un chemin précompilé"""
         current = data
         for key in keys:
             if isinstance(current, dict) and key in current:
@@ -245,62 +251,87 @@ class ETFGraphProcessor:
         features = np.zeros((num_etfs, 3), dtype=np.float32)
         
         for etf_id, idx in self.etf_node_indices.items():
-            etf = next((e for e in etf_data if e.get('etfId') == etf_id), None)
-            if etf is None:
-                continue
-                
-            try:
-                alt_data = etf.get('alternativeData', {})
-                peer_data = etf.get('peerComparison', {})
-                
-                features[idx] = [
-                    np.clip(alt_data.get('sentiment', {}).get('newsSentiment', 0.5), 0, 1),
-                    alt_data.get('flows', {}).get('30dNetFlow', 0) / 1e9,
-                    np.clip(peer_data.get('percentileRank', {}).get('cost', 0.5), 0, 1)
-                ]
-            except Exception as e:
-                logger.warning(f"Alternative data error for ETF {etf_id}: {str(e)}")
+            etf = self.etf_records.get(etf_id)
+            if etf is not None:
+                self._fill_alternative_row(features[idx], etf, etf_id)
         
         return features
 
+    @staticmethod
+    def _fill_alternative_row(row: np.ndarray, etf: Dict[str, Any], etf_id: int) -> None:
+        """Écrit les 3 features alternatives d'un ETF"""
+        try:
+            alt_data = etf.get('alternativeData', {})
+            peer_data = etf.get('peerComparison', {})
+            
+            row[:] = [
+                np.clip(alt_data.get('sentiment', {}).get('newsSentiment', 0.5), 0, 1),
+                alt_data.get('flows', {}).get('30dNetFlow', 0) / 1e9,
+                np.clip(peer_data.get('percentileRank', {}).get('cost', 0.5), 0, 1)
+            ]
+        except Exception as e:
+            logger.warning(f"Alternative data error for ETF {etf_id}: {str(e)}")
+
     def _extract_temporal_features(self, etf_data: List[Dict[str, Any]]) -> Optional[torch.Tensor]:
         """Extraction des features temporelles alignées sur les nœuds ETF"""
         if not self.etf_node_indices:
             return None
             
-        num_etfs = len(self.etf_node_indices)
-        temporal_features = np.zeros((num_etfs, 7), dtype=np.float32)
-        
+        records = [None] * len(self.etf_node_indices)
         for etf_id, idx in self.etf_node_indices.items():
-            etf = next((e for e in etf_data if e.get('etfId') == etf_id), None)
+            records[idx] = (etf_id, self.etf_records.get(etf_id))
+        temporal_features = self._temporal_rows(records)
+        
+        return torch.FloatTensor(temporal_features).to(self.config.device)
+
+    @staticmethod
+    def _temporal_rows(records: List[Tuple[Any, Optional[Dict[str, Any]]]]) -> np.ndarray:
+        """Features temporelles (stats des returns + dernière NAV) pour une liste de (etf_id, ETF)"""
+        temporal_features = np.zeros((len(records), 7), dtype=np.float32)
+        
+        # Collecte des séries de returns (tableau irrégulier) et de la dernière NAV
+        rows, series = [], []
+        for idx, (etf_id, etf) in enumerate(records):
             if etf is None:
                 continue
                 
             try:
-                # Statistiques des returns
-                returns = np.array(etf.get('timeSeries', {}).get('dailyReturns', [0]))
-                feat = [
-                    float(np.mean(returns)),
-                    float(np.std(returns)),
-                    float(np.min(returns)),
-                    float(np.max(returns)),
-                    float(np.percentile(returns, 25)),
-                    float(np.percentile(returns, 75))
-                ]
+                time_series = etf.get('timeSeries', {})
+                returns = np.asarray(time_series.get('dailyReturns', [0]), dtype=np.float64).ravel()
                 
                 # Valeur NAV
-                nav_history = etf.get('timeSeries', {}).get('historicalNav', [])
+                nav_history = time_series.get('historicalNav', [])
                 if nav_history:
                     last_nav = nav_history[-1].get('value', nav_history[-1]) if isinstance(nav_history[-1], dict) else nav_history[-1]
-                    feat.append(float(last_nav))
+                    temporal_features[idx, 6] = float(last_nav)
                 else:
-                    feat.append(float(etf.get('fundamentals', {}).get('priceData', {}).get('currentPrice', 0)))
+                    temporal_features[idx, 6] = float(etf.get('fundamentals', {}).get('priceData', {}).get('currentPrice', 0))
                 
-                temporal_features[idx] = feat
+                if returns.size:
+                    rows.append(idx)
+                    series.append(returns)
             except Exception as e:
                 logger.warning(f"Temporal data error for ETF {etf_id}: {str(e)}")
         
-        return torch.FloatTensor(temporal_features).to(self.config.device)
+        # Statistiques des returns calculées en un seul lot sur un tableau rembourré de NaN
+        if rows:
+            lengths = np.array([len(r) for r in series])
+            padded = np.full((len(rows), lengths.max()), np.nan)
+            row_pos = np.repeat(np.arange(len(rows)), lengths)
+            col_pos = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            padded[row_pos, col_pos] = np.concatenate(series)
+            
+            quartiles = np.nanpercentile(padded, [25, 75], axis=1)
+            temporal_features[rows, :6] = np.column_stack([
+                np.nanmean(padded, axis=1),
+                np.nanstd(padded, axis=1),
+                np.nanmin(padded, axis=1),
+                np.nanmax(padded, axis=1),
+                quartiles[0],
+                quartiles[1]
+            ])
+        
+        return temporal_features
 
     def _combine_features_with_alignment(self, base_features: np.ndarray, 
                                         alt_features: Optional[np.ndarray],
@@ -335,9 +366,263 @@ class ETFGraphProcessor:
             
         min_vals = np.min(features, axis=0)
         max_vals = np.max(features, axis=0)
+        
+        # Bornes conservées pour normaliser les mises à jour incrémentales
+        self.feature_stats = {'min': min_vals, 'max': max_vals}
+        
+        return (features - min_vals) / self._feature_ranges(min_vals, max_vals)
+
+    @staticmethod
+    def _feature_ranges(min_vals: np.ndarray, max_vals: np.ndarray) -> np.ndarray:
+        """Étendues par colonne (1.0 pour les colonnes constantes)"""
         ranges = max_vals - min_vals
         
         # Éviter la division par zéro
         ranges[ranges == 0] = 1.0
+        return ranges
+
+    # ------------------------------------------------------------------
+    # Mises à jour incrémentales d'un graphe existant
+    # ------------------------------------------------------------------
+
+    def apply_delta(self, graph_data: Data, added: Optional[List[Dict[str, Any]]] = None,
+                    updated: Optional[List[Dict[str, Any]]] = None,
+                    removed: Optional[List[int]] = None) -> Data:
+        """Applique un rafraîchissement partiel (ajouts, mises à jour, suppressions) au graphe.
+
+        Le coût dépend de la taille du delta et non de l'univers complet, à l'exception
+        des suppressions qui recompactent les indices de nœuds.
+        """
+        if removed:
+            graph_data = self.remove_etfs(graph_data, removed)
+        if updated:
+            graph_data = self.update_etfs(graph_data, updated)
+        if added:
+            graph_data = self.add_etfs(graph_data, added)
+        return graph_data
+
+    @staticmethod
+    def _bump_version(graph_data: Data) -> Data:
+        """Nouvelle version du graphe après modification (invalide les caches d'embeddings)"""
+        graph_data.version = graph_fingerprint(graph_data)
+        return graph_data
+
+    def add_etfs(self, graph_data: Data, etf_data: List[Dict[str, Any]]) -> Data:
+        """Ajoute de nouveaux ETFs (et leurs actifs inconnus) en fin de graphe"""
+        if self._etf_accessors is None:
+            self._compile_accessors()
+        
+        new_etfs = []
+        for etf in etf_data:
+            etf_id = self._parse_etf_id(etf)
+            if etf_id is None:
+                continue
+            if etf_id in self.etf_node_indices:
+                logger.warning(f"ETF {etf_id} already in graph, use update_etfs instead")
+                continue
+            new_etfs.append((etf_id, etf))
+        if not new_etfs:
+            return graph_data
+        
+        # Nœuds ETF ajoutés à la suite des nœuds existants
+        first_idx = graph_data.num_nodes
+        raw_rows = self._etf_raw_rows([etf for _, etf in new_etfs])
+        for offset, (etf_id, etf) in enumerate(new_etfs):
+            self.etf_node_indices[etf_id] = first_idx + offset
+            self.etf_records[etf_id] = etf
+        
+        graph_data.x = torch.cat([graph_data.x, self._normalize_rows(graph_data, raw_rows)])
+        graph_data.etf_ids = list(graph_data.etf_ids) + [etf_id for etf_id, _ in new_etfs]
+        graph_data.etf_index = torch.cat([
+            self._etf_index(graph_data),
+            torch.arange(first_idx, first_idx + len(new_etfs), device=graph_data.x.device)
+        ])
+        if getattr(graph_data, 'temporal_features', None) is not None:
+            graph_data.temporal_features = torch.cat([
+                graph_data.temporal_features,
+                torch.as_tensor(self._temporal_rows(new_etfs), device=graph_data.temporal_features.device)
+            ])
+        
+        for etf_id, etf in new_etfs:
+            self._append_holdings(graph_data, self.etf_node_indices[etf_id], self._valid_holdings(etf))
+        
+        logger.info(f"Added {len(new_etfs)} ETFs, graph now has {graph_data.num_nodes} nodes")
+        return self._bump_version(graph_data)
+
+    def update_etfs(self, graph_data: Data, etf_data: List[Dict[str, Any]]) -> Data:
+        """Met à jour les features et les holdings d'ETFs déjà présents dans le graphe"""
+        if self._etf_accessors is None:
+            self._compile_accessors()
+        
+        changed = []
+        for etf in etf_data:
+            etf_id = self._parse_etf_id(etf)
+            if etf_id is None:
+                continue
+            if etf_id not in self.etf_node_indices:
+                logger.warning(f"ETF {etf_id} not in graph, use add_etfs instead")
+                continue
+            self.etf_records[etf_id] = etf
+            changed.append((etf_id, etf))
+        if not changed:
+            return graph_data
+        
+        # Features des nœuds ETF réécrites en place
+        nodes = torch.tensor([self.etf_node_indices[etf_id] for etf_id, _ in changed], device=graph_data.x.device)
+        raw_rows = self._etf_raw_rows([etf for _, etf in changed])
+        graph_data.x[nodes] = self._normalize_rows(graph_data, raw_rows)
+        
+        if getattr(graph_data, 'temporal_features', None) is not None:
+            etf_positions = {etf_id: pos for pos, etf_id in enumerate(graph_data.etf_ids)}
+            rows = torch.tensor([etf_positions[etf_id] for etf_id, _ in changed],
+                                device=graph_data.temporal_features.device)
+            graph_data.temporal_features[rows] = torch.as_tensor(
+                self._temporal_rows(changed), device=graph_data.temporal_features.device)
+        
+        # Holdings: anciennes arêtes des ETFs modifiés remplacées par les nouvelles
+        old_assets = self._drop_outgoing_edges(graph_data, nodes)
+        for etf_id, etf in changed:
+            self._append_holdings(graph_data, self.etf_node_indices[etf_id], self._valid_holdings(etf))
+        
+        orphans = self._orphan_assets(graph_data, old_assets)
+        if orphans.numel():
+            graph_data = self._drop_nodes(graph_data, orphans)
+        
+        logger.info(f"Updated {len(changed)} ETFs")
+        return self._bump_version(graph_data)
+
+    def remove_etfs(self, graph_data: Data, etf_ids: List[int]) -> Data:
+        """Retire des ETFs ainsi que les actifs qui ne sont plus détenus"""
+        nodes = [self.etf_node_indices[int(etf_id)] for etf_id in etf_ids if int(etf_id) in self.etf_node_indices]
+        if not nodes:
+            return graph_data
+        
+        nodes = torch.tensor(nodes, device=graph_data.x.device)
+        old_assets = self._drop_outgoing_edges(graph_data, nodes)
+        drop = torch.cat([nodes, self._orphan_assets(graph_data, old_assets)])
+        
+        graph_data = self._drop_nodes(graph_data, drop)
+        logger.info(f"Removed {len(nodes)} ETFs, graph now has {graph_data.num_nodes} nodes")
+        return self._bump_version(graph_data)
+
+    def _etf_index(self, graph_data: Data) -> torch.Tensor:
+        """Positions des nœuds ETF alignées sur graph_data.etf_ids"""
+        etf_index = getattr(graph_data, 'etf_index', None)
+        if etf_index is None:
+            etf_index = torch.arange(len(graph_data.etf_ids), device=graph_data.x.device)
+        return etf_index
+
+    def _etf_raw_rows(self, etfs: List[Dict[str, Any]]) -> np.ndarray:
+        """Features brutes (avant normalisation) de nouveaux nœuds ETF"""
+        num_base = len(self._etf_accessors) + len(self._asset_accessors)
+        num_alt = 3 if self.config.use_alternative_data else 0
+        rows = np.zeros((len(etfs), num_base + num_alt), dtype=np.float32)
+        for row, etf in zip(rows, etfs):
+            self._fill_etf_row(row, etf)
+            if num_alt:
+                self._fill_alternative_row(row[num_base:], etf, etf.get('etfId'))
+        return rows
+
+    def _normalize_rows(self, graph_data: Data, raw_rows: np.ndarray) -> torch.Tensor:
+        """Normalise de nouvelles lignes avec les bornes courantes, en les élargissant si besoin.
+
+        Si les bornes changent, les features existantes sont réajustées par une
+        transformation affine en place. Les bornes ne se resserrent jamais: seule
+        une reconstruction complète les recalcule.
+        """
+        if not self.config.normalize_features or not self.feature_stats or not len(raw_rows):
+            return torch.as_tensor(raw_rows, device=graph_data.x.device)
+        
+        old_min, old_max = self.feature_stats['min'], self.feature_stats['max']
+        new_min = np.minimum(old_min, raw_rows.min(axis=0))
+        new_max = np.maximum(old_max, raw_rows.max(axis=0))
+        new_ranges = self._feature_ranges(new_min, new_max)
+        
+        if not (np.array_equal(new_min, old_min) and np.array_equal(new_max, old_max)):
+            old_ranges = self._feature_ranges(old_min, old_max)
+            scale = torch.as_tensor(old_ranges / new_ranges, device=graph_data.x.device)
+            shift = torch.as_tensor((old_min - new_min) / new_ranges, device=graph_data.x.device)
+            graph_data.x.mul_(scale).add_(shift)
+            self.feature_stats = {'min': new_min, 'max': new_max}
+        
+        return torch.as_tensor((raw_rows - new_min) / new_ranges, dtype=torch.float32, device=graph_data.x.device)
+
+    def _append_holdings(self, graph_data: Data, etf_idx: int, holdings: List[Dict[str, Any]]) -> None:
+        """Ajoute les arêtes d'un ETF, en créant les nœuds d'actifs manquants"""
+        if not holdings:
+            return
+        
+        new_assets = {}
+        for holding in holdings:
+            asset_id = holding['assetId']
+            if asset_id not in self.asset_node_indices and asset_id not in new_assets:
+                new_assets[asset_id] = holding
+        
+        if new_assets:
+            first_idx = graph_data.num_nodes
+            raw_rows = np.zeros((len(new_assets), graph_data.x.shape[1]), dtype=np.float32)
+            for offset, (asset_id, holding) in enumerate(new_assets.items()):
+                self.asset_node_indices[asset_id] = first_idx + offset
+                self._fill_asset_row(raw_rows[offset], holding)
+            graph_data.x = torch.cat([graph_data.x, self._normalize_rows(graph_data, raw_rows)])
+            graph_data.asset_ids = list(graph_data.asset_ids) + list(new_assets)
+        
+        edge_index = np.empty((2, len(holdings)), dtype=np.int64)
+        edge_attr = np.zeros((len(holdings), len(self._edge_accessors)), dtype=np.float32)
+        for pos, holding in enumerate(holdings):
+            edge_index[0, pos] = etf_idx
+            edge_index[1, pos] = self.asset_node_indices[holding['assetId']]
+            self._fill_edge_attr(edge_attr[pos], holding)
+        
+        device = graph_data.edge_index.device
+        graph_data.edge_index = torch.cat([graph_data.edge_index, torch.from_numpy(edge_index).to(device)], dim=1)
+        if graph_data.edge_attr is not None:
+            graph_data.edge_attr = torch.cat([graph_data.edge_attr, torch.from_numpy(edge_attr).to(device)])
+
+    @staticmethod
+    def _drop_outgoing_edges(graph_data: Data, nodes: torch.Tensor) -> torch.Tensor:
+        """Supprime les arêtes partant des nœuds donnés et retourne les actifs touchés"""
+        outgoing = torch.isin(graph_data.edge_index[0], nodes.to(graph_data.edge_index.device))
+        touched = graph_data.edge_index[1, outgoing].unique()
+        graph_data.edge_index = graph_data.edge_index[:, ~outgoing]
+        if graph_data.edge_attr is not None:
+            graph_data.edge_attr = graph_data.edge_attr[~outgoing]
+        return touched
+
+    @staticmethod
+    def _orphan_assets(graph_data: Data, candidates: torch.Tensor) -> torch.Tensor:
+        """Parmi les actifs candidats, ceux qui n'ont plus aucune arête entrante"""
+        if not candidates.numel():
+            return candidates
+        return candidates[~torch.isin(candidates, graph_data.edge_index[1])]
+
+    def _drop_nodes(self, graph_data: Data, nodes: torch.Tensor) -> Data:
+        """Supprime des nœuds et recompacte indices, arêtes et tables d'index"""
+        device = graph_data.x.device
+        keep = torch.ones(graph_data.num_nodes, dtype=torch.bool, device=device)
+        keep[nodes.to(device)] = False
+        remap = torch.cumsum(keep, dim=0) - 1
+        
+        edge_keep = keep[graph_data.edge_index[0]] & keep[graph_data.edge_index[1]]
+        graph_data.edge_index = remap[graph_data.edge_index[:, edge_keep]]
+        if graph_data.edge_attr is not None:
+            graph_data.edge_attr = graph_data.edge_attr[edge_keep]
+        graph_data.x = graph_data.x[keep]
+        
+        etf_index = self._etf_index(graph_data)
+        etf_keep = keep[etf_index]
+        graph_data.etf_index = remap[etf_index[etf_keep]]
+        graph_data.etf_ids = [etf_id for etf_id, kept in zip(graph_data.etf_ids, etf_keep.tolist()) if kept]
+        if getattr(graph_data, 'temporal_features', None) is not None:
+            graph_data.temporal_features = graph_data.temporal_features[etf_keep.to(graph_data.temporal_features.device)]
         
-        return (features - min_vals) / ranges
\ No newline at end of file
+        keep_list, remap_list = keep.tolist(), remap.tolist()
+        for etf_id in [etf_id for etf_id, idx in self.etf_node_indices.items() if not keep_list[idx]]:
+            del self.etf_node_indices[etf_id]
+            self.etf_records.pop(etf_id, None)
+        self.etf_node_indices = {etf_id: remap_list[idx] for etf_id, idx in self.etf_node_indices.items()}
+        self.asset_node_indices = {
+            asset_id: remap_list[idx] for asset_id, idx in self.asset_node_indices.items() if keep_list[idx]
+        }
+        graph_data.asset_ids = [asset_id for asset_id in graph_data.asset_ids if asset_id in self.asset_node_indices]
+        return graph_data
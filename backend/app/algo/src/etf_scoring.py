@@ -2,7 +2,7 @@ import pandas as pd
 import numpy as np
 import torch
 import logging
-from sklearn.feature_selection import SelectKBest, f_regression
+from typing import Optional
 from config import REQUIRED_COLUMNS, COLUMN_MAPPING
 
 logger = logging.getLogger(__name__)
@@ -19,8 +19,14 @@ class ETFScoring:
         'A': (0.8, 0.9),
         'A+': (0.9, 1.0)
     }
+    # Notes triées par borne basse: np.digitize sur les bornes internes donne le code de la note
+    RATING_LABELS, RATING_BOUNDS = zip(*sorted(RATING_SCALE.items(), key=lambda item: item[1][0]))
+    RATING_LABELS, RATING_BOUNDS = list(RATING_LABELS), np.array(RATING_BOUNDS)
+    RATING_EDGES = RATING_BOUNDS[1:, 0]
+    RATING_DTYPE = pd.CategoricalDtype(RATING_LABELS, ordered=True)
     
-    def __init__(self, model, device, monitor, gnn_model, feature_selector, input_dim=25):
+    def __init__(self, model, device, monitor, gnn_model, feature_selector, input_dim=25,
+                 graph_data=None, embedding_cache=None):
         """Args:
             model: modèle principal PyTorch
             device: device d'exécution (cpu ou cuda)
@@ -28,12 +34,16 @@ class ETFScoring:
             gnn_model: modèle GNN optionnel
             feature_selector: sélectionneur de features sklearn
             input_dim: nombre de features sélectionnées
+            graph_data: graphe ETF/actifs requis pour le score GNN
+            embedding_cache: ETFEmbeddingCache optionnel (lecture de lignes au lieu d'un forward GNN)
         """
         self.model = model
         self.device = device
         self.monitor = monitor
         self.gnn_model = gnn_model
         self.features_df = feature_selector 
+        self.graph_data = graph_data
+        self.embedding_cache = embedding_cache
 
 
     def predict(self, X: pd.DataFrame) -> pd.DataFrame:
@@ -41,24 +51,17 @@ class ETFScoring:
         Hypothèse: self.features_df contient toutes les colonnes numériques nettoyées et prêtes. """
         self.monitor.log_operation_start('prediction')
         try:
-            X = self.features_df.copy()
-
-            # Remplacer les NaN par la médiane (si besoin)
-            for col in X.columns:
-                if X[col].isnull().any():
-                    median_val = X[col].median()
-                    X[col] = X[col].fillna(median_val)
-                    logger.info(f"NaN remplacés dans {col} par médiane: {median_val:.2f}")
+            # Remplacer les NaN par la médiane de leur colonne (si besoin)
+            values = self._fill_median(self.features_df.to_numpy(dtype=np.float32, copy=True))
 
             # Conversion en tenseur PyTorch
-            X_tensor = torch.tensor(X.values.astype(np.float32), device=self.device)
+            X_tensor = torch.from_numpy(values).to(self.device)
 
             with torch.no_grad():
                 raw_scores_main = self.model(X_tensor).cpu().numpy().flatten()
 
-            if self.gnn_model:
-                with torch.no_grad():
-                    raw_scores_gnn = self.gnn_model(X_tensor).cpu().numpy().flatten()
+            raw_scores_gnn = self._gnn_scores() if self.gnn_model is not None else None
+            if raw_scores_gnn is not None:
                 raw_scores = (raw_scores_main + raw_scores_gnn) / 2
             else:
                 raw_scores = raw_scores_main
@@ -88,6 +91,36 @@ class ETFScoring:
 
 
     
+    def _gnn_scores(self) -> Optional[np.ndarray]:
+        """Scores du modèle sur [embeddings GNN | features du graphe] des ETFs, alignés sur features_df"""
+        if self.graph_data is None:
+            logger.debug("Pas de graphe fourni, score GNN ignoré")
+            return None
+        
+        if self.embedding_cache is not None:
+            embeddings = self.embedding_cache.get_or_compute(self.gnn_model, self.graph_data).as_tensor(
+                self.graph_data.etf_ids, self.device)
+        else:
+            embeddings = self.gnn_model.etf_embeddings(self.graph_data).to(self.device)
+        etf_index = self.gnn_model._etf_index(self.graph_data, self.graph_data.x)
+        combined = torch.cat([embeddings, self.graph_data.x[etf_index].to(self.device)], dim=1)
+        
+        # Alignement des lignes du graphe sur celles de features_df
+        graph_ids = list(self.graph_data.etf_ids)
+        if 'etfId' in self.features_df.columns:
+            positions = {etf_id: pos for pos, etf_id in enumerate(graph_ids)}
+            missing = [etf_id for etf_id in self.features_df['etfId'] if etf_id not in positions]
+            if missing:
+                logger.warning(f"{len(missing)} ETFs absents du graphe, score GNN ignoré")
+                return None
+            combined = combined[[positions[etf_id] for etf_id in self.features_df['etfId']]]
+        elif len(graph_ids) != len(self.features_df):
+            logger.warning("Nombre d'ETFs différent entre graphe et features, score GNN ignoré")
+            return None
+        
+        with torch.no_grad():
+            return self.model(combined, use_combined=True).cpu().numpy().flatten()
+
     def _normalize_scores(self, scores: np.ndarray) -> np.ndarray:
         """Normalise les scores entre 0 et 1."""
         finite = scores[np.isfinite(scores)]
@@ -98,30 +131,44 @@ class ETFScoring:
             return np.full_like(scores, 0.5)
         return np.clip((scores - min_score) / (max_score - min_score), 0, 1)
     
+    @staticmethod
+    def _fill_median(values: np.ndarray) -> np.ndarray:
+        """Remplace les NaN par la médiane de leur colonne, en une passe sur la matrice"""
+        missing = np.isnan(values)
+        if not missing.any():
+            return values
+        
+        # Médianes des seules colonnes incomplètes: tri ligne à ligne de la transposée (NaN rangés en fin)
+        incomplete = np.flatnonzero(missing.any(axis=0))
+        ordered = np.sort(np.ascontiguousarray(values[:, incomplete].T), axis=1)
+        valid = len(values) - missing[:, incomplete].sum(axis=0)
+        positions = np.arange(incomplete.size)
+        lo, hi = np.maximum((valid - 1) // 2, 0), np.minimum(valid // 2, len(values) - 1)
+        medians = (ordered[positions, lo] + ordered[positions, hi]) / 2
+        medians[valid == 0] = np.nan  # colonne entièrement NaN: inchangée
+        
+        fill = np.full(values.shape[1], np.nan, dtype=values.dtype)
+        fill[incomplete] = medians
+        np.copyto(values, fill, where=missing)
+        logger.info(f"{int(missing.sum())} NaN remplacés par la médiane dans {incomplete.size} colonnes")
+        return values
+
     def _assign_ratings(self, normalized_scores: np.ndarray) -> pd.Series:
-        """Assigne une note selon le score normalisé."""
-        ratings = []
-        for score in normalized_scores:
-            if score >= 0.9:
-                ratings.append('A+')
-            elif score >= 0.8:
-                ratings.append('A')
-            elif score >= 0.6:
-                ratings.append('B')
-            elif score >= 0.4:
-                ratings.append('C')
-            else:
-                ratings.append('D')
-        return pd.Series(ratings)
+        """Assigne une note selon le score normalisé (bornes basses incluses)."""
+        codes = np.digitize(normalized_scores, self.RATING_EDGES)
+        codes[np.isnan(normalized_scores)] = 0
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=self.RATING_DTYPE))
     
     def _validate_ratings(self, results: pd.DataFrame):
         """Vérifie la cohérence entre scores normalisés et ratings."""
-        for _, row in results.iterrows():
-            score, rating = row['normalized_score'], row['rating']
-            min_score, max_score = self.RATING_SCALE[rating]
-            if rating == 'A+':
-                if not (0.9 <= score <= 1.0):
-                    raise ValueError(f"Incohérence rating {rating} pour score {score:.4f}")
-            else:
-                if not (min_score <= score < max_score):
-                    raise ValueError(f"Incohérence rating {rating} pour score {score:.4f}")
+        ratings = results['rating'].astype(self.RATING_DTYPE)
+        codes = ratings.cat.codes.to_numpy()
+        scores = results['normalized_score'].to_numpy(dtype=np.float64)
+        lower, upper = self.RATING_BOUNDS[codes].T
+        
+        # Borne haute exclue, sauf pour la note la plus élevée
+        top = codes == len(self.RATING_LABELS) - 1
+        consistent = (codes >= 0) & (scores >= lower) & ((scores < upper) | (top & (scores <= upper)))
+        if not consistent.all():
+            i = int(np.argmin(consistent))
+            raise ValueError(f"Incohérence rating {ratings.iloc[i]} pour score {scores[i]:.4f}")
@@ -6,24 +6,64 @@ import numpy as np
 import pandas as pd
 import logging
 from typing import Dict, List, Optional, Tuple
-import shap
 import torch
 
+from attributions import ETFAttributionCache, top_k_features
+
 logger = logging.getLogger(__name__)
 
 class ETFExplanationGenerator:
     """Générateur d'explications dynamiques pour les prédictions d'ETF"""
     
-    def __init__(self, model: Optional[torch.nn.Module] = None, device: str = 'cpu'):
+    # Colonnes des seuils dynamiques (percentiles 10/90) et préfixe des clés produites
+    THRESHOLD_COLUMNS = {
+        'fundamentals.costs.ter': 'ter',
+        'fundamentals.liquidity.avgDailyVolume': 'liquidity',
+        'riskAnalysis.volatility.annualized': 'volatility'
+    }
+    
+    # Règles par catégorie: (colonne, comparaison, seuil dynamique ou constante, message)
+    EXPLANATION_RULES = {
+        'strengths': [
+            ('fundamentals.costs.ter', np.less, 'ter_low',
+             lambda ter, limit: f"Low fees (TER {ter*100:.2f}% < {limit*100:.2f}% percentile)"),
+            ('fundamentals.liquidity.avgDailyVolume', np.greater, 'liquidity_high',
+             lambda liquidity, limit: f"High liquidity ({liquidity/1e6:.1f}M > {limit/1e6:.1f}M percentile)"),
+            ('fundamentals.costs.trackingError', np.less, 0.002,
+             lambda tracking_error, limit: "Excellent tracking (error < 0.2%)"),
+        ],
+        'weaknesses': [
+            ('riskAnalysis.volatility.annualized', np.greater, 'volatility_high',
+             lambda volatility, limit: f"High volatility ({volatility:.1%} > {limit:.1%} percentile)"),
+            ('fundamentals.costs.ter', np.greater, 'ter_high',
+             lambda ter, limit: f"High fees (TER {ter*100:.2f}% > {limit*100:.2f}% percentile)"),
+            ('fundamentals.liquidity.avgDailyVolume', np.less, 'liquidity_low',
+             lambda liquidity, limit: f"Low liquidity ({liquidity/1e6:.1f}M < {limit/1e6:.1f}M percentile)"),
+        ],
+        'risk_analysis': [
+            ('riskAnalysis.drawdowns.maxDrawdown', np.less, -0.2,
+             lambda max_drawdown, limit: f"Significant drawdown risk ({max_drawdown:.1%})"),
+            ('portfolio.characteristics.topHoldingWeight', np.greater, 0.1,
+             lambda top_holding, limit: f"Concentration risk (top holding = {top_holding:.1%})"),
+        ]
+    }
+    
+    def __init__(self, model: Optional[torch.nn.Module] = None, device: str = 'cpu',
+                 attribution_method: str = 'integrated_gradients',
+                 attribution_cache: Optional[ETFAttributionCache] = None):
         """
         Args:
-            model: Modèle PyTorch pour les explications SHAP
+            model: Modèle PyTorch pour les explications (SHAP ou gradients)
             device: Device pour les calculs (cpu/cuda)
+            attribution_method: 'gradient_x_input' ou 'integrated_gradients' (sans SHAP)
+            attribution_cache: Cache des attributions partagé entre appels
         """
         self.model = model
         self.device = device
         self.explainer = None
         self.feature_stats = {}
+        self.attribution_method = attribution_method
+        self.attribution_cache = attribution_cache or ETFAttributionCache()
         
     def initialize_shap(self, background_data: pd.DataFrame) -> None:
         """Initialise l'explicateur SHAP avec des données de référence"""
@@ -31,6 +71,8 @@ class ETFExplanationGenerator:
             if not isinstance(background_data, pd.DataFrame) or background_data.empty:
                 raise ValueError("Background data must be a non-empty DataFrame")
                 
+            import shap  # chargé à la demande: import coûteux, inutile hors explications
+            
             background_tensor = torch.FloatTensor(background_data.values).to(self.device)
             self.explainer = shap.DeepExplainer(self.model, background_tensor)
             logger.info(f"SHAP explainer initialized with {len(background_data)} samples")
@@ -39,66 +81,64 @@ class ETFExplanationGenerator:
             self.explainer = None
 
     def compute_dynamic_thresholds(self, etf_data: pd.DataFrame) -> Dict[str, float]:
-        """Calcule les seuils dynamiques basés sur les percentiles"""
-        required_columns = {
-            'fundamentals.costs.ter',
-            'fundamentals.liquidity.avgDailyVolume',
-            'riskAnalysis.volatility.annualized'
-        }
-        
-        missing = required_columns - set(etf_data.columns)
+        """Calcule les seuils dynamiques basés sur les percentiles (un seul nanpercentile)"""
+        missing = set(self.THRESHOLD_COLUMNS) - set(etf_data.columns)
         if missing:
             raise ValueError(f"Missing required columns for thresholds: {missing}")
         
-        return {
-            'ter_low': np.percentile(etf_data['fundamentals.costs.ter'], 10),
-            'ter_high': np.percentile(etf_data['fundamentals.costs.ter'], 90),
-            'liquidity_low': np.percentile(etf_data['fundamentals.liquidity.avgDailyVolume'], 10),
-            'liquidity_high': np.percentile(etf_data['fundamentals.liquidity.avgDailyVolume'], 90),
-            'volatility_low': np.percentile(etf_data['riskAnalysis.volatility.annualized'], 10),
-            'volatility_high': np.percentile(etf_data['riskAnalysis.volatility.annualized'], 90),
-        }
+        values = etf_data[list(self.THRESHOLD_COLUMNS)].to_numpy(dtype=np.float64)
+        low, high = np.nanpercentile(values, [10, 90], axis=0)
+        thresholds = {}
+        for i, name in enumerate(self.THRESHOLD_COLUMNS.values()):
+            thresholds[f'{name}_low'] = low[i]
+            thresholds[f'{name}_high'] = high[i]
+        return thresholds
 
-    def generate_shap_insights(self, features: pd.DataFrame, n_features: int = 3) -> Tuple[List[str], List[str]]:
-        """Génère des insights basés sur les valeurs SHAP"""
-        if self.explainer is None or not hasattr(self.explainer, 'shap_values'):
-            return [], []
-            
-        try:
-            shap_values = self.explainer.shap_values(features.values)
+    def compute_attributions(self, features: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """Contributions des features au score: SHAP si l'explicateur est initialisé,
+        sinon attributions par gradient (mises en cache par version du modèle)"""
+        if self.explainer is not None and hasattr(self.explainer, 'shap_values'):
+            features_tensor = torch.tensor(features.to_numpy(np.float32), device=self.device)
+            shap_values = self.explainer.shap_values(features_tensor)
             if isinstance(shap_values, list):
                 shap_values = shap_values[0]  # Prend le premier output pour les modèles multi-output
-                
-            feature_names = features.columns.tolist()
-            
-            # Analyse pour chaque échantillon
-            all_pos, all_neg = [], []
-            for i in range(len(features)):
-                top_pos = np.argsort(-shap_values[i])[:n_features]
-                top_neg = np.argsort(shap_values[i])[:n_features]
-                
-                pos = [f"{feature_names[j]}(+{shap_values[i][j]:.2f})" for j in top_pos]
-                neg = [f"{feature_names[j]}(-{abs(shap_values[i][j]):.2f})" for j in top_neg]
-                
-                all_pos.append(", ".join(pos))
-                all_neg.append(", ".join(neg))
-                
-            return all_pos, all_neg
+            return pd.DataFrame(np.asarray(shap_values).reshape(features.shape),
+                                index=features.index, columns=features.columns)
+        if self.model is None:
+            return None
+        return self.attribution_cache.get_or_compute(self.model, features, method=self.attribution_method)
+
+    def generate_shap_insights(self, features: pd.DataFrame, n_features: int = 3) -> Tuple[List[str], List[str]]:
+        """Génère des insights basés sur les contributions des features (SHAP ou gradients)"""
+        try:
+            attributions = self.compute_attributions(features)
+            if attributions is None:
+                return [], []
+            return self.format_top_features(attributions, n_features)
             
         except Exception as e:
             logger.error(f"SHAP explanation failed: {str(e)}")
             return [], []
 
+    @staticmethod
+    def format_top_features(attributions: pd.DataFrame, n_features: int = 3) -> Tuple[List[str], List[str]]:
+        """Top contributions positives et négatives de chaque ligne, au format 'feature(+0.12)'"""
+        values = attributions.to_numpy()
+        top_pos, top_neg = top_k_features(values, n_features)
+        rows = np.arange(len(values))[:, None]
+        names = np.asarray(attributions.columns, dtype=object)
+
+        pos_names, pos_values = names[top_pos], values[rows, top_pos]
+        neg_names, neg_values = names[top_neg], np.abs(values[rows, top_neg])
+        all_pos = [", ".join(f"{name}(+{value:.2f})" for name, value in zip(*row))
+                   for row in zip(pos_names, pos_values)]
+        all_neg = [", ".join(f"{name}(-{value:.2f})" for name, value in zip(*row))
+                   for row in zip(neg_names, neg_values)]
+        return all_pos, all_neg
+
     def generate_explanations(self, etf_data: pd.DataFrame, scores: np.ndarray, 
                             prepared_features: Optional[pd.DataFrame] = None) -> Dict[str, List[str]]:
-        """Génère des explications complètes pour chaque ETF"""
-        explanations = {
-            'strengths': [],
-            'weaknesses': [],
-            'model_insights': [],
-            'risk_analysis': []
-        }
-        
+        """Génère des explications complètes pour chaque ETF (règles évaluées par colonne sur toute la frame)"""
         try:
             # 1. Calcul des seuils dynamiques
             thresholds = self.compute_dynamic_thresholds(etf_data)
@@ -108,22 +148,19 @@ class ETFExplanationGenerator:
             if prepared_features is not None:
                 shap_pos, shap_neg = self.generate_shap_insights(prepared_features)
             
-            # 3. Génération pour chaque ETF
-            for idx, (_, row) in enumerate(etf_data.iterrows()):
-                # Points forts dynamiques
-                strengths = self._generate_strengths(row, thresholds)
-                
-                # Points faibles dynamiques
-                weaknesses = self._generate_weaknesses(row, thresholds)
-                
-                # Analyse de risque avancée
-                risk_analysis = self._generate_risk_analysis(row)
-                
-                explanations['strengths'].append(" | ".join(strengths) or "No significant strengths")
-                explanations['weaknesses'].append(" | ".join(weaknesses) or "No significant weaknesses")
-                explanations['model_insights'].append(
-                    f"Model highlights: {shap_pos[idx]}" if idx < len(shap_pos) else "")
-                explanations['risk_analysis'].append(" | ".join(risk_analysis) or "No significant risk factors")
+            # 3. Règles de seuil sous forme de masques booléens
+            texts = {category: self._apply_rules(etf_data, rules, thresholds)
+                     for category, rules in self.EXPLANATION_RULES.items()}
+            
+            num_etfs = len(etf_data)
+            explanations = {
+                'strengths': np.where(texts['strengths'] == '', "No significant strengths", texts['strengths']).tolist(),
+                'weaknesses': np.where(texts['weaknesses'] == '', "No significant weaknesses", texts['weaknesses']).tolist(),
+                'model_insights': [f"Model highlights: {text}" for text in shap_pos[:num_etfs]]
+                                  + [""] * max(0, num_etfs - len(shap_pos)),
+                'risk_analysis': np.where(texts['risk_analysis'] == '', "No significant risk factors",
+                                          texts['risk_analysis']).tolist()
+            }
                 
         except Exception as e:
             logger.error(f"Explanation generation error: {str(e)}")
@@ -131,65 +168,20 @@ class ETFExplanationGenerator:
             
         return explanations
 
-    def _generate_strengths(self, row: pd.Series, thresholds: Dict) -> List[str]:
-        """Génère les points forts spécifiques"""
-        strengths = []
-        
-        # Analyse des frais
-        ter = row.get('fundamentals.costs.ter', float('nan'))
-        if not np.isnan(ter) and ter < thresholds['ter_low']:
-            strengths.append(
-                f"Low fees (TER {ter*100:.2f}% < {thresholds['ter_low']*100:.2f}% percentile)")
-        
-        # Analyse de liquidité
-        liquidity = row.get('fundamentals.liquidity.avgDailyVolume', float('nan'))
-        if not np.isnan(liquidity) and liquidity > thresholds['liquidity_high']:
-            strengths.append(
-                f"High liquidity ({liquidity/1e6:.1f}M > {thresholds['liquidity_high']/1e6:.1f}M percentile)")
-        
-        # Analyse de tracking error
-        tracking_error = row.get('fundamentals.costs.trackingError', float('nan'))
-        if not np.isnan(tracking_error) and tracking_error < 0.002:
-            strengths.append("Excellent tracking (error < 0.2%)")
-            
-        return strengths
-
-    def _generate_weaknesses(self, row: pd.Series, thresholds: Dict) -> List[str]:
-        """Génère les points faibles spécifiques"""
-        weaknesses = []
-        
-        # Analyse de volatilité
-        volatility = row.get('riskAnalysis.volatility.annualized', float('nan'))
-        if not np.isnan(volatility) and volatility > thresholds['volatility_high']:
-            weaknesses.append(
-                f"High volatility ({volatility:.1%} > {thresholds['volatility_high']:.1%} percentile)")
-        
-        # Analyse des frais élevés
-        ter = row.get('fundamentals.costs.ter', float('nan'))
-        if not np.isnan(ter) and ter > thresholds['ter_high']:
-            weaknesses.append(
-                f"High fees (TER {ter*100:.2f}% > {thresholds['ter_high']*100:.2f}% percentile)")
-        
-        # Analyse de liquidité faible
-        liquidity = row.get('fundamentals.liquidity.avgDailyVolume', float('nan'))
-        if not np.isnan(liquidity) and liquidity < thresholds['liquidity_low']:
-            weaknesses.append(
-                f"Low liquidity ({liquidity/1e6:.1f}M < {thresholds['liquidity_low']/1e6:.1f}M percentile)")
-            
-        return weaknesses
-
-    def _generate_risk_analysis(self, row: pd.Series) -> List[str]:
-        """Génère l'analyse de risque avancée"""
-        risks = []
-        
-        # Risque de drawdown
-        max_drawdown = row.get('riskAnalysis.drawdowns.maxDrawdown', float('nan'))
-        if not np.isnan(max_drawdown) and max_drawdown < -0.2:
-            risks.append(f"Significant drawdown risk ({max_drawdown:.1%})")
-        
-        # Risque de concentration
-        top_holding = row.get('portfolio.characteristics.topHoldingWeight', float('nan'))
-        if not np.isnan(top_holding) and top_holding > 0.1:
-            risks.append(f"Concentration risk (top holding = {top_holding:.1%})")
-            
-        return risks
\ No newline at end of file
+    @staticmethod
+    def _apply_rules(etf_data: pd.DataFrame, rules: List[Tuple], thresholds: Dict) -> np.ndarray:
+        """Messages joints par ' | ' pour chaque ETF; le texte n'est formaté que pour les cellules signalées"""
+        texts = np.full(len(etf_data), '', dtype=object)
+        for column, compare, threshold, message in rules:
+            if column not in etf_data.columns:
+                continue
+            limit = thresholds[threshold] if isinstance(threshold, str) else threshold
+            values = etf_data[column].to_numpy(dtype=np.float64)
+            with np.errstate(invalid='ignore'):
+                flagged = np.flatnonzero(compare(values, limit))  # NaN jamais signalé
+            if not flagged.size:
+                continue
+            separators = np.where(texts[flagged] == '', '', ' | ')
+            texts[flagged] = texts[flagged] + separators + np.array(
+                [message(value, limit) for value in values[flagged]], dtype=object)
+        return texts
@@ -4,10 +4,20 @@ import torch.nn.functional as F
 from torch_geometric.nn import GATConv
 from torch_geometric.data import Data
 import logging 
+from typing import Optional, Sequence, Tuple
+
+from neighbor_sampler import ETFNeighborSampler
 
 logger = logging.getLogger(__name__)
 
 class ETFGraphModel(nn.Module):
+    # Modes de calcul des corrélations entre embeddings dans forward():
+    #   'dense' -> matrice N×N triangulaire sur tous les nœuds (ETFs et actifs)
+    #   'etf'   -> matrice triangulaire restreinte aux nœuds ETF
+    #   'topk'  -> (scores, indices) des k plus proches ETFs, par blocs
+    #   None    -> pas de calcul
+    CORRELATION_MODES = ('dense', 'etf', 'topk', None)
+
     def __init__(self, input_dim: int, hidden_dim: int = 64, heads: int = 3, dropout: float = 0.1):
         super().__init__()
         self.hidden_dim = hidden_dim
@@ -44,10 +54,18 @@ class ETFGraphModel(nn.Module):
                 nn.init.constant_(m.bias, 0)
 
 
-    def forward(self, graph_data):
-        """Forward pass avec validation des dimensions"""
+    def forward(self, graph_data, correlation_mode: Optional[str] = 'dense', top_k: int = 10,
+                chunk_size: int = 1024):
+        """Forward pass avec validation des dimensions
+        Args:
+            graph_data: Graphe PyG (x, edge_index, etf_index optionnel)
+            correlation_mode: voir CORRELATION_MODES
+            top_k: nombre de voisins par ETF en mode 'topk'
+            chunk_size: nombre d'ETFs par bloc de produit matriciel en mode 'topk'"""
         if not hasattr(graph_data, 'x') or not hasattr(graph_data, 'edge_index'):
             raise ValueError("GraphData doit contenir 'x' et 'edge_index'")
+        if correlation_mode not in self.CORRELATION_MODES:
+            raise ValueError(f"correlation_mode inconnu: {correlation_mode}")
             
         x, edge_index = graph_data.x, graph_data.edge_index
         
@@ -65,16 +83,26 @@ class ETFGraphModel(nn.Module):
         x = x.squeeze(0)
 
         # Calcul des sortie
-        corr_matrix = self._compute_correlations(x)
+        if correlation_mode == 'dense':
+            corr_matrix = self._compute_correlations(x)
+        elif correlation_mode == 'etf':
+            corr_matrix = self._compute_correlations(x[self._etf_index(graph_data, x)])
+        elif correlation_mode == 'topk':
+            corr_matrix = self.etf_neighbors(x, self._etf_index(graph_data, x), top_k, chunk_size)
+        else:
+            corr_matrix = None
         mu_sigma = self.uncertainty_head(x)
         mu, sigma = mu_sigma.chunk(2, dim=1)
 
         return x, corr_matrix, mu, sigma
 
-    def train(self, graph_data: Data, targets: torch.Tensor, downstream_model: nn.Module,
-              loss_fn: nn.Module, optimizer: torch.optim.Optimizer, device: torch.device,
+    def train(self, graph_data: Data = True, targets: torch.Tensor = None, downstream_model: nn.Module = None,
+              loss_fn: nn.Module = None, optimizer: torch.optim.Optimizer = None, device: torch.device = None,
               memory_optimizer=None) -> dict:
-        """Entraînement avec gestion flexible du modèle downstream"""
+        """Entraînement avec gestion flexible du modèle downstream.
+        Appelée avec un booléen (model.train(False), model.eval()), bascule seulement le mode."""
+        if isinstance(graph_data, bool):
+            return super().train(graph_data)
         
         try: 
             # Validation de base
@@ -91,39 +119,31 @@ class ETFGraphModel(nn.Module):
             if targets.dim() == 1:
                 targets = targets.view(-1, 1)
 
-            # Forward pass
-            embeddings, corr, mu, sigma = self.forward(graph_data)
+            # Forward pass (la corrélation moyenne est obtenue sans matrice N×N)
+            embeddings, _, mu, sigma = self.forward(graph_data, correlation_mode=None)
             
             # Vérification des dimensions
             if embeddings.shape[0] != graph_data.x.shape[0]:
                 raise ValueError("Incohérence entre embeddings et features")
 
-            # Combinaison des features
+            # Combinaison des features (restreinte aux nœuds ETF si leur position est connue)
             combined = torch.cat([embeddings, graph_data.x], dim=1)
+            etf_index = getattr(graph_data, 'etf_index', None)
+            if etf_index is not None:
+                combined = combined[etf_index]
             
             # Entraînement
             for param in self.parameters():
                 param.grad = None 
 
-            # Appel flexible au modèle downstream
-            if hasattr(downstream_model, 'encoder'):
-                preds = downstream_model(combined)
-            else:
-                preds = downstream_model(combined, use_combined=True)
-            
-            # Ajustement des dimensions si nécessaire
-            if preds.dim() == 1 and targets.dim() == 2:
-                preds = preds.unsqueeze(1)
-            elif preds.dim() == 2 and targets.dim() == 1:
-                targets = targets.unsqueeze(1)
-
+            preds = self._downstream_predict(downstream_model, combined)
             loss = loss_fn(preds, targets)
             loss.backward()
             optimizer.step()
             
             return {
                 "gnn_loss": float(loss.item()),
-                "correlation": float(corr.mean().item()),
+                "correlation": float(self._mean_correlation(embeddings.detach()).item()),
                 "mu": float(mu.mean().item()),
                 "sigma": float(sigma.mean().item())
             }
@@ -132,19 +152,165 @@ class ETFGraphModel(nn.Module):
             if memory_optimizer:
                 memory_optimizer.clear_tensors()
 
+    def train_minibatch(self, graph_data: Data, targets: torch.Tensor, downstream_model: nn.Module,
+                        loss_fn: nn.Module, optimizer: torch.optim.Optimizer, device: torch.device,
+                        epochs: int = 1, batch_size: int = 512, fan_out: Sequence[int] = (10, 5),
+                        undirected: bool = False, seed: Optional[int] = None,
+                        num_shards: int = 1, shard: int = 0) -> dict:
+        """Entraînement par mini-batchs de sous-graphes échantillonnés autour des ETFs.
+        Le coût par pas est borné par batch_size × Π fan_out, indépendamment de la taille du graphe.
+        Args:
+            targets: Cibles alignées sur les nœuds ETF (ordre de etf_index)
+            epochs: Nombre de passages complets sur les ETFs graines
+            batch_size: Nombre d'ETFs graines par mini-batch
+            fan_out: Nombre max de voisins échantillonnés par saut
+            undirected: Échantillonne aussi les voisins sortants
+            seed: Graine pour l'ordre des batchs et l'échantillonnage
+            num_shards, shard: Partition des graines entre processus (entraînement distribué,
+                même seed sur tous les rangs); chaque rang reçoit le même nombre de batchs"""
+        if not isinstance(graph_data, Data):
+            raise TypeError("graph_data doit être un objet Data")
+        if not isinstance(targets, torch.Tensor):
+            raise TypeError("targets doit être un Tensor")
+        if epochs <= 0 or batch_size <= 0:
+            raise ValueError("epochs et batch_size doivent être positifs")
+        
+        # L'échantillonnage se fait sur CPU, seuls les sous-graphes sont transférés
+        graph_data = graph_data.cpu()
+        etf_index = self._etf_index(graph_data, graph_data.x)
+        targets = targets.detach().cpu().float().view(-1, 1)
+        if targets.shape[0] != etf_index.numel():
+            raise ValueError(f"targets doit contenir une cible par nœud ETF "
+                             f"({etf_index.numel()}), reçu {targets.shape[0]}")
+        num_seeds = etf_index.numel()
+        
+        sampler = ETFNeighborSampler(graph_data.edge_index, graph_data.num_nodes, fan_out,
+                                     undirected=undirected, seed=seed)
+        generator = torch.Generator().manual_seed(seed) if seed is not None else None
+        per_shard = -(-num_seeds // num_shards)
+        
+        history = []
+        for epoch in range(epochs):
+            totals = {"gnn_loss": 0.0, "correlation": 0.0, "mu": 0.0, "sigma": 0.0}
+            order = torch.randperm(num_seeds, generator=generator)
+            if num_shards > 1:
+                # Comme DistributedSampler: complétion par bouclage puis une graine sur num_shards
+                order = order.repeat(-(-per_shard * num_shards // num_seeds))[:per_shard * num_shards]
+                order = order[shard::num_shards]
+            for start in range(0, len(order), batch_size):
+                positions = order[start:start + batch_size]
+                batch = sampler.sample(etf_index[positions], graph_data).to(device)
+                batch_targets = targets[positions].to(device)
+                
+                embeddings, _, mu, sigma = self.forward(batch, correlation_mode=None)
+                seeds = slice(0, batch.batch_size)
+                combined = torch.cat([embeddings[seeds], batch.x[seeds]], dim=1)
+                
+                optimizer.zero_grad()
+                preds = self._downstream_predict(downstream_model, combined)
+                loss = loss_fn(preds, batch_targets)
+                loss.backward()
+                optimizer.step()
+                
+                weight = len(positions) / len(order)
+                totals["gnn_loss"] += float(loss.item()) * weight
+                totals["correlation"] += float(self._mean_correlation(embeddings[seeds].detach()).item()) * weight
+                totals["mu"] += float(mu[seeds].mean().item()) * weight
+                totals["sigma"] += float(sigma[seeds].mean().item()) * weight
+            
+            history.append(totals)
+            logger.debug(f"GNN mini-batch epoch {epoch + 1}/{epochs}: loss={totals['gnn_loss']:.4f}")
+        
+        return {**history[-1], "epochs": epochs, "batches_per_epoch": -(-per_shard // batch_size)}
+
+    @staticmethod
+    def _downstream_predict(downstream_model: nn.Module, combined: torch.Tensor) -> torch.Tensor:
+        """Appel flexible au modèle downstream"""
+        if hasattr(downstream_model, 'encoder'):
+            preds = downstream_model(combined)
+        else:
+            preds = downstream_model(combined, use_combined=True)
+        
+        # Ajustement des dimensions si nécessaire
+        if preds.dim() == 1:
+            preds = preds.unsqueeze(1)
+        return preds
+
 
     def _compute_correlations(self, x):
         x_norm = F.normalize(x, p=2, dim=1)
         corr = torch.mm(x_norm, x_norm.t())
         return torch.triu(corr, diagonal=1)  #
+
+    @staticmethod
+    def _mean_correlation(x: torch.Tensor) -> torch.Tensor:
+        """Moyenne de _compute_correlations(x) en O(N·d), sans matrice N×N.
+        Somme des paires i<j = (||Σ x̂_i||² - Σ ||x̂_i||²) / 2"""
+        x_norm = F.normalize(x, p=2, dim=1)
+        pair_sum = (x_norm.sum(dim=0).pow(2).sum() - x_norm.pow(2).sum()) / 2
+        return pair_sum / (x.size(0) ** 2)
+
+    @staticmethod
+    def _etf_index(graph_data, x: torch.Tensor) -> torch.Tensor:
+        """Positions des nœuds ETF (les premiers nœuds si etf_index est absent)"""
+        etf_index = getattr(graph_data, 'etf_index', None)
+        if etf_index is None:
+            etf_ids = getattr(graph_data, 'etf_ids', None)
+            num_etfs = len(etf_ids) if etf_ids is not None else x.size(0)
+            etf_index = torch.arange(num_etfs, device=x.device)
+        return etf_index
+
+    @staticmethod
+    def etf_neighbors(x: torch.Tensor, etf_index: torch.Tensor, k: int = 10,
+                      chunk_size: int = 1024) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Top-k des ETFs les plus similaires (cosinus) pour chaque ETF.
+        Calcul par blocs de chunk_size lignes: mémoire O(chunk_size × nb ETFs).
+        Returns:
+            (scores, indices) de forme [nb ETFs, k]; indices relatifs à etf_index"""
+        etf_norm = F.normalize(x[etf_index], p=2, dim=1)
+        num_etfs = etf_norm.size(0)
+        k = min(k, max(num_etfs - 1, 0))
+        
+        scores, indices = [], []
+        for start in range(0, num_etfs, chunk_size):
+            stop = min(start + chunk_size, num_etfs)
+            block = torch.mm(etf_norm[start:stop], etf_norm.t())
+            rows = torch.arange(stop - start, device=x.device)
+            block[rows, rows + start] = float('-inf')  # exclut l'ETF lui-même
+            block_scores, block_indices = block.topk(k, dim=1)
+            scores.append(block_scores)
+            indices.append(block_indices)
+        
+        if not scores:
+            empty = x.new_empty((0, k))
+            return empty, empty.long()
+        return torch.cat(scores), torch.cat(indices)
     
     
-    def predict_portfolio_weights(self, graph_data, temperature=1.0):
-        """Convertit les embeddings en poids de portefeuille"""
+    def predict_portfolio_weights(self, graph_data, temperature=1.0, embedding_cache=None):
+        """Convertit les embeddings en poids de portefeuille, un poids par nœud ETF.
+        Avec un ETFEmbeddingCache, les embeddings en cache remplacent le forward complet."""
         with torch.no_grad():
-            embeddings, _, mu, _ = self.forward(graph_data)
+            if embedding_cache is not None:
+                embeddings = embedding_cache.get_or_compute(self, graph_data).as_tensor(
+                    graph_data.etf_ids, graph_data.x.device)
+                mu, _ = self.uncertainty_head(embeddings).chunk(2, dim=1)
+            else:
+                embeddings, _, mu, _ = self.forward(graph_data, correlation_mode=None)
+                mu = mu[self._etf_index(graph_data, mu)]
             weights = F.softmax(mu / temperature, dim=0)
         return weights
+
+    def etf_embeddings(self, graph_data) -> torch.Tensor:
+        """Embeddings d'inférence (sans dropout) des nœuds ETF, dans l'ordre de etf_ids"""
+        was_training = self.training
+        self.eval()
+        try:
+            with torch.inference_mode():
+                embeddings, _, _, _ = self.forward(graph_data, correlation_mode=None)
+                return embeddings[self._etf_index(graph_data, embeddings)].clone()
+        finally:
+            super().train(was_training)
     
     def compute_risk_metrics(self, graph_data):
         """Calcule des métriques de risque basées sur les sorties"""
@@ -1,8 +1,8 @@
-import networkx as nx
 import pandas as pd
 
 class ETFGraphBuilder:
     def __init__(self):
+        import networkx as nx  # chargé à la demande (constructeur de graphe optionnel)
         self.graph = nx.Graph()
     
     def build_from_holdings(self, holdings_data):
@@ -1,8 +1,148 @@
 import torch
+import torch.nn as nn
 import gc
-from typing import Optional, Tuple
+import os
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, Iterator, Optional, Sequence, Tuple
 from math import ceil
 
+import psutil
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """Quota CPU du conteneur en nombre de cœurs (cgroup v2 puis v1), None si illimité"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == 'max' else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpu_cores() -> int:
+    """Cœurs physiques utilisables par le processus, bornés par l'affinité CPU et le
+    quota cgroup (psutil seul compte les cœurs de l'hôte, y compris dans un conteneur)"""
+    cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    if hasattr(os, 'sched_getaffinity'):
+        cores = min(cores, len(os.sched_getaffinity(0)))
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cores = min(cores, int(quota))
+    return max(1, cores)
+
+
+def configure_cpu_threads(intra_op_threads: Optional[int] = None,
+                          inter_op_threads: Optional[int] = None) -> Dict[str, int]:
+    """Configure les pools de threads PyTorch pour l'exécution CPU.
+
+    Réglage global au processus: à appeler depuis un point d'entrée (CLI, worker),
+    jamais depuis une bibliothèque hôte. Par défaut OMP_NUM_THREADS s'il est défini,
+    sinon un thread intra-op par cœur disponible (l'hyperthreading dégrade les
+    noyaux GEMM), et deux threads inter-op.
+
+    Returns:
+        Nombre de threads effectivement configurés
+    """
+    cores = available_cpu_cores()
+    if intra_op_threads is None and os.environ.get('OMP_NUM_THREADS', '').isdigit():
+        intra_op_threads = int(os.environ['OMP_NUM_THREADS'])
+    torch.set_num_threads(intra_op_threads or cores)
+    try:
+        # Ne peut être fixé qu'une fois, avant tout travail parallèle
+        torch.set_num_interop_threads(inter_op_threads or min(2, cores))
+    except RuntimeError:
+        pass
+    return {'intra_op_threads': torch.get_num_threads(),
+            'inter_op_threads': torch.get_num_interop_threads()}
+
+
+def autocast_context(device: torch.device, bf16: bool = False):
+    """Autocast bfloat16 sur CPU si demandé, contexte neutre sinon"""
+    if bf16 and device.type == 'cpu':
+        return torch.autocast(device_type='cpu', dtype=torch.bfloat16)
+    return nullcontext()
+
+
+class PrefetchTensorLoader:
+    """Itérateur de mini-batchs sur des tensors déjà matérialisés en mémoire.
+
+    Remplace DataLoader(TensorDataset(...)) sur CPU: pas de collate échantillon
+    par échantillon ni de workers à sérialiser, les batchs sont extraits par
+    index_select dans un thread qui garde `prefetch` batchs d'avance.
+    """
+
+    def __init__(self, *tensors: torch.Tensor, batch_size: int, shuffle: bool = True,
+                 prefetch: int = 2, drop_last: bool = False):
+        if not tensors or any(len(t) != len(tensors[0]) for t in tensors):
+            raise ValueError("Les tensors doivent avoir le même nombre de lignes")
+        self.tensors = tensors
+        self.batch_size = max(1, batch_size)
+        self.shuffle = shuffle
+        self.prefetch = max(0, prefetch)
+        self.drop_last = drop_last
+
+    def __len__(self) -> int:
+        n = len(self.tensors[0])
+        return n // self.batch_size if self.drop_last else ceil(n / self.batch_size)
+
+    def _batches(self) -> Iterator[Tuple[torch.Tensor, ...]]:
+        n = len(self.tensors[0])
+        order = torch.randperm(n) if self.shuffle else None
+        for i in range(len(self)):
+            if order is None:
+                yield tuple(t[i * self.batch_size:(i + 1) * self.batch_size] for t in self.tensors)
+            else:
+                idx = order[i * self.batch_size:(i + 1) * self.batch_size].to(self.tensors[0].device)
+                yield tuple(t.index_select(0, idx) for t in self.tensors)
+
+    def __iter__(self) -> Iterator[Tuple[torch.Tensor, ...]]:
+        if self.prefetch == 0:
+            yield from self._batches()
+            return
+
+        buffer: queue.Queue = queue.Queue(maxsize=self.prefetch)
+        done = object()
+        stop = threading.Event()
+
+        def producer():
+            try:
+                for batch in self._batches():
+                    while not stop.is_set():
+                        try:
+                            buffer.put(batch, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                    if stop.is_set():
+                        return
+            finally:
+                buffer.put(done)
+
+        worker = threading.Thread(target=producer, daemon=True)
+        worker.start()
+        try:
+            while (batch := buffer.get()) is not done:
+                yield batch
+        finally:
+            # Arrêt anticipé du consommateur (break, exception)
+            stop.set()
+            while worker.is_alive():
+                try:
+                    buffer.get_nowait()
+                except queue.Empty:
+                    worker.join(timeout=0.01)
+
 class MemoryOptimizer:
     """Gestion optimisée de la mémoire GPU/CPU et des batch sizes"""
     
@@ -34,7 +174,9 @@ class MemoryOptimizer:
         dataset_size: int, 
         sample_tensor: torch.Tensor,
         max_batch_size: int = 1024,
-        min_batch_size: int = 8
+        min_batch_size: int = 8,
+        model: Optional[nn.Module] = None,
+        candidates: Optional[Sequence[int]] = None
     ) -> int:
         """Calcule dynamiquement la taille de batch optimale
         
@@ -43,12 +185,17 @@ class MemoryOptimizer:
             sample_tensor: Tensor exemple pour estimation mémoire
             max_batch_size: Batch size maximum autorisé
             min_batch_size: Batch size minimum autorisé
+            model: Sur CPU, modèle dont on mesure le débit d'entraînement
+            candidates: Tailles testées sur CPU (puissances de 2 par défaut)
             
         Returns:
             Taille de batch optimale
         """
         if self.device.type == 'cpu':
-            return min(max_batch_size, dataset_size)
+            if model is None:
+                return min(max_batch_size, dataset_size)
+            return self.autotune_cpu_batch_size(
+                model, sample_tensor, dataset_size, max_batch_size, min_batch_size, candidates)
             
         # Estimation mémoire disponible
         total_mem = torch.cuda.get_device_properties(self.device).total_memory
@@ -66,6 +213,48 @@ class MemoryOptimizer:
         
         return batch_size
 
+    def autotune_cpu_batch_size(
+        self,
+        model: nn.Module,
+        sample_tensor: torch.Tensor,
+        dataset_size: int,
+        max_batch_size: int = 1024,
+        min_batch_size: int = 8,
+        candidates: Optional[Sequence[int]] = None,
+        steps: int = 3
+    ) -> int:
+        """Choisit la taille de batch au meilleur débit (échantillons/s) mesuré
+        sur quelques passes forward/backward du modèle.
+        
+        Sur CPU la mémoire n'est pas la contrainte: le bon batch est celui qui
+        remplit les noyaux GEMM sans dégrader le cache.
+        """
+        upper = min(max_batch_size, dataset_size)
+        if candidates is None:
+            candidates = [2 ** p for p in range(3, 14)]
+        candidates = sorted({c for c in candidates if min_batch_size <= c <= upper}) or [max(1, upper)]
+        if len(candidates) == 1:
+            return candidates[0]
+        
+        sample = sample_tensor.reshape(1, -1) if sample_tensor.dim() <= 1 else sample_tensor[:1]
+        was_training = model.training
+        model.train()
+        best_size, best_throughput = candidates[0], 0.0
+        try:
+            for size in candidates:
+                batch = sample.expand(size, -1).contiguous()
+                model(batch).sum().backward()  # préchauffage
+                start = time.perf_counter()
+                for _ in range(steps):
+                    model(batch).sum().backward()
+                throughput = size * steps / (time.perf_counter() - start)
+                if throughput > best_throughput:
+                    best_size, best_throughput = size, throughput
+        finally:
+            model.zero_grad(set_to_none=True)
+            model.train(was_training)
+        return best_size
+
     def auto_batch_loader(
         self,
         dataset: torch.utils.data.Dataset,
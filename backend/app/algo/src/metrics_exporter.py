@@ -0,0 +1,101 @@
+"""
+Export Prometheus des métriques internes du moteur de notation (durées des opérations,
+pertes par époque, débit d'entraînement, mémoire, version du modèle)
+"""
+
+import logging
+import weakref
+from typing import Dict
+
+import psutil
+
+try:
+    from prometheus_client import REGISTRY, Counter, Gauge, Histogram, Info, generate_latest
+    PROMETHEUS_AVAILABLE = True
+except ImportError:  # prometheus_client est une dépendance du backend, optionnelle pour l'algo
+    REGISTRY = None
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+THROUGHPUT_BUCKETS = (100, 500, 1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6)
+
+# Métriques du moniteur publiées comme perte par époque (label loss)
+EPOCH_LOSSES = {
+    'epoch_supervised_loss': 'supervised',
+    'epoch_vae_loss': 'vae',
+    'epoch_val_loss': 'val',
+    'gnn_loss': 'gnn'
+}
+
+# Une seule série d'instruments par (registre, namespace): plusieurs moteurs d'un même
+# processus publient dans les mêmes métriques. Clé faible sur le registre lui-même (un id()
+# peut être réattribué à un nouveau registre après la collecte de l'ancien)
+_INSTRUMENTS: 'weakref.WeakKeyDictionary[object, Dict[str, Dict]]' = weakref.WeakKeyDictionary()
+
+
+def _instruments(registry, namespace: str) -> Dict:
+    by_namespace = _INSTRUMENTS.setdefault(registry, {})
+    if namespace not in by_namespace:
+        common = {'namespace': namespace, 'registry': registry}
+        memory = Gauge('memory_rss_bytes', 'Resident memory of the scoring process', **common)
+        memory.set_function(lambda: psutil.Process().memory_info().rss)
+        by_namespace[namespace] = {
+            'duration': Histogram('operation_duration_seconds', 'Duration of scoring engine operations',
+                                  ['operation'], buckets=DURATION_BUCKETS, **common),
+            'failures': Counter('operation_failures', 'Failed scoring engine operations', ['operation'], **common),
+            'epoch_loss': Gauge('epoch_loss', 'Loss of the last training epoch', ['loss'], **common),
+            'epochs': Counter('training_epochs', 'Training epochs run', **common),
+            'throughput': Histogram('training_throughput_samples_per_second', 'Training throughput per epoch',
+                                    buckets=THROUGHPUT_BUCKETS, **common),
+            'memory': memory,
+            'model': Info('model', 'Version of the scoring model (weights fingerprint)', **common)
+        }
+    return by_namespace[namespace]
+
+
+class ETFMetricsExporter:
+    """Publie les métriques du moniteur dans un registre prometheus_client.
+
+    Le registre par défaut est celui exposé par /metrics dans l'API: les métriques du
+    moteur apparaissent dans le même scrape que la latence HTTP. Sans prometheus_client,
+    l'exporteur est inactif et render() retombe sur l'export texte du moniteur.
+    """
+
+    def __init__(self, registry=None, namespace: str = 'etf_engine'):
+        self.enabled = PROMETHEUS_AVAILABLE
+        self.namespace = namespace
+        if not self.enabled:
+            logger.info("prometheus_client not installed, scoring metrics exported as text only")
+            return
+        self.registry = registry if registry is not None else REGISTRY
+        self._metrics = _instruments(self.registry, namespace)
+
+    def observe_duration(self, operation: str, seconds: float, success: bool = True) -> None:
+        if not self.enabled:
+            return
+        self._metrics['duration'].labels(operation=operation).observe(seconds)
+        if not success:
+            self._metrics['failures'].labels(operation=operation).inc()
+
+    def observe_metric(self, name: str, value: float) -> None:
+        """Métrique du moniteur (track_performance), publiée si elle a un équivalent Prometheus"""
+        if not self.enabled:
+            return
+        if name in EPOCH_LOSSES:
+            self._metrics['epoch_loss'].labels(loss=EPOCH_LOSSES[name]).set(value)
+        elif name == 'epoch':
+            self._metrics['epochs'].inc()
+        elif name == 'training_throughput':
+            self._metrics['throughput'].observe(value)
+
+    def set_model_version(self, version: str) -> None:
+        if self.enabled:
+            self._metrics['model'].info({'version': version})
+
+    def render(self, monitor=None) -> str:
+        """Exposition texte: registre Prometheus, ou export du moniteur sans prometheus_client"""
+        if self.enabled:
+            return generate_latest(self.registry).decode('utf-8')
+        return monitor.to_prometheus(prefix=self.namespace) if monitor is not None else ''
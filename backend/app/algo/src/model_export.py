@@ -0,0 +1,85 @@
+"""
+Export du modèle de notation en artefact d'inférence figé (TorchScript ou ONNX)
+"""
+
+import copy
+import json
+import logging
+import os
+import warnings
+from typing import Dict, Optional
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('torchscript', 'onnx')
+
+
+class SupervisedScoringPath(nn.Module):
+    """Chemin supervisé seul (encodeur de base + tête supervisée) du modèle semi-supervisé"""
+
+    def __init__(self, model: nn.Module):
+        super().__init__()
+        self.encoder = model.base_encoder
+        self.head = model.supervised_head
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.head(self.encoder(x))
+
+
+def metadata_path(path: str) -> str:
+    return f"{path}.json"
+
+
+def export_scoring_model(model: nn.Module, path: str, export_format: str = 'torchscript',
+                         quantize: bool = False, example_batch: Optional[torch.Tensor] = None) -> Dict:
+    """Exporte le chemin supervisé de ETFSemiSupervisedModel pour le serving CPU.
+
+    Args:
+        model: ETFSemiSupervisedModel entraîné (non modifié)
+        path: Fichier de l'artefact (.pt pour TorchScript, .onnx pour ONNX)
+        export_format: 'torchscript' ou 'onnx'
+        quantize: Quantification dynamique int8 des couches Linear (TorchScript uniquement)
+        example_batch: Entrée d'exemple pour le tracing (aléatoire par défaut)
+
+    Returns:
+        Métadonnées de l'artefact (également écrites dans path + '.json')
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu: {export_format} (attendu: {EXPORT_FORMATS})")
+    if quantize and export_format == 'onnx':
+        raise ValueError("La quantification dynamique n'est supportée qu'avec l'export TorchScript")
+
+    scoring_path = SupervisedScoringPath(copy.deepcopy(model).cpu()).eval()
+    if example_batch is None:
+        example_batch = torch.randn(8, model.input_dim)
+    example_batch = example_batch.detach().cpu().float()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with warnings.catch_warnings():
+        # API torch.ao / torch.jit marquées dépréciées mais toujours fonctionnelles
+        warnings.simplefilter('ignore', (DeprecationWarning, FutureWarning, UserWarning))
+        if quantize:
+            scoring_path = torch.ao.quantization.quantize_dynamic(scoring_path, {nn.Linear}, dtype=torch.qint8)
+
+        with torch.no_grad():
+            if export_format == 'torchscript':
+                traced = torch.jit.freeze(torch.jit.trace(scoring_path, example_batch).eval())
+                torch.jit.save(traced, path)
+            else:
+                torch.onnx.export(scoring_path, (example_batch,), path,
+                                  input_names=['features'], output_names=['score'],
+                                  dynamic_axes={'features': {0: 'batch'}, 'score': {0: 'batch'}})
+
+    metadata = {
+        'format': export_format,
+        'quantized': quantize,
+        'input_dim': int(model.input_dim),
+        'torch_version': torch.__version__
+    }
+    with open(metadata_path(path), 'w') as f:
+        json.dump(metadata, f)
+    logger.info(f"Scoring model exported to {path} ({export_format}, int8={quantize})")
+    return metadata
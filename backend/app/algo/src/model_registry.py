@@ -0,0 +1,174 @@
+"""
+Registre local de modèles versionnés: poids chargeables par mmap, état ajusté du
+pipeline, empreinte de configuration et schéma des features
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import torch
+
+from embedding_cache import model_fingerprint
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+LATEST = 'LATEST'
+WEIGHTS = {'model_state': 'model.pt', 'gnn_state': 'gnn.pt'}
+OPTIMIZER = 'optimizer.pt'
+PIPELINE = 'pipeline.pkl'
+
+# Clés de configuration sans effet sur les poids ni sur les features (chemins, exécution)
+RUNTIME_KEYS = ('checkpoint_path', 'embedding_cache_dir', 'model_registry_dir', 'CPU_PROFILE', 'PROFILING',
+                'BACKTEST', 'MONTE_CARLO_STRESS', 'monitor_capacity', 'prometheus_metrics', 'compile_model')
+
+
+def config_hash(config: Dict) -> str:
+    """Empreinte de la configuration du modèle (clés d'exécution exclues)"""
+    relevant = {key: value for key, value in config.items() if key not in RUNTIME_KEYS}
+    payload = json.dumps(relevant, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class ModelRegistry:
+    """Versions de modèles sous root/<version>/, la version servie désignée par root/LATEST.
+
+    Chaque version est écrite dans un dossier temporaire puis renommée (publication
+    atomique); LATEST est remplacé par os.replace. Un lecteur voit donc toujours une
+    version complète, jamais un artefact partiel.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def register(self, engine, include_optimizer: bool = False, promote: bool = True,
+                 tag: Optional[str] = None) -> str:
+        """Enregistre l'état courant du moteur comme nouvelle version.
+
+        Args:
+            engine: ETFScoringEngine entraîné
+            include_optimizer: Conserve l'état de l'optimiseur (reprise d'entraînement)
+            promote: Fait de cette version la version servie (LATEST)
+            tag: Libellé libre stocké dans le manifeste
+        Returns: Identifiant de la version
+        """
+        fingerprint = model_fingerprint(engine.semi_supervised_model)
+        version = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{fingerprint[:8]}"
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+        try:
+            # Tenseurs contigus et détachés: fichiers chargeables avec mmap=True, weights_only=True
+            for key, model in (('model_state', engine.semi_supervised_model), ('gnn_state', engine.gnn_model)):
+                state = {name: tensor.detach().cpu().contiguous() for name, tensor in model.state_dict().items()}
+                torch.save(state, os.path.join(staging, WEIGHTS[key]))
+            if include_optimizer:
+                torch.save(engine.optimizer.state_dict(), os.path.join(staging, OPTIMIZER))
+            with open(os.path.join(staging, PIPELINE), 'wb') as f:
+                pickle.dump({'data_pipeline': engine.data_pipeline,
+                             'graph_feature_stats': engine.graph_processor.feature_stats}, f)
+
+            manifest = {
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'tag': tag,
+                'model_fingerprint': fingerprint,
+                'config_hash': config_hash(engine.config),
+                'feature_schema': {
+                    'required_columns': list(engine.config['REQUIRED_COLUMNS']),
+                    'feature_columns': engine.feature_builder.output_columns(),
+                    'input_dim': engine.config['input_dim'],
+                    'gnn_input_dim': engine.config['gnn_input_dim']
+                },
+                'includes_optimizer': include_optimizer,
+                'torch_version': torch.__version__
+            }
+            with open(os.path.join(staging, MANIFEST), 'w') as f:
+                json.dump(manifest, f, indent=2)
+            os.rename(staging, os.path.join(self.root, version))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if promote:
+            self.promote(version)
+        logger.info(f"Model version {version} registered in {self.root}")
+        return version
+
+    def promote(self, version: str) -> None:
+        """Désigne la version servie (remplacement atomique de LATEST)"""
+        self.manifest(version)  # la version doit exister
+        tmp_path = os.path.join(self.root, f".{LATEST}.tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, LATEST))
+
+    def latest(self) -> Optional[str]:
+        path = os.path.join(self.root, LATEST)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return f.read().strip() or None
+
+    def versions(self) -> List[str]:
+        """Versions publiées, de la plus ancienne à la plus récente"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if not name.startswith('.') and os.path.exists(os.path.join(self.root, name, MANIFEST)))
+
+    def manifest(self, version: Optional[str] = None) -> Dict:
+        version = version or self.latest()
+        if version is None:
+            raise FileNotFoundError(f"Aucune version servie dans {self.root}")
+        path = os.path.join(self.root, version, MANIFEST)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Version inconnue: {version}")
+        with open(path) as f:
+            return json.load(f)
+
+    def load(self, version: Optional[str] = None, map_location='cpu', inference_only: bool = True) -> Dict:
+        """Artefacts d'une version (LATEST par défaut).
+
+        Les poids sont mappés en mémoire (mmap=True): seules les pages lues sont chargées,
+        et plusieurs workers partagent le cache de pages du fichier.
+
+        Returns:
+            {'manifest', 'model_state', 'gnn_state', 'data_pipeline', 'graph_feature_stats'}
+            et 'optimizer_state' si inference_only=False et qu'il a été enregistré
+        """
+        manifest = self.manifest(version)
+        directory = os.path.join(self.root, manifest['version'])
+        bundle = {'manifest': manifest}
+        for key, filename in WEIGHTS.items():
+            bundle[key] = torch.load(os.path.join(directory, filename), map_location=map_location,
+                                     mmap=True, weights_only=True)
+        if not inference_only and manifest['includes_optimizer']:
+            bundle['optimizer_state'] = torch.load(os.path.join(directory, OPTIMIZER),
+                                                   map_location=map_location, weights_only=True)
+        with open(os.path.join(directory, PIPELINE), 'rb') as f:
+            bundle.update(pickle.load(f))
+        return bundle
+
+    def check_compatible(self, manifest: Dict, config: Dict, feature_columns: List[str]) -> None:
+        """Refuse une version dont le schéma de features diffère de celui du moteur"""
+        schema = manifest['feature_schema']
+        if schema['feature_columns'] != list(feature_columns) or schema['input_dim'] != config['input_dim']:
+            raise ValueError(f"Schéma de features incompatible avec la version {manifest['version']}")
+        if manifest['config_hash'] != config_hash(config):
+            logger.warning(f"Model version {manifest['version']} was trained with a different configuration")
+
+    def prune(self, keep: int = 5) -> List[str]:
+        """Supprime les versions les plus anciennes (jamais la version servie)"""
+        latest = self.latest()
+        removable = [version for version in self.versions() if version != latest]
+        removed = removable[:max(0, len(removable) - max(keep - (latest is not None), 0))]
+        for version in removed:
+            shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+        return removed
@@ -2,119 +2,289 @@
 Surveillance du système et journalisation des performances
 """
 
+import math
+import re
 import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict
-import  numpy as np 
+from itertools import islice
+from typing import Dict, List, Optional
+import  numpy as np
 import psutil
+
+
+class QuantileSketch:
+    """Sketch de quantiles à erreur relative bornée (buckets logarithmiques, type DDSketch).
+
+    Insertion en O(1), mémoire proportionnelle à l'étendue des valeurs (log), quantiles
+    à relative_accuracy près quelle que soit la taille du flux.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _bucket(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, bucket: int) -> float:
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def add(self, value: float) -> None:
+        if value > 1e-12:
+            key = self._bucket(value)
+            self.positive[key] = self.positive.get(key, 0) + 1
+        elif value < -1e-12:
+            key = self._bucket(-value)
+            self.negative[key] = self.negative.get(key, 0) + 1
+        else:
+            self.zero_count += 1
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return float('nan')
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+
+class MetricRing:
+    """Dernières valeurs d'une métrique (tampon circulaire NumPy de capacité fixe)
+    et agrégats en flux sur toute sa durée de vie (count, sum, sketch de quantiles)"""
+
+    def __init__(self, capacity: int = 1024, relative_accuracy: float = 0.01):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.position = 0  # prochaine case écrite
+        self.size = 0
+        self.count = 0
+        self.sum = 0.0
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def append(self, value: float, timestamp: Optional[float] = None) -> None:
+        value = float(value)
+        self.timestamps[self.position] = time.time() if timestamp is None else timestamp
+        self.values[self.position] = value
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        if math.isfinite(value):
+            self.count += 1
+            self.sum += value
+            self.sketch.add(value)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _ordered(self, array: np.ndarray) -> np.ndarray:
+        """Contenu du tampon du plus ancien au plus récent"""
+        if self.size < self.capacity:
+            return array[:self.size]
+        return np.concatenate((array[self.position:], array[:self.position]))
+
+    def window(self, since: Optional[float] = None):
+        """(timestamps, valeurs) conservés, postérieurs à since (recherche dichotomique)"""
+        timestamps, values = self._ordered(self.timestamps), self._ordered(self.values)
+        if since is not None:
+            start = np.searchsorted(timestamps, since, side='left')
+            timestamps, values = timestamps[start:], values[start:]
+        return timestamps, values
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else float('nan'),
+            'p50': self.sketch.quantile(0.5),
+            'p95': self.sketch.quantile(0.95)
+        }
+
+
 class ETFSystemMonitor:
-    def __init__(self):
-        self.operations_log = []
-        self.performance_metrics = {
-            'data_validation': [],
-            'model_inference': [],
-            'training': [],
-            'training_epochs': []  
-            }
-
-    
-    def log_operation_start(self, operation_name: str):
-        """Enregistre le début d'une opération"""
-        entry = {
-            'timestamp': datetime.now(),
-            'operation': operation_name,
-            'status': 'started',
-            'details': None
+    QUANTILES = (0.5, 0.95)
+
+    def __init__(self, capacity: int = 1024, log_capacity: int = 1000, exporter=None):
+        """
+        Args:
+            capacity: Valeurs conservées par métrique (les agrégats couvrent tout l'historique)
+            log_capacity: Entrées conservées dans le journal des opérations
+            exporter: metrics_exporter.ETFMetricsExporter recevant durées et métriques (optionnel)
+        """
+        self.capacity = capacity
+        self.exporter = exporter
+        self.operations_log = deque(maxlen=log_capacity)
+        self.performance_metrics: Dict[str, MetricRing] = {
+            name: MetricRing(capacity)
+            for name in ('data_validation', 'model_inference', 'training', 'training_epochs')
         }
-        self.operations_log.append(entry)
-        return entry
-    
-    def log_operation_success(self, operation_name: str):
+        self.operation_durations: Dict[str, MetricRing] = {}
+        self._started: Dict[str, float] = {}  # id d'opération -> début (perf_counter)
+        self._last_duration: Dict[str, float] = {}
+        self.model_version: Optional[str] = None
+
+
+    def log_operation_start(self, operation_name: str, operation_id: Optional[str] = None):
+        """Enregistre le début d'une opération (operation_id distingue des exécutions concurrentes)"""
+        self._started[operation_id or operation_name] = time.perf_counter()
+        return self._log(operation_name, 'started', None)
+
+    def log_operation_success(self, operation_name: str, operation_id: Optional[str] = None):
         """Enregistre la réussite d'une opération"""
-        entry = {
-            'timestamp': datetime.now(),
-            'operation': operation_name,
-            'status': 'completed',
-            'details': {'success': True}
-        }
-        self.operations_log.append(entry)
-        return entry
-    
-    def log_operation_failure(self, operation_name: str, error_msg: str):
+        self._finish(operation_name, operation_id, success=True)
+        return self._log(operation_name, 'completed', {'success': True})
+
+    def log_operation_failure(self, operation_name: str, error_msg: str, operation_id: Optional[str] = None):
         """Enregistre l'échec d'une opération"""
+        self._finish(operation_name, operation_id, success=False)
+        return self._log(operation_name, 'failed', {'success': False, 'error': error_msg})
+
+    def _log(self, operation_name: str, status: str, details: Optional[Dict]) -> Dict:
         entry = {
             'timestamp': datetime.now(),
             'operation': operation_name,
-            'status': 'failed',
-            'details': {
-                'success': False,
-                'error': error_msg
-            }
+            'status': status,
+            'details': details
         }
         self.operations_log.append(entry)
         return entry
-    
+
+    def _finish(self, operation_name: str, operation_id: Optional[str], success: bool) -> None:
+        """Durée de l'opération terminée, ajoutée à l'historique des durées de son nom"""
+        start = self._started.pop(operation_id or operation_name, None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        self._last_duration[operation_name] = duration
+        self._ring(self.operation_durations, operation_name).append(duration)
+        if self.exporter is not None:
+            self.exporter.observe_duration(operation_name, duration, success=success)
+
+    def _ring(self, store: Dict[str, MetricRing], name: str) -> MetricRing:
+        if name not in store:
+            store[name] = MetricRing(self.capacity)
+        return store[name]
+
     def track_performance(self, metric_name: str, value: float):
         """Enregistre une métrique de performance"""
-        if metric_name not in self.performance_metrics:
-            self.performance_metrics[metric_name] = []
-            self.performance_metrics[metric_name].append({
-                'timestamp': datetime.now(),
-                'value': value})
+        self._ring(self.performance_metrics, metric_name).append(value)
+        if self.exporter is not None:
+            self.exporter.observe_metric(metric_name, value)
+
+    def set_model_version(self, version: str) -> None:
+        """Version du modèle en service (publiée par l'exporteur)"""
+        self.model_version = version
+        if self.exporter is not None:
+            self.exporter.set_model_version(version)
+
 
-    
     def get_recent_metrics(self, hours: int = 24) -> Dict:
         """Récupère les métriques récentes"""
         cutoff = datetime.now() - timedelta(hours=hours)
-        return {
-            metric: [
-                m for m in records 
-                if m['timestamp'] >= cutoff
-            ]
-            for metric, records in self.performance_metrics.items()
-        }
-    
-    
+        recent = {}
+        for metric, ring in self.performance_metrics.items():
+            timestamps, values = ring.window(since=cutoff.timestamp())
+            recent[metric] = [{'timestamp': datetime.fromtimestamp(t), 'value': v}
+                              for t, v in zip(timestamps.tolist(), values.tolist())]
+        return recent
+
+    def get_metric_summary(self, metric_name: str) -> Dict[str, float]:
+        """Agrégats en flux d'une métrique: count, sum, mean, p50, p95"""
+        ring = self.performance_metrics.get(metric_name)
+        return ring.summary() if ring is not None else MetricRing(1).summary()
+
+
     def health_check(self) -> Dict:
         """Vérifie l'état de santé du système"""
-        recent_metrics = self.get_recent_metrics()
+        cutoff = (datetime.now() - timedelta(hours=24)).timestamp()
+        performance = {}
+        for metric, ring in self.performance_metrics.items():
+            _, values = ring.window(since=cutoff)
+            if len(values):
+                performance[metric] = float(np.mean(values))
+        log_size = len(self.operations_log)
         return {
             'status': 'operational',
-            'last_operations': self.operations_log[-5:],
-            'performance': {
-                metric: np.mean([m['value'] for m in records])
-                for metric, records in recent_metrics.items()
-                if records
-            }
+            'last_operations': list(islice(self.operations_log, max(0, log_size - 5), log_size)),
+            'performance': performance,
+            'operations': {name: ring.summary() for name, ring in self.operation_durations.items()}
         }
-    
+
 
     def get_memory_usage(self) -> str:
         """Retourne l'utilisation de la mémoire du processus principal"""
-        process = psutil.Process()
-        mem_bytes = process.memory_info().rss
-        mem_mb = mem_bytes / 1024 / 1024  # Convertir en Mo
+        mem_mb = self.get_memory_bytes() / 1024 / 1024  # Convertir en Mo
         return f"{mem_mb:.2f} MB"
-    
+
+    def get_memory_bytes(self) -> int:
+        """Mémoire résidente (RSS) du processus en octets"""
+        return psutil.Process().memory_info().rss
+
 
     def get_operation_duration(self, operation_name: str) -> float:
-        """Calcule la durée d'une opération en secondes"""
-        operation_entries = [op for op in self.operations_log 
-                           if op['operation'] == operation_name]
-        
-        if len(operation_entries) < 2:
-            return 0.0
-            
-        start_time = None
-        end_time = None
-        
-        # Trouver le premier 'started' et le dernier 'completed'/'failed'
-        for entry in operation_entries:
-            if entry['status'] == 'started':
-                start_time = entry['timestamp']
-            elif entry['status'] in ['completed', 'failed']:
-                end_time = entry['timestamp']
-        
-        if start_time and end_time:
-            return (end_time - start_time).total_seconds()
-        return 0.0
\ No newline at end of file
+        """Durée d'une opération en secondes: temps écoulé si elle est en cours,
+        sinon durée de sa dernière exécution (0.0 si inconnue)"""
+        start = self._started.get(operation_name)
+        if start is not None:
+            return time.perf_counter() - start
+        return self._last_duration.get(operation_name, 0.0)
+
+    def to_prometheus(self, prefix: str = 'etf_engine') -> str:
+        """Export au format texte Prometheus (summaries des métriques et des durées, mémoire)"""
+        lines: List[str] = []
+
+        def summary(name: str, ring: MetricRing, labels: str = '') -> None:
+            separator = ',' if labels else ''
+            for q in self.QUANTILES:
+                lines.append(f'{name}{{{labels}{separator}quantile="{q}"}} {_format(ring.sketch.quantile(q))}')
+            suffix = f'{{{labels}}}' if labels else ''
+            lines.append(f'{name}_sum{suffix} {_format(ring.sum)}')
+            lines.append(f'{name}_count{suffix} {ring.count}')
+
+        for metric, ring in self.performance_metrics.items():
+            name = f'{prefix}_{_metric_name(metric)}'
+            lines.append(f'# TYPE {name} summary')
+            summary(name, ring)
+
+        if self.operation_durations:
+            name = f'{prefix}_operation_duration_seconds'
+            lines.append(f'# TYPE {name} summary')
+            for operation, ring in self.operation_durations.items():
+                summary(name, ring, f'operation="{operation}"')
+
+        if self.model_version is not None:
+            lines.append(f'# TYPE {prefix}_model_info gauge')
+            lines.append(f'{prefix}_model_info{{version="{self.model_version}"}} 1')
+
+        lines.append(f'# TYPE {prefix}_memory_rss_bytes gauge')
+        lines.append(f'{prefix}_memory_rss_bytes {self.get_memory_bytes()}')
+        return '\n'.join(lines) + '\n'
+
+
+def _metric_name(name: str) -> str:
+    """Nom de métrique Prometheus valide ([a-zA-Z_:][a-zA-Z0-9_:]*)"""
+    name = re.sub(r'[^a-zA-Z0-9_:]', '_', name)
+    return name if re.match(r'[a-zA-Z_:]', name) else f'_{name}'
+
+
+def _format(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
@@ -0,0 +1,235 @@
+"""
+Stress Monte Carlo et rejeu historique: distribution des scores de chaque ETF
+sous des milliers de chocs de marché corrélés
+"""
+
+import logging
+import warnings
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+
+from data_pipeline import ETFDataPipeline
+from etf_feature_builder import ETFFeatureBuilder
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+
+
+class ETFRiskModel:
+    """Modèle à facteurs des rendements ETF.
+
+    Le rendement standardisé de l'ETF i est w_i·f + s_i·ε_i, avec f ~ N(0, C) les
+    facteurs de marché, w_i = C⁻¹ρ_i (ρ_i: corrélations de l'ETF aux facteurs) et
+    s_i = √(1 - ρ_iᵀC⁻¹ρ_i): les corrélations simulées reproduisent ρ_i.
+    """
+
+    def __init__(self, correlations: np.ndarray, volatilities: np.ndarray, factors: Sequence[str],
+                 factor_correlations: np.ndarray, factor_volatilities: np.ndarray):
+        """
+        Args:
+            correlations: Corrélations ETF/facteurs [ETFs, facteurs] (NaN = 0)
+            volatilities: Volatilités annualisées des ETFs [ETFs] (NaN = médiane)
+            factors: Noms des facteurs (clés de riskAnalysis.correlations)
+            factor_correlations: Corrélations entre facteurs [facteurs, facteurs]
+            factor_volatilities: Volatilités annualisées des facteurs [facteurs]
+        """
+        self.factors = list(factors)
+        self.factor_correlations = np.asarray(factor_correlations, dtype=np.float64)
+        self.factor_volatilities = np.asarray(factor_volatilities, dtype=np.float64)
+        self.factor_cholesky = np.linalg.cholesky(self.factor_correlations)
+
+        self.correlations = np.nan_to_num(np.asarray(correlations, dtype=np.float64))
+        self.loadings = np.linalg.solve(self.factor_correlations, self.correlations.T).T
+        systematic = np.einsum('nk,nk->n', self.loadings, self.correlations)
+
+        # Corrélations incompatibles avec C (variance systématique > 1): rééchelonnées
+        excess = systematic > 1
+        if excess.any():
+            logger.warning(f"{int(excess.sum())} ETFs with factor correlations inconsistent with the factor matrix")
+            self.loadings[excess] /= np.sqrt(systematic[excess])[:, None]
+        self.idiosyncratic = np.sqrt(np.clip(1 - systematic, 0, 1))
+
+        volatilities = np.asarray(volatilities, dtype=np.float64)
+        fallback = np.nanmedian(volatilities) if np.isfinite(volatilities).any() else 0.2
+        self.volatilities = np.where(np.isfinite(volatilities), volatilities, fallback)
+
+    @classmethod
+    def from_records(cls, records: List[Dict], config: Dict) -> 'ETFRiskModel':
+        """Construit le modèle depuis les ETFs bruts (riskAnalysis.correlations et volatility.annualized)"""
+        factors = config['factors']
+        paths = ['riskAnalysis.volatility.annualized'] + [f'riskAnalysis.correlations.{f}' for f in factors]
+        flat = ETFDataPipeline(schema_paths=paths).flatten_records(records).reindex(columns=paths)
+        return cls(
+            correlations=flat[paths[1:]].to_numpy(dtype=np.float64),
+            volatilities=flat[paths[0]].to_numpy(dtype=np.float64),
+            factors=factors,
+            factor_correlations=np.asarray(config['factor_correlations']),
+            factor_volatilities=np.asarray(config['factor_volatilities']))
+
+    def __len__(self) -> int:
+        return len(self.volatilities)
+
+    def reference_volatility(self, horizon_days: int) -> float:
+        """Volatilité médiane de l'univers sur l'horizon (unité des chocs de colonnes)"""
+        return float(np.median(self.volatilities) * np.sqrt(horizon_days / TRADING_DAYS))
+
+    def simulate(self, num_scenarios: int, horizon_days: int, chunk_size: int = 250, seed: int = 0,
+                 degrees_of_freedom: Optional[float] = None) -> Iterator[np.ndarray]:
+        """Rendements simulés sur l'horizon, par blocs [scénarios, ETFs]"""
+        rng = np.random.default_rng(seed)
+        horizon_vol = self.volatilities * np.sqrt(horizon_days / TRADING_DAYS)
+        for start in range(0, num_scenarios, chunk_size):
+            size = min(chunk_size, num_scenarios - start)
+            factors = rng.standard_normal((size, len(self.factors))) @ self.factor_cholesky.T
+            standardized = factors @ self.loadings.T + rng.standard_normal((size, len(self))) * self.idiosyncratic
+            if degrees_of_freedom:
+                # Student-t multivariée de variance unitaire: queues épaisses communes au scénario
+                dof = degrees_of_freedom
+                standardized *= np.sqrt((dof - 2) / rng.chisquare(dof, size=(size, 1)))
+            yield standardized * horizon_vol
+
+    def conditional_returns(self, factor_moves: Dict[str, float]) -> np.ndarray:
+        """Rendement attendu de chaque ETF [ETFs] conditionnellement aux mouvements de certains facteurs"""
+        idx = [self.factors.index(name) for name in factor_moves]
+        moves = np.array([factor_moves[name] for name in factor_moves]) / self.factor_volatilities[idx]
+        weights = np.linalg.solve(self.factor_correlations[np.ix_(idx, idx)], moves)
+        return self.volatilities * (self.correlations[:, idx] @ weights)
+
+
+def column_shocks(returns: np.ndarray, etf_data: pd.DataFrame, sensitivities: Dict[str, float],
+                  reference_volatility: float) -> Dict[str, np.ndarray]:
+    """Valeurs choquées {colonne: [scénarios, ETFs]}: réponse linéaire au rendement, en
+    écarts-types de la colonne par volatilité de référence (indépendant de l'échelle,
+    brute ou transformée, des colonnes)"""
+    standardized = np.atleast_2d(returns) / reference_volatility
+    stressed = {}
+    for column, sensitivity in sensitivities.items():
+        if column not in etf_data.columns:
+            continue
+        values = etf_data[column].to_numpy(dtype=np.float64)
+        scale = np.nanstd(values) if np.isfinite(values).any() else 0.0
+        stressed[column] = values[None, :] + sensitivity * scale * standardized
+    return stressed
+
+
+def nav_history(records: List[Dict]) -> pd.DataFrame:
+    """Historique des NAV [dates, ETFs] (timeSeries.historicalNav), colonnes dans l'ordre des ETFs"""
+    series = {}
+    for position, record in enumerate(records):
+        points = (record.get('timeSeries') or {}).get('historicalNav') or []
+        if points:
+            series[position] = pd.Series({point['date']: point['value'] for point in points}, dtype=np.float64)
+    history = pd.DataFrame(series).reindex(columns=range(len(records)))
+    history.index = pd.to_datetime(history.index)
+    return history.sort_index()
+
+
+def historical_window_returns(history: pd.DataFrame, horizon_days: int) -> np.ndarray:
+    """Rendements de toutes les fenêtres glissantes de l'historique [fenêtres, ETFs] (0 si inconnu)"""
+    if len(history) < 2:
+        raise ValueError("Historique de NAV insuffisant pour un rejeu (au moins 2 dates)")
+    if len(history) <= horizon_days:
+        logger.warning(f"NAV history has {len(history)} dates, replaying {len(history) - 1}-day windows "
+                       f"instead of {horizon_days}")
+        horizon_days = len(history) - 1
+    nav = history.ffill().to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = nav[horizon_days:] / nav[:-horizon_days] - 1
+    return np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+class ETFMonteCarloStress:
+    """Distribution des scores par ETF sous des chocs simulés ou rejoués, notés par blocs"""
+
+    def __init__(self, config: Dict):
+        """
+        Args:
+            config: config.MONTE_CARLO_STRESS
+        """
+        self.config = config
+        self.quantiles = list(config.get('quantiles', [0.01, 0.05, 0.5]))
+
+    def run(self, etf_data: pd.DataFrame, feature_builder: ETFFeatureBuilder, model: nn.Module,
+            device: torch.device, risk_model: ETFRiskModel, base_features: Optional[pd.DataFrame] = None,
+            history: Optional[pd.DataFrame] = None, method: Optional[str] = None) -> pd.DataFrame:
+        """Quantiles des scores de chaque ETF.
+
+        Args:
+            etf_data: Données de base (celles transformées par feature_builder)
+            risk_model: Modèle de risque aligné ligne à ligne sur etf_data
+            base_features: feature_builder.transform(etf_data) s'il est déjà calculé
+            history: NAV [dates, ETFs] pour method='historical' (voir nav_history)
+            method: 'monte_carlo' ou 'historical' (défaut: config['method'])
+
+        Returns:
+            DataFrame indexé comme etf_data: base_score, score_mean, score_q<p>
+            et expected_shortfall (moyenne des scores sous le plus bas quantile)
+        """
+        method = method or self.config.get('method', 'monte_carlo')
+        if len(risk_model) != len(etf_data):
+            raise ValueError(f"Modèle de risque ({len(risk_model)} ETFs) non aligné sur les données ({len(etf_data)})")
+        if base_features is None:
+            base_features = feature_builder.transform(etf_data)
+
+        horizon = self.config.get('horizon_days', 10)
+        chunk_size = self.config.get('chunk_size', 250)
+        if method == 'monte_carlo':
+            num_scenarios = self.config.get('num_scenarios', 2000)
+            chunks = risk_model.simulate(num_scenarios, horizon, chunk_size=chunk_size,
+                                         seed=self.config.get('seed', 0),
+                                         degrees_of_freedom=self.config.get('degrees_of_freedom'))
+        elif method == 'historical':
+            if history is None:
+                raise ValueError("Le rejeu historique nécessite un historique de NAV")
+            windows = historical_window_returns(history, horizon)
+            num_scenarios = len(windows)
+            chunks = (windows[start:start + chunk_size] for start in range(0, num_scenarios, chunk_size))
+        else:
+            raise ValueError(f"Méthode de stress inconnue: {method}")
+
+        reference_vol = risk_model.reference_volatility(horizon)
+        sensitivities = self.config.get('column_sensitivities', {})
+        scores = np.empty((num_scenarios, len(etf_data)), dtype=np.float32)
+
+        model.eval()
+        offset = 0
+        for returns in chunks:
+            stressed = column_shocks(returns, etf_data, sensitivities, reference_vol)
+            stacked = feature_builder.transform_columns(etf_data, stressed, len(returns), base_features=base_features)
+            scores[offset:offset + len(returns)] = self._predict(model, stacked, device)
+            offset += len(returns)
+
+        base_score = self._predict(model, base_features.to_numpy(dtype=np.float32)[None], device)[0]
+        logger.info(f"{method} stress: {num_scenarios} scenarios scored for {len(etf_data)} ETFs")
+        return self._summarize(scores, base_score, etf_data.index)
+
+    @staticmethod
+    def _predict(model: nn.Module, stacked: np.ndarray, device: torch.device) -> np.ndarray:
+        """Scores [scénarios, ETFs] pour des features [scénarios, ETFs, features]"""
+        num_scenarios, num_etfs, num_features = stacked.shape
+        with torch.no_grad():
+            scores = model(torch.from_numpy(stacked.reshape(-1, num_features)).to(device))
+        return scores.cpu().numpy().reshape(num_scenarios, num_etfs)
+
+    def _summarize(self, scores: np.ndarray, base_score: np.ndarray, index: pd.Index) -> pd.DataFrame:
+        """Statistiques par ETF; les scénarios au score NaN (choc hors du domaine d'une
+        transformation, ex. log1p d'un flux < -1) sont ignorés"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # ETF sans aucun scénario valide
+            levels = np.nanquantile(scores, self.quantiles, axis=0).astype(np.float32)
+            mean = np.nanmean(scores, axis=0)
+        tail = scores <= levels[int(np.argmin(self.quantiles))][None, :]
+        tail_count = tail.sum(axis=0)
+        summary = {
+            'base_score': base_score,
+            'score_mean': mean,
+            **{f"score_q{q * 100:g}": level for q, level in zip(self.quantiles, levels)},
+            'expected_shortfall': np.where(tail_count > 0, np.where(tail, scores, 0).sum(axis=0, dtype=np.float64)
+                                           / np.maximum(tail_count, 1), np.nan)
+        }
+        return pd.DataFrame(summary, index=index)
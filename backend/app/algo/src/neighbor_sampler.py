@@ -0,0 +1,121 @@
+"""
+Échantillonnage de voisinage pour l'entraînement GNN par mini-batchs (CPU)
+"""
+
+from typing import List, Optional, Sequence
+import logging
+
+import numpy as np
+import torch
+from torch_geometric.data import Data
+
+logger = logging.getLogger(__name__)
+
+
+class ETFNeighborSampler:
+    """Échantillonneur de voisinage à la manière du NeighborLoader de PyG.
+
+    Le graphe est indexé une fois en CSR (voisins entrants de chaque nœud); chaque
+    mini-batch part des nœuds ETF graines et tire au plus fan_out[h] voisins par
+    nœud au saut h. Les nœuds graines occupent les premières lignes du sous-graphe.
+    """
+
+    def __init__(self, edge_index: torch.Tensor, num_nodes: int, fan_out: Sequence[int],
+                 undirected: bool = False, seed: Optional[int] = None):
+        """
+        Args:
+            edge_index: Arêtes [2, E] (source -> cible, sens du passage de messages)
+            num_nodes: Nombre total de nœuds du graphe
+            fan_out: Nombre max de voisins tirés par nœud et par saut (-1 = tous)
+            undirected: Si True, les arêtes sont parcourues dans les deux sens (nécessaire sur le
+                graphe ETF -> actif de build_graph_from_raw, où les ETFs n'ont pas d'arête entrante)
+            seed: Graine du générateur aléatoire
+        """
+        src, dst = edge_index.detach().cpu().numpy()
+        edge_ids = np.arange(src.shape[0])
+        if undirected:
+            src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+            edge_ids = np.concatenate([edge_ids, edge_ids])
+
+        # CSR des voisins entrants: voisins de v = neighbors[indptr[v]:indptr[v + 1]]
+        order = np.argsort(dst, kind='stable')
+        self.indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(dst, minlength=num_nodes), out=self.indptr[1:])
+        self.neighbors = src[order]
+        self.edge_ids = edge_ids[order]
+        self.undirected = undirected
+
+        self.fan_out = list(fan_out)
+        self.rng = np.random.default_rng(seed)
+        self._local = np.full(num_nodes, -1, dtype=np.int64)  # index global -> local (réinitialisé après chaque batch)
+
+    def sample(self, seeds: torch.Tensor, graph_data: Data) -> Data:
+        """Construit le sous-graphe échantillonné autour des nœuds graines"""
+        seeds = np.asarray(seeds.detach().cpu().numpy() if isinstance(seeds, torch.Tensor) else seeds, dtype=np.int64)
+        node_ids: List[np.ndarray] = [seeds]
+        self._local[seeds] = np.arange(seeds.shape[0])
+        num_sampled = seeds.shape[0]
+
+        rows, cols, edges = [], [], []
+        frontier = seeds
+        try:
+            for fan in self.fan_out:
+                positions, targets = self._sample_hop(frontier, fan)
+                if not positions.size:
+                    break
+                neighbors = self.neighbors[positions]
+
+                # Nouveaux nœuds dans l'ordre de première apparition
+                unseen = neighbors[self._local[neighbors] < 0]
+                _, first = np.unique(unseen, return_index=True)
+                frontier = unseen[np.sort(first)]
+                self._local[frontier] = np.arange(num_sampled, num_sampled + frontier.shape[0])
+                num_sampled += frontier.shape[0]
+                node_ids.append(frontier)
+
+                rows.append(self._local[neighbors])
+                cols.append(self._local[targets])
+                edges.append(self.edge_ids[positions])
+
+            n_id = np.concatenate(node_ids)
+        finally:
+            self._local[np.concatenate(node_ids)] = -1
+
+        if rows:
+            edge_index = np.stack([np.concatenate(rows), np.concatenate(cols)])
+            edge_id = np.concatenate(edges)
+        else:
+            edge_index = np.empty((2, 0), dtype=np.int64)
+            edge_id = np.empty(0, dtype=np.int64)
+
+        device = graph_data.x.device
+        n_id_t = torch.from_numpy(n_id).to(device)
+        subgraph = Data(
+            x=graph_data.x[n_id_t],
+            edge_index=torch.from_numpy(edge_index).to(device),
+            etf_index=torch.arange(seeds.shape[0], device=device),
+            n_id=n_id_t,
+            batch_size=int(seeds.shape[0])
+        )
+        if graph_data.edge_attr is not None:
+            subgraph.edge_attr = graph_data.edge_attr[torch.from_numpy(edge_id).to(device)]
+        return subgraph
+
+    def _sample_hop(self, frontier: np.ndarray, fan: int):
+        """Tire au plus `fan` arêtes entrantes par nœud de la frontière"""
+        starts = self.indptr[frontier]
+        degrees = self.indptr[frontier + 1] - starts
+
+        # Nœuds dont tous les voisins sont conservés: sélection vectorisée
+        take_all = degrees > 0 if fan < 0 else (degrees > 0) & (degrees <= fan)
+        counts = degrees[take_all]
+        positions = [np.repeat(starts[take_all] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+        targets = [np.repeat(frontier[take_all], counts)]
+
+        # Nœuds à fort degré: tirage sans remise
+        if fan >= 0:
+            for node, start, degree in zip(frontier[degrees > fan], starts[degrees > fan], degrees[degrees > fan]):
+                positions.append(start + self.rng.choice(degree, fan, replace=False))
+                targets.append(np.full(fan, node))
+
+        return np.concatenate(positions), np.concatenate(targets)
@@ -0,0 +1,177 @@
+"""
+Profilage opt-in des étapes du pipeline: temps mur/CPU, allocations par étape et
+piles échantillonnées au format collapsed (flame graphs)
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, Optional
+
+import psutil
+
+from config import PROFILING
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV_VAR = 'ETF_PROFILE'
+
+
+def profiling_requested(config: Optional[Dict] = None) -> bool:
+    """Profilage demandé par la variable d'environnement ETF_PROFILE ou par config['PROFILING']"""
+    flag = os.environ.get(PROFILE_ENV_VAR, '').strip().lower()
+    if flag:
+        return flag in ('1', 'true', 'yes', 'on')
+    return bool((config or {}).get('PROFILING', {}).get('enabled', False))
+
+
+class StackSampler(threading.Thread):
+    """Échantillonne la pile d'un thread à intervalle fixe (sys._current_frames).
+
+    Chaque échantillon est compté sous la forme collapsed 'étape;fichier:fonction;...',
+    lisible par flamegraph.pl, speedscope ou inferno.
+    """
+
+    def __init__(self, thread_id: int, interval: float, stage: Dict[str, str], max_depth: int = 128):
+        super().__init__(name='etf-stack-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stage = stage  # étape courante, mise à jour par le profileur
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < self.max_depth:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            names.append(self.stage['name'])
+            self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class PipelineProfiler:
+    """Profileur des étapes de run_full_analysis.
+
+    Inactif, stage() est un contexte vide. Actif, chaque étape mesure temps mur, temps
+    CPU du processus, blocs alloués (sys.getallocatedblocks) et variation de RSS, et un
+    thread échantillonne la pile du pipeline; torch.profiler est optionnel (annotation
+    des étapes par record_function et trace Chrome).
+    """
+
+    def __init__(self, enabled: bool = False, output_dir: str = PROFILING['output_dir'],
+                 sample_interval: float = 0.005, torch_profiler: bool = False):
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.torch_profiler = torch_profiler
+        self.stages: Dict[str, Dict] = {}
+        self._current = {'name': 'other'}
+        self._sampler: Optional[StackSampler] = None
+        self._torch_session = None
+        self._report: Optional[Dict] = None
+        self._process = psutil.Process()
+
+    @classmethod
+    def from_config(cls, config: Dict, enabled: Optional[bool] = None) -> 'PipelineProfiler':
+        """Profileur configuré par config['PROFILING']; enabled force l'activation (ex. en-tête de requête)"""
+        settings = config.get('PROFILING', {})
+        return cls(
+            enabled=profiling_requested(config) if enabled is None else enabled,
+            output_dir=settings.get('output_dir', PROFILING['output_dir']),
+            sample_interval=settings.get('sample_interval', 0.005),
+            torch_profiler=settings.get('torch_profiler', False))
+
+    def start(self) -> 'PipelineProfiler':
+        if not self.enabled:
+            return self
+        self._sampler = StackSampler(threading.get_ident(), self.sample_interval, self._current)
+        self._sampler.start()
+        if self.torch_profiler:
+            from torch.profiler import ProfilerActivity, profile
+            self._torch_session = profile(activities=[ProfilerActivity.CPU], profile_memory=True)
+            self._torch_session.__enter__()
+        return self
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mesure une étape du pipeline (les étapes répétées sont cumulées)"""
+        if not self.enabled:
+            yield
+            return
+
+        previous = self._current['name']
+        self._current['name'] = name
+        wall, cpu = time.perf_counter(), time.process_time()
+        blocks, rss = sys.getallocatedblocks(), self._process.memory_info().rss
+        annotation = nullcontext()
+        if self._torch_session is not None:
+            from torch.profiler import record_function
+            annotation = record_function(f"stage::{name}")
+        try:
+            with annotation:
+                yield
+        finally:
+            stats = self.stages.setdefault(name, {'wall_s': 0.0, 'cpu_s': 0.0, 'allocated_blocks': 0,
+                                                  'rss_delta_bytes': 0, 'calls': 0})
+            stats['wall_s'] += time.perf_counter() - wall
+            stats['cpu_s'] += time.process_time() - cpu
+            stats['allocated_blocks'] += sys.getallocatedblocks() - blocks
+            stats['rss_delta_bytes'] += self._process.memory_info().rss - rss
+            stats['calls'] += 1
+            self._current['name'] = previous
+
+    def finish(self) -> Optional[Dict]:
+        """Arrête l'échantillonnage et écrit stages.json, stacks.folded (et torch_trace.json).
+        Les appels suivants retournent le même rapport.
+
+        Returns:
+            Rapport {'stages': {...}, 'files': {...}}, None si inactif
+        """
+        if not self.enabled or self._report is not None:
+            return self._report
+        if self._sampler is not None:
+            self._sampler.stop()
+
+        run_dir = os.path.join(self.output_dir, datetime.now().strftime('%Y%m%d-%H%M%S-%f'))
+        os.makedirs(run_dir, exist_ok=True)
+        files = {'stages': os.path.join(run_dir, 'stages.json'),
+                 'collapsed_stacks': os.path.join(run_dir, 'stacks.folded')}
+
+        stacks = self._sampler.stacks if self._sampler is not None else Counter()
+        with open(files['collapsed_stacks'], 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        samples = Counter()
+        for stack, count in stacks.items():
+            samples[stack.split(';', 1)[0]] += count
+        for name, stats in self.stages.items():
+            stats['samples'] = samples.get(name, 0)
+        with open(files['stages'], 'w') as f:
+            json.dump(self.stages, f, indent=2)
+
+        if self._torch_session is not None:
+            self._torch_session.__exit__(None, None, None)
+            files['torch_trace'] = os.path.join(run_dir, 'torch_trace.json')
+            self._torch_session.export_chrome_trace(files['torch_trace'])
+
+        summary = ', '.join(f"{name}={stats['wall_s']:.3f}s" for name, stats in self.stages.items())
+        logger.info(f"Pipeline profile written to {run_dir}: {summary}")
+        self._report = {'stages': self.stages, 'files': files}
+        return self._report
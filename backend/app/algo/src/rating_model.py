@@ -2,20 +2,22 @@
 ETFs Analysis System - Core Rating Model (Version Intégrée)
 """
 
+import copy
 import datetime
+import functools
 import json
 import logging
 import pickle
-from typing import Dict, List, Optional, Tuple, Union
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 import numpy as np
 import pandas as pd
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader, TensorDataset
-import shap
 from datetime import datetime
 from torch_geometric.data import Data
-from pandas import json_normalize
 
 logger = logging.getLogger(__name__)
 
@@ -31,13 +33,38 @@ from stress_scenarios import ETFStressTester
 from etf_feature_builder import ETFFeatureBuilder
 from etf_graph import ETFGraphProcessor, ETFGraphConfig
 from explanations import ETFExplanationGenerator
-from memory_optimizer import MemoryOptimizer
+from memory_optimizer import MemoryOptimizer, PrefetchTensorLoader, autocast_context, configure_cpu_threads
 from data_utils import DataPreprocessor
 import data_utils as du
 from etf_scoring import ETFScoring
+from embedding_cache import ETFEmbeddingCache, model_fingerprint
+from metrics_exporter import ETFMetricsExporter
+from profiling import PipelineProfiler
+from model_registry import ModelRegistry
+from monte_carlo_stress import ETFMonteCarloStress, ETFRiskModel, nav_history
+from config import ADVANCED_SETTINGS, MONTE_CARLO_STRESS
 
 
 
+@dataclass(frozen=True)
+class ServedModels:
+    """État servi par le moteur: modèles et transformations ajustées qui doivent rester
+    cohérents entre eux. Un rechargement remplace l'objet entier en une affectation;
+    un lecteur qui garde la référence voit l'ancienne ou la nouvelle version, jamais un mélange."""
+    semi_supervised_model: ETFSemiSupervisedModel
+    gnn_model: ETFGraphModel
+    data_pipeline: ETFDataPipeline
+    graph_processor: ETFGraphProcessor
+    explanation_generator: ETFExplanationGenerator
+
+
+def _holds_model_lock(method):
+    """Exécute la méthode sous le verrou des modèles (entraînement en place, échange de version)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._model_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class ETFScoringEngine:
@@ -50,9 +77,15 @@ class ETFScoringEngine:
         
         self.config = config
         self.device = self._init_device()
-        self.monitor = ETFSystemMonitor()
-        self.data_pipeline = ETFDataPipeline()
-        self.stress_tester = ETFStressTester(config['stress_scenarios'])
+        # Les pools de threads torch sont réglés par les points d'entrée (configure_cpu_threads)
+        self.cpu_profile = config.get('CPU_PROFILE', {})
+        exporter = ETFMetricsExporter() if config.get('prometheus_metrics', True) else None
+        self.monitor = ETFSystemMonitor(capacity=config.get('monitor_capacity', 1024), exporter=exporter)
+        data_pipeline = ETFDataPipeline()
+        self.monte_carlo_config = config.get('MONTE_CARLO_STRESS', MONTE_CARLO_STRESS)
+        self.stress_tester = ETFStressTester(
+            config['stress_scenarios'],
+            column_sensitivities=self.monte_carlo_config.get('column_sensitivities'))
         graph_config =  ETFGraphConfig(
             normalize_features=config['GRAPH_CONFIG']['normalize_features'],
             use_alternative_data=config['FEATURE_FLAGS']['USE_ALTERNATIVE_DATA'],
@@ -64,37 +97,43 @@ class ETFScoringEngine:
             device=self.device)
         
 
-        self.graph_processor = ETFGraphProcessor(graph_config)
+        graph_processor = ETFGraphProcessor(graph_config)
 
         
         # Initialisation avec la configuration complète
         self.feature_builder = ETFFeatureBuilder({
+            'REQUIRED_COLUMNS': config['REQUIRED_COLUMNS'],
             'RISK_PARAMETERS': config.get('RISK_PARAMETERS', {}),
             'VALIDATION_THRESHOLDS': config.get('VALIDATION_THRESHOLDS', {})
         })
         
-        # Remplacer cette vérification :
-        if len(self.feature_builder.transform(pd.DataFrame(columns=REQUIRED_COLUMNS)).columns) != config['MODEL_CONFIG']['gnn_input_dim']:
-            raise ValueError("Incompatibilité dimension features/modèle")
-        
-        # Par cette version plus informative :
-        test_df = pd.DataFrame(columns=REQUIRED_COLUMNS)
-        transformed_features = self.feature_builder.transform(test_df)
-        actual_dim = len(transformed_features.columns)
+        # Dimension des features déduite de la configuration (sans transformer de données)
+        actual_dim = self.feature_builder.output_dim
         expected_dim = config['MODEL_CONFIG']['gnn_input_dim']
 
         if actual_dim != expected_dim:
             raise ValueError(
                 f"Incompatibilité dimension features/modèle. "
                 f"Attendu: {expected_dim}, Obtenu: {actual_dim}. "
-                f"Colonnes transformées: {list(transformed_features.columns)}"
+                f"Colonnes transformées: {self.feature_builder.output_columns()}"
                 )
         
         # Initialisation des modèles
-        self._init_models()
+        semi_supervised_model, gnn_model = self._init_models()
+        self.attribution_method = config.get('attribution_method', 'integrated_gradients')
+        self._model_lock = threading.RLock()
+        self.served = ServedModels(
+            semi_supervised_model=semi_supervised_model,
+            gnn_model=gnn_model,
+            data_pipeline=data_pipeline,
+            graph_processor=graph_processor,
+            explanation_generator=self._init_explanation_generator(semi_supervised_model))
         self._init_loss_and_optim()
-        self.explanation_generator = ETFExplanationGenerator(model=self.semi_supervised_model,device=self.device)
         self.memory_optimizer = MemoryOptimizer(device=self.device, safety_factor=0.7)
+        self.embedding_cache = ETFEmbeddingCache(
+            config.get('embedding_cache_dir', ADVANCED_SETTINGS['embedding_cache_dir']))
+        self.model_registry = ModelRegistry(
+            config.get('model_registry_dir', ADVANCED_SETTINGS['model_registry_dir']))
         
         logger.info("ETFScoringEngine initialized with config: %s", config)
     
@@ -102,10 +141,31 @@ class ETFScoringEngine:
         """Détermine le device de calcul optimal"""
         return torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     
-    def _init_models(self):
+    # État servi courant: un lecteur qui enchaîne plusieurs accès prend self.served une fois
+    @property
+    def semi_supervised_model(self) -> ETFSemiSupervisedModel:
+        return self.served.semi_supervised_model
+
+    @property
+    def gnn_model(self) -> ETFGraphModel:
+        return self.served.gnn_model
+
+    @property
+    def data_pipeline(self) -> ETFDataPipeline:
+        return self.served.data_pipeline
+
+    @property
+    def graph_processor(self) -> ETFGraphProcessor:
+        return self.served.graph_processor
+
+    @property
+    def explanation_generator(self) -> ETFExplanationGenerator:
+        return self.served.explanation_generator
+
+    def _init_models(self) -> Tuple[ETFSemiSupervisedModel, ETFGraphModel]:
         """Initialise les différents modèles composants"""
         # Modèle semi-supervisé principal
-        self.semi_supervised_model = ETFSemiSupervisedModel(
+        semi_supervised_model = ETFSemiSupervisedModel(
             input_dim=self.config['input_dim'],  # 25
             combined_dim=self.config.get('combined_dim')  # 89
         ).to(self.device)
@@ -115,10 +175,19 @@ class ETFScoringEngine:
         self.explainer = None
         
         # Initialize models
-        self.gnn_model = ETFGraphModel(
+        gnn_model = ETFGraphModel(
             input_dim=self.config.get('gnn_input_dim')
             ).to(self.device)
         print(f"Config gnn_input_dim for etf_graph_model : {self.config.get('gnn_input_dim')}")
+        return semi_supervised_model, gnn_model
+
+    def _init_explanation_generator(self, model: nn.Module,
+                                    attribution_cache=None) -> ETFExplanationGenerator:
+        return ETFExplanationGenerator(
+            model=model,
+            device=self.device,
+            attribution_method='integrated_gradients' if self.attribution_method == 'shap' else self.attribution_method,
+            attribution_cache=attribution_cache)
     
     def _init_loss_and_optim(self):
         """Initialise les fonctions de loss et optimiseurs"""
@@ -135,8 +204,16 @@ class ETFScoringEngine:
             lr=self.config['learning_rate'],
             weight_decay=self.config['weight_decay']
         )
+        self.scheduler = torch.optim.lr_scheduler.ReduceLROnPlateau(
+            self.optimizer,
+            mode='min',
+            factor=self.config.get('lr_scheduler_factor', 0.5),
+            patience=self.config.get('lr_scheduler_patience', 2)
+        )
+        self._compiled_forward = None
     
     
+    @_holds_model_lock
     def train(self, X: pd.DataFrame, y: pd.Series, graph_data: Optional[Dict] = None,epochs: int = 100) -> Dict:
         """Entraînement complet du système intégrant modèle semi-supervisé et GNN
            Args:
@@ -193,6 +270,7 @@ class ETFScoringEngine:
             
             # Suivi des performances globales
             self.monitor.track_performance('total_training_loss',train_metrics.get('gnn_loss', train_metrics['supervised_loss']))
+            self.monitor.set_model_version(model_fingerprint(self.semi_supervised_model))
             self.monitor.log_operation_success('full_training')
             
             return train_metrics
@@ -217,41 +295,186 @@ class ETFScoringEngine:
          
     
     
+    @_holds_model_lock
+    def train_distributed(self, X: pd.DataFrame, y: pd.Series, graph_data: Optional[Data] = None,
+                          epochs: int = 100, world_size: Optional[int] = None) -> Dict:
+        """Entraînement data-parallèle sur world_size processus CPU locaux (gloo).
+        Les poids entraînés par le rang 0 sont rechargés dans ce moteur."""
+        from distributed_training import train_distributed
+        
+        if len(X) != len(y):
+            raise ValueError("X et y doivent avoir la même longueur")
+        
+        self.monitor.log_operation_start('distributed_training')
+        try:
+            metrics = train_distributed(self.config, X, y, graph_data=graph_data,
+                                        epochs=epochs, world_size=world_size)
+            self.load(metrics['state_path'])
+            self.monitor.track_performance('supervised_loss', metrics['supervised_loss'])
+            self.monitor.log_operation_success('distributed_training')
+            return metrics
+        except Exception as e:
+            msg = f"Distributed training error: {str(e)}"
+            self.monitor.log_operation_failure('distributed_training', msg)
+            logger.error(msg, exc_info=True)
+            raise
+    
+    
     def _train_semi_supervised(self, X: torch.Tensor, y: torch.Tensor, 
                               epochs: int) -> Dict:
-        """Entraînement du modèle semi-supervisé"""
-        dataset = TensorDataset(X, y)
-        loader = DataLoader(dataset, batch_size=self.config['batch_size'], shuffle=True)
-        
-        for epoch in range(epochs):
-            for batch_X, batch_y in loader:
-                try:
-                    self.optimizer.zero_grad()
-                    # Forward pass supervisé
-                    preds = self.semi_supervised_model(batch_X, use_combined=False)
-                    supervised_loss = self.loss_fn(preds, batch_y)
-                    # Forward pass VAE
-                    recon, mu, logvar = self.semi_supervised_model(batch_X, supervised=False)
-                    vae_loss = self.loss_fn(
-                        preds=preds,
-                        targets=batch_y,
-                        vae_outputs=(recon, mu, logvar),
-                        original_input=batch_X
-                        )
-                    # Backpropagation
-                    total_loss = supervised_loss + vae_loss
-                    total_loss.backward()
-                    self.optimizer.step()
+        """Entraînement du modèle semi-supervisé avec validation, early stopping,
+        réduction du LR sur plateau et conservation du meilleur checkpoint"""
+        X_train, y_train, X_val, y_val = self._split_validation(X, y)
+        loader = PrefetchTensorLoader(X_train, y_train, batch_size=self._training_batch_size(X_train),
+                                      shuffle=True, prefetch=self.cpu_profile.get('prefetch_batches', 2))
+        return self._fit_semi_supervised(lambda epoch: loader, X_val, y_val, epochs)
+
+    def _fit_semi_supervised(self, epoch_batches: Callable[[int], Iterable], X_val: Optional[torch.Tensor],
+                             y_val: Optional[torch.Tensor], epochs: int,
+                             reduce_metrics: Optional[Callable[[Dict], Dict]] = None) -> Dict:
+        """Boucle d'époques commune aux entraînements local et distribué.
+        Args:
+            epoch_batches: Fournit les batchs (X, y) de l'époque demandée
+            X_val, y_val: Jeu de validation (None: perte d'entraînement surveillée)
+            reduce_metrics: Agrégation des pertes d'entraînement entre processus"""
+        forward_all = self._training_forward()
+        
+        patience = self.config.get('early_stopping_patience', 5)
+        min_delta = self.config.get('early_stopping_min_delta', 1e-4)
+        checkpoint_path = self.config.get('checkpoint_path')
+        best = {'loss': float('inf'), 'epoch': 0, 'state': None}
+        epochs_without_improvement = 0
+        
+        try:
+            for epoch in range(1, epochs + 1):
+                epoch_metrics = self._train_epoch(epoch_batches(epoch), forward_all)
+                if reduce_metrics is not None:
+                    epoch_metrics = reduce_metrics(epoch_metrics)
+                
+                # Perte surveillée: MSE supervisée de validation (entraînement si pas de validation)
+                val_loss = self._validation_loss(X_val, y_val) if X_val is not None else epoch_metrics['supervised_loss']
+                epoch_metrics['val_loss'] = val_loss
+                self.scheduler.step(val_loss)
+                self._track_epoch(epoch, epoch_metrics)
                 
-                finally:
-                    self.memory_optimizer.clear_tensors(batch_X, batch_y)
+                if val_loss < best['loss'] - min_delta:
+                    best = {'loss': val_loss, 'epoch': epoch, 'metrics': epoch_metrics,
+                            'state': copy.deepcopy(self.semi_supervised_model.state_dict())}
+                    epochs_without_improvement = 0
+                    if checkpoint_path:
+                        self.save(checkpoint_path)
+                else:
+                    epochs_without_improvement += 1
+                    if epochs_without_improvement >= patience:
+                        logger.info(f"Early stopping à l'époque {epoch} (meilleure: {best['epoch']}, "
+                                    f"val_loss={best['loss']:.6f})")
+                        break
+        finally:
+            self.memory_optimizer.clear_tensors()
+        
+        # Restauration des poids de la meilleure époque
+        if best['state'] is not None:
+            self.semi_supervised_model.load_state_dict(best['state'])
+            epoch_metrics = best['metrics']
         
         return {
-            'supervised_loss': supervised_loss.item(),
-            'vae_loss': vae_loss.item()}
+            'supervised_loss': epoch_metrics['supervised_loss'],
+            'vae_loss': epoch_metrics['vae_loss'],
+            'val_loss': epoch_metrics['val_loss'],
+            'best_epoch': best['epoch'],
+            'epochs_run': epoch,
+            'stopped_early': epoch < epochs}
+
+    def _training_batch_size(self, X_train: torch.Tensor) -> int:
+        """Batch size configuré, ou mesuré au meilleur débit si autotune_batch_size"""
+        if not self.cpu_profile.get('autotune_batch_size', False):
+            return self.config['batch_size']
+        batch_size = self.memory_optimizer.calculate_adaptive_batch_size(
+            len(X_train), X_train[0],
+            model=self.semi_supervised_model,
+            candidates=self.cpu_profile.get('batch_size_candidates'))
+        logger.info(f"Batch size autotuned: {batch_size}")
+        return batch_size
+
+    def _train_epoch(self, loader: Iterable, forward_all) -> Dict:
+        """Une époque d'entraînement; retourne les pertes moyennes pondérées par batch"""
+        self.semi_supervised_model.train()
+        bf16 = self.cpu_profile.get('bf16_autocast', False)
+        totals = {'supervised_loss': 0.0, 'vae_loss': 0.0}
+        num_samples = 0
+        start = time.perf_counter()
+        
+        for batch_X, batch_y in loader:
+            self.optimizer.zero_grad(set_to_none=True)
+            # Forward fusionné: tête supervisée et VAE sur le même encodage
+            with autocast_context(self.device, bf16):
+                preds, vae_outputs = forward_all(batch_X)
+                vae_loss, supervised_loss = self.loss_fn(
+                    preds=preds,
+                    targets=batch_y,
+                    vae_outputs=vae_outputs,
+                    original_input=batch_X,
+                    return_supervised=True
+                    )
+            # Backpropagation (même objectif qu'auparavant: supervisé + composite)
+            total_loss = supervised_loss + vae_loss
+            total_loss.backward()
+            self.optimizer.step()
+            
+            totals['supervised_loss'] += supervised_loss.item() * len(batch_X)
+            totals['vae_loss'] += vae_loss.item() * len(batch_X)
+            num_samples += len(batch_X)
+        
+        self.monitor.track_performance('training_throughput', num_samples / max(time.perf_counter() - start, 1e-9))
+        return {name: total / max(num_samples, 1) for name, total in totals.items()}
+
+    def _split_validation(self, X: torch.Tensor, y: torch.Tensor):
+        """Sépare un jeu de validation aléatoire (None si trop peu d'échantillons)"""
+        num_val = int(len(X) * self.config.get('validation_split', 0.2))
+        if num_val < 1 or num_val >= len(X):
+            return X, y, None, None
+        
+        perm = torch.randperm(len(X), device=X.device)
+        val_idx, train_idx = perm[:num_val], perm[num_val:]
+        return X[train_idx], y[train_idx], X[val_idx], y[val_idx]
+
+    def _validation_loss(self, X_val: torch.Tensor, y_val: torch.Tensor) -> float:
+        """MSE supervisée sur le jeu de validation (mode eval, sans gradient)"""
+        self.semi_supervised_model.eval()
+        try:
+            with torch.no_grad():
+                preds = self.semi_supervised_model(X_val)
+                return self.loss_fn(preds, y_val).item()
+        finally:
+            self.semi_supervised_model.train()
+
+    def _track_epoch(self, epoch: int, metrics: Dict) -> None:
+        """Diffuse les métriques de l'époque vers le moniteur"""
+        self.monitor.track_performance('epoch', epoch)
+        self.monitor.track_performance('epoch_supervised_loss', metrics['supervised_loss'])
+        self.monitor.track_performance('epoch_vae_loss', metrics['vae_loss'])
+        self.monitor.track_performance('epoch_val_loss', metrics['val_loss'])
+        self.monitor.track_performance('learning_rate', self.optimizer.param_groups[0]['lr'])
+        logger.debug(f"Epoch {epoch}: train={metrics['supervised_loss']:.6f} val={metrics['val_loss']:.6f}")
 
     
 
+    def _training_forward(self):
+        """Forward fusionné du modèle semi-supervisé, compilé si config['compile_model']"""
+        forward_all = self.semi_supervised_model.forward_all
+        if not self.config.get('compile_model', False):
+            return forward_all
+        
+        if self._compiled_forward is None:
+            try:
+                compiled = torch.compile(forward_all, dynamic=True)
+                compiled(torch.zeros(2, self.config['input_dim'], device=self.device))  # compilation immédiate
+                self._compiled_forward = compiled
+            except Exception as e:
+                logger.warning(f"torch.compile indisponible, entraînement en mode eager: {str(e)}")
+                self._compiled_forward = forward_all
+        return self._compiled_forward
+
     def _train_with_gnn(self, graph_data: Data, y: torch.Tensor) -> Dict:
         """Effectue l'entraînement avec le modèle GNN en utilisant le monitoring système
          Args:graph_data: Données graphiques sous forme brute ou prétraitées y: 
@@ -270,14 +493,27 @@ class ETFScoringEngine:
             else:
                 self.monitor.track_performance('data_conversion', 0)
             
-            # Appel direct à la méthode d'entraînement du modèle GNN
-            metrics = self.gnn_model.train(
-                graph_data=graph_data,
-                targets=y,
-                downstream_model=self.semi_supervised_model,
-                loss_fn=self.loss_fn,
-                optimizer=self.optimizer,
-                device=self.device)
+            # Grands graphes: mini-batchs échantillonnés autour des ETFs, sinon graphe complet
+            if graph_data.num_nodes >= self.config.get('gnn_minibatch_min_nodes', 50000):
+                metrics = self.gnn_model.train_minibatch(
+                    graph_data=graph_data,
+                    targets=y,
+                    downstream_model=self.semi_supervised_model,
+                    loss_fn=self.loss_fn,
+                    optimizer=self.optimizer,
+                    device=self.device,
+                    epochs=self.config.get('gnn_epochs', 1),
+                    batch_size=self.config.get('gnn_batch_size', 512),
+                    fan_out=self.config.get('gnn_fan_out', [10, 5]),
+                    undirected=self.config.get('gnn_sample_undirected', True))
+            else:
+                metrics = self.gnn_model.train(
+                    graph_data=graph_data,
+                    targets=y,
+                    downstream_model=self.semi_supervised_model,
+                    loss_fn=self.loss_fn,
+                    optimizer=self.optimizer,
+                    device=self.device)
             
             # Suivi
             self.monitor.track_performance('gnn_training', metrics['gnn_loss'])
@@ -338,16 +574,22 @@ class ETFScoringEngine:
         return {'MSE': mse, 'MAE': mae}
 
         
-    def explain(self, X: pd.DataFrame, sample_size: int = 100) -> pd.DataFrame:
-        """Génère des explications SHAP pour les prédictions
+    def explain(self, X: pd.DataFrame, sample_size: Optional[int] = None) -> pd.DataFrame:
+        """Génère les contributions des features aux prédictions
         Args:
         X: 
-          Données à expliquer
-          sample_size: Taille de l'échantillon pour approximation   
+          Features à expliquer (sortie de _prepare_etf_features)
+          sample_size: Taille de l'échantillon (None = tous les ETFs)
         Returns:
-        DataFrame avec les valeurs SHAP
+        DataFrame des contributions (gradients intégrés, gradient×entrée ou SHAP
+        selon config['attribution_method'])
         """
-        
+        if self.attribution_method != 'shap':
+            sample = X if sample_size is None else X.sample(min(sample_size, len(X)))
+            return self.explanation_generator.compute_attributions(sample)
+
+        # SHAP DeepExplainer (lent: réservé aux analyses ponctuelles)
+        sample_size = sample_size or 100
         if self.explainer is None:
             self._init_explainer(X)
         
@@ -371,9 +613,49 @@ class ETFScoringEngine:
             X: Données de base
         Returns: Résultats des stress tests
         """
-        return self.stress_tester.run_all_scenarios(X, self)
+        return self.stress_tester.run_all_scenarios(
+            base_data=X,
+            feature_builder=self.feature_builder,
+            model=self.semi_supervised_model,
+            device=self.device)
     
 
+    def evaluate_tail_risk(self, raw_etf_data: List[Dict], processed_data: pd.DataFrame,
+                           features: Optional[pd.DataFrame] = None, method: Optional[str] = None) -> pd.DataFrame:
+        """Distribution des scores de chaque ETF sous stress Monte Carlo ou rejeu historique
+        Args:
+            raw_etf_data: ETFs bruts (corrélations, volatilités et historique de NAV)
+            processed_data: Données traitées, alignées ligne à ligne sur raw_etf_data
+            features: self._prepare_etf_features(processed_data) s'il est déjà calculé
+            method: 'monte_carlo' ou 'historical' (défaut: MONTE_CARLO_STRESS['method'])
+        Returns: Quantiles des scores par ETF (voir ETFMonteCarloStress.run)
+        """
+        method = method or self.monte_carlo_config.get('method', 'monte_carlo')
+        risk_model = ETFRiskModel.from_records(raw_etf_data, self.monte_carlo_config)
+        return ETFMonteCarloStress(self.monte_carlo_config).run(
+            processed_data,
+            feature_builder=self.feature_builder,
+            model=self.semi_supervised_model,
+            device=self.device,
+            risk_model=risk_model,
+            base_features=features,
+            history=nav_history(raw_etf_data) if method == 'historical' else None,
+            method=method)
+
+    def backtest(self, features: pd.DataFrame, prices: pd.DataFrame) -> pd.DataFrame:
+        """Backtest walk-forward de la configuration du moteur (config['BACKTEST'])
+
+        N'évalue que le modèle semi-supervisé sur des features prétraitées par fold:
+        le pipeline de production et la notation ETFScoring ne sont pas exercés
+        (voir WalkForwardBacktest).
+        Args:
+            features: Features indexées par (date, ETF), sorties de self.feature_builder
+            prices: Historique de prix [dates, ETFs]
+        Returns: Rank IC, hit rate et rotation par fold (voir WalkForwardBacktest.run)
+        """
+        from backtesting import WalkForwardBacktest
+        return WalkForwardBacktest(self.config, **self.config.get('BACKTEST', {})).run(features, prices)
+
     def save(self, path: str):
         """Sauvegarde l'état complet du moteur"""
         state = {
@@ -387,30 +669,95 @@ class ETFScoringEngine:
     
 
 
+    def export_scoring_model(self, path: str, export_format: str = 'torchscript',
+                             quantize: bool = False) -> Dict:
+        """Exporte le chemin supervisé en artefact figé, chargeable par scoring_runtime.ScoringRuntime"""
+        from model_export import export_scoring_model
+        return export_scoring_model(self.semi_supervised_model, path,
+                                    export_format=export_format, quantize=quantize)
+    
+    
+    @_holds_model_lock
     def load(self, path: str):
         """Charge un état sauvegardé"""
         state = torch.load(path)
         self.semi_supervised_model.load_state_dict(state['model_state'])
         self.gnn_model.load_state_dict(state['gnn_state'])
         self.optimizer.load_state_dict(state['optimizer'])
+        self.monitor.set_model_version(model_fingerprint(self.semi_supervised_model))
         logger.info("Model loaded from %s", path)
 
+    def register_model(self, include_optimizer: bool = False, tag: Optional[str] = None) -> str:
+        """Publie l'état courant (poids, pipeline ajusté, schéma) dans le registre de modèles"""
+        return self.model_registry.register(self, include_optimizer=include_optimizer, tag=tag)
 
+    def load_from_registry(self, version: Optional[str] = None, inference_only: bool = True) -> Dict:
+        """Charge une version du registre (LATEST par défaut) et l'échange atomiquement.
 
-    def run_full_analysis(self, raw_etf_data: List[Dict]) -> Dict:
+        Modèles, pipeline ajusté et bornes du graphe sont construits à côté de l'état en
+        service, puis self.served est remplacé en une affectation (voir ServedModels).
+        L'échange attend la fin d'un entraînement ou d'une analyse en cours (verrou des
+        modèles). En mode inference_only, les poids restent mappés en mémoire
+        (assign=True, sans copie) et l'état de l'optimiseur n'est pas lu.
+        Returns: Manifeste de la version chargée
+        """
+        bundle = self.model_registry.load(version, map_location=self.device, inference_only=inference_only)
+        manifest = bundle['manifest']
+        self.model_registry.check_compatible(manifest, self.config, self.feature_builder.output_columns())
+
+        semi_supervised_model = ETFSemiSupervisedModel(
+            input_dim=self.config['input_dim'],
+            combined_dim=self.config.get('combined_dim')).to(self.device)
+        semi_supervised_model.load_state_dict(bundle['model_state'], assign=inference_only)
+        gnn_model = ETFGraphModel(input_dim=self.config.get('gnn_input_dim')).to(self.device)
+        gnn_model.load_state_dict(bundle['gnn_state'], assign=inference_only)
+        if inference_only:
+            semi_supervised_model.eval()
+            gnn_model.eval()
+
+        graph_processor = ETFGraphProcessor(self.graph_processor.config)
+        graph_processor.feature_stats = bundle['graph_feature_stats']
+        served = ServedModels(
+            semi_supervised_model=semi_supervised_model,
+            gnn_model=gnn_model,
+            data_pipeline=bundle['data_pipeline'],
+            graph_processor=graph_processor,
+            # Cache d'attributions conservé: il est indexé par empreinte du modèle
+            explanation_generator=self._init_explanation_generator(
+                semi_supervised_model, self.explanation_generator.attribution_cache))
+
+        # Échange
+        with self._model_lock:
+            self.served = served
+            self._init_loss_and_optim()
+            if 'optimizer_state' in bundle:
+                self.optimizer.load_state_dict(bundle['optimizer_state'])
+            self.explainer = None
+
+        self.monitor.set_model_version(manifest['version'])
+        logger.info(f"Model version {manifest['version']} loaded from registry")
+        return manifest
+
+
+
+    @_holds_model_lock
+    def run_full_analysis(self, raw_etf_data: List[Dict], profile: Optional[bool] = None) -> Dict:
         """Pipeline complet intégrant tous les composants: 
         données → features → graphe → entraînement → notation → analyse de risque → 
         scénarios de stress → explicabilité
-        Args:raw_etf_data: Données brutes des ETFs au format JSON/dictionnaire """
+        Args:raw_etf_data: Données brutes des ETFs au format JSON/dictionnaire
+             profile: Force (ou désactive) le profilage des étapes; par défaut ETF_PROFILE / config['PROFILING'] """
         
         self.monitor.log_operation_start('full_analysis')
+        profiler = PipelineProfiler.from_config(self.config, enabled=profile).start()
         
         try:
 
             # Traitement des données
-            flattened_df = json_normalize(raw_etf_data, sep='.')
-            processed = data_preprocessor.process_numerical_data(flattened_df)
-            processed_data = self.data_pipeline.process(processed)
+            with profiler.stage('pipeline'):
+                flattened_df = self.data_pipeline.flatten_records(raw_etf_data)
+                processed = data_preprocessor.process_numerical_data(flattened_df)
+                processed_data = self.data_pipeline.process(processed, flatten=False)
             
             if processed_data.empty:
                 raise ValueError("Processed ETF data is empty after pipeline")
@@ -420,7 +767,8 @@ class ETFScoringEngine:
             
             
             # 3 Construction des features et du graphe 
-            graph_data = self.graph_processor.build_graph_from_raw(raw_etf_data)
+            with profiler.stage('graph_build'):
+                graph_data = self.graph_processor.build_graph_from_raw(raw_etf_data)
         
             if not isinstance(graph_data, Data):
                 raise ValueError("build_graph_from_raw must return a PyG Data object")
@@ -428,45 +776,60 @@ class ETFScoringEngine:
                 raise ValueError("Data object must contain x and edge_index attributes")
             
             # TRANSFORMATION EN FEATURES
-            features = self._prepare_etf_features(processed_data)
+            with profiler.stage('features'):
+                features = self._prepare_etf_features(processed_data)
 
             # 4 generation de cibles fictives proxy 
             dummy_targets = pd.Series(np.random.rand(len(processed_data)))
           
             # 5. Entraînement AVEC LES FEATURES
-            self.train(X=features, y=dummy_targets, graph_data=graph_data, epochs=30)
+            with profiler.stage('training'):
+                self.train(X=features, y=dummy_targets, graph_data=graph_data, epochs=30)
 
             # 6. Notation    
-            scoring_system = ETFScoring(
-                model=self.semi_supervised_model,
-                gnn_model=self.gnn_model,
-                device=self.device,
-                monitor=self.monitor,
-                feature_selector=features
-                )
-            
-            # print(f"configuration du scoring Feature selector : 
-            # {scoring_system.feature_selector.columns}")
-            
-            # Notation AVEC LES FEATURES
-            ratings = scoring_system.predict(scoring_system.feature_selector)
+            with profiler.stage('scoring'):
+                scoring_system = ETFScoring(
+                    model=self.semi_supervised_model,
+                    gnn_model=self.gnn_model,
+                    device=self.device,
+                    monitor=self.monitor,
+                    feature_selector=features,
+                    graph_data=graph_data,
+                    embedding_cache=self.embedding_cache
+                    )
+                
+                # Notation AVEC LES FEATURES
+                ratings = scoring_system.predict(scoring_system.features_df)
     
             # 7. Analyse de risque avec validation
-            validator = ETFValidator(thresholds=self.config['VALIDATION_THRESHOLDS'])
-            risk_analysis = validator.validate_ratings(ratings, processed_data)
+            with profiler.stage('validation'):
+                validator = ETFValidator(thresholds=self.config['VALIDATION_THRESHOLDS'])
+                risk_analysis = validator.validate_ratings(ratings, processed_data)
             
             # 8. Scénarios de stress
-            stress_results = self.stress_tester.run_all_scenarios(
-                base_data=processed_data,
-                feature_builder=self.feature_builder,
-                model=self.semi_supervised_model,
-                device=self.device
-                )
-            
-
-            # 9. Explicabilité (désactivée pour le moment)
-            # sample_size = min(25, len(processed_data))
-            # # explanations = self.explain(X=processed_data, sample_size=sample_size)
+            with profiler.stage('stress'):
+                risk_model = ETFRiskModel.from_records(raw_etf_data, self.monte_carlo_config)
+                stress_results = self.stress_tester.run_all_scenarios(
+                    base_data=processed_data,
+                    feature_builder=self.feature_builder,
+                    model=self.semi_supervised_model,
+                    device=self.device,
+                    base_features=features,
+                    risk_model=risk_model
+                    )
+                if self.monte_carlo_config.get('enabled'):
+                    tail_risk = self.evaluate_tail_risk(raw_etf_data, processed_data, features=features)
+                    stress_results['tail_risk'] = tail_risk.to_dict('list')
+            
+
+            # 9. Explicabilité: principales contributions par ETF (attributions en cache)
+            if self.attribution_method != 'shap':
+                with profiler.stage('explanations'):
+                    top_positive, top_negative = self.explanation_generator.generate_shap_insights(
+                        features, n_features=self.config.get('explanation_top_k', 3))
+                if len(top_positive) == len(ratings):
+                    ratings['top_positive_features'] = top_positive
+                    ratings['top_negative_features'] = top_negative
             
             # 10. Métadonnées système
             system_stats = {
@@ -477,7 +840,7 @@ class ETFScoringEngine:
             
             self.monitor.log_operation_success('full_analysis')
             
-            return {
+            results = {
                 'timestamp': datetime.now().isoformat(),
                 'ratings': ratings.to_dict('records'),
                 'risk_analysis': risk_analysis,
@@ -490,6 +853,10 @@ class ETFScoringEngine:
                     },
                 'system': system_stats
                 }
+            report = profiler.finish()
+            if report is not None:
+                results['profile'] = report
+            return results
         
         except ValueError as ve:
             error_msg = f"Data validation error: {str(ve)}"
@@ -509,6 +876,9 @@ class ETFScoringEngine:
             logger.error(error_msg, exc_info=True)
             raise
 
+        finally:
+            profiler.finish()  # arrête l'échantillonnage aussi en cas d'échec (sans effet si déjà écrit)
+
 
 
 
@@ -584,6 +954,7 @@ class ETFScoringEngine:
             background_tensor = torch.FloatTensor(features.values).to(self.device)
 
             # 5. Initialisation avec vérification du modèle
+            import shap  # chargé à la demande
             self.explainer = shap.DeepExplainer(
                 model=self.semi_supervised_model,
                 data=background_tensor)
@@ -607,41 +978,12 @@ class ETFScoringEngine:
 
 
 if __name__ == "__main__":
-    from config import (
-        MODEL_CONFIG,
-        RISK_PARAMETERS,
-        VALIDATION_THRESHOLDS,
-        REQUIRED_COLUMNS,
-        GRAPH_CONFIG,
-        FEATURE_FLAGS,
-        STRESS_SCENARIOS
-    )
+    from config import REQUIRED_COLUMNS, build_engine_config
     
     data_preprocessor = DataPreprocessor()
 
     # Configuration consolidée
-    config = {
-        # Import direct des configurations principales
-        'MODEL_CONFIG': MODEL_CONFIG,
-        'RISK_PARAMETERS': RISK_PARAMETERS,
-        'VALIDATION_THRESHOLDS': VALIDATION_THRESHOLDS,
-        'REQUIRED_COLUMNS': REQUIRED_COLUMNS,
-        'GRAPH_CONFIG': GRAPH_CONFIG,
-        'FEATURE_FLAGS': FEATURE_FLAGS,
-        
-        # Paramètres dérivés (avec valeurs par défaut si manquantes)
-        'weight_decay': MODEL_CONFIG.get('weight_decay', 1e-5),
-        'gnn_input_dim': MODEL_CONFIG.get('gnn_input_dim', len(GRAPH_CONFIG['etf_features'])),
-        
-        # Scénarios de stress (peuvent être modifiés)
-        'stress_scenarios': STRESS_SCENARIOS,
-        'alpha' : MODEL_CONFIG['alpha'],
-        'beta':MODEL_CONFIG['beta'],
-        'learning_rate':MODEL_CONFIG['learning_rate'],
-        'batch_size':MODEL_CONFIG['batch_size'],
-        'input_dim': MODEL_CONFIG['input_dim'],
-        'combined_dim': MODEL_CONFIG['combined_dim']
-    }
+    config = build_engine_config()
 
     # Validation de cohérence
     assert config['gnn_input_dim'] == len(config['GRAPH_CONFIG']['etf_features'])+5, \
@@ -649,6 +991,9 @@ if __name__ == "__main__":
     
     
     try:
+        threads = configure_cpu_threads(config['CPU_PROFILE'].get('intra_op_threads'),
+                                        config['CPU_PROFILE'].get('inter_op_threads'))
+        logger.info("CPU threads configured: %s", threads)
         engine = ETFScoringEngine(config)
         logger.info("Engine initialized successfully")
         
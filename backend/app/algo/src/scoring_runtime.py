@@ -0,0 +1,61 @@
+"""
+Runtime de notation pour le serving: charge un artefact exporté par model_export.
+
+Ne dépend que de torch et numpy (ni shap, ni torch_geometric, ni les modules
+d'entraînement), pour des workers au démarrage rapide.
+"""
+
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import torch
+
+
+class ScoringRuntime:
+    """Inférence sur un artefact TorchScript (ou ONNX via onnxruntime si installé)"""
+
+    def __init__(self, path: str, num_threads: Optional[int] = None):
+        """
+        Args:
+            path: Artefact produit par export_scoring_model
+            num_threads: Threads intra-op de la session ONNX (défaut: choix d'onnxruntime).
+                TorchScript utilise les pools du processus, réglés par le point d'entrée
+                du serving (memory_optimizer.configure_cpu_threads)
+        """
+        meta_path = f"{path}.json"
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"Métadonnées d'export introuvables: {meta_path}")
+        with open(meta_path) as f:
+            self.metadata = json.load(f)
+        self.input_dim = self.metadata['input_dim']
+
+        if self.metadata['format'] == 'onnx':
+            import onnxruntime  # dépendance optionnelle, serving ONNX uniquement
+            options = onnxruntime.SessionOptions()
+            if num_threads:
+                options.intra_op_num_threads = num_threads
+            self._session = onnxruntime.InferenceSession(path, sess_options=options,
+                                                         providers=['CPUExecutionProvider'])
+            self._module = None
+        else:
+            self._session = None
+            self._module = torch.jit.load(path, map_location='cpu').eval()
+
+    def predict(self, features: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+        """Scores [N] pour une matrice de features [N, input_dim]"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if features.ndim != 2 or features.shape[1] != self.input_dim:
+            raise ValueError(f"Features attendues de forme [N, {self.input_dim}], reçu {features.shape}")
+
+        scores = np.empty(len(features), dtype=np.float32)
+        for start in range(0, len(features), batch_size):
+            batch = features[start:start + batch_size]
+            if self._session is not None:
+                out = self._session.run(None, {'features': batch})[0]
+            else:
+                with torch.inference_mode():
+                    out = self._module(torch.from_numpy(batch)).numpy()
+            scores[start:start + len(batch)] = out.reshape(-1)
+        return scores
@@ -85,6 +85,15 @@ class ETFSemiSupervisedModel(nn.Module):
             x_recon = self.decoder(z)
             return x_recon, mu, logvar
 
+    def forward_all(self, x, use_combined=False):
+        """Passe avant fusionnée pour l'entraînement: un seul encodage partagé
+        entre la tête supervisée et le VAE. Retourne (preds, (x_recon, mu, logvar))"""
+        encoded = self.encode(x, use_combined)
+        mu = self.fc_mu(encoded)
+        logvar = self.fc_var(encoded)
+        x_recon = self.decoder(self.reparameterize(mu, logvar))
+        return self.supervised_head(encoded), (x_recon, mu, logvar)
+
     def vae_loss(self, recon_x, x, mu, logvar):
         recon_loss = F.mse_loss(recon_x, x, reduction='mean')
         kl_div = -0.5 * torch.mean(1 + logvar - mu.pow(2) - logvar.exp())
@@ -2,98 +2,158 @@
 Scénarios de stress test pour les ETFs
 """
 
-from typing import List, Dict
-import numpy as np 
-import pandas as pd 
-import logging    
+import hashlib
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+import logging
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader, TensorDataset
 
 from etf_feature_builder import ETFFeatureBuilder
+from monte_carlo_stress import TRADING_DAYS, ETFRiskModel, column_shocks
 
 logger = logging.getLogger(__name__)
 
 class ETFStressTester:
-    def __init__(self, scenarios: List[Dict]):
+    def __init__(self, scenarios: List[Dict], max_batch_rows: int = 262144,
+                 column_sensitivities: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            scenarios: Définitions des scénarios (config.STRESS_SCENARIOS)
+            max_batch_rows: Lignes (scénarios × ETFs) par passage forward
+            column_sensitivities: Réponse des colonnes aux rendements des scénarios de
+                facteurs (MONTE_CARLO_STRESS['column_sensitivities'])
+        """
         self.scenarios = self._load_scenarios(scenarios)
-    
+        self.max_batch_rows = max_batch_rows
+        self.column_sensitivities = column_sensitivities or {}
+
     def _load_scenarios(self, scenario_defs):
         """Initialise les scénarios à partir de la configuration"""
         return [
             {
-                'type': s['type'],
-                'apply': self._create_scenario_function(s)
-            } 
+                **s,
+                'column_shocks': self.scenario_shocks(s)
+            }
             for s in scenario_defs
         ]
-    
-    def _create_scenario_function(self, scenario):
-        """Crée dynamiquement des fonctions de scénario"""
-        if scenario['type'] == 'market_crash':
-            return lambda df: self._apply_market_crash(df, scenario['severity'])
-        elif scenario['type'] == 'liquidity_shock':
-            return lambda df: self._apply_liquidity_shock(df, scenario['factor'])
-        else:
-            return lambda df: df  # Scenario neutre par défaut
-    
-    
-    def run_all_scenarios(self,base_data:pd.DataFrame,feature_builder:ETFFeatureBuilder, model:nn.Module,device:torch.device) -> Dict:
-        """Exécute tous les scénarios de stress"""
-
-        results = {}
-        for scenario in self.scenarios:
-            try:
-                # Application du scénario
-                stressed_data = self.apply_scenario(base_data.copy(),scenario)
-                features = feature_builder.transform(stressed_data)
-                tensor_data= torch.tensor(features.values, dtype=torch.float32).to(device)
-                
-                # Prédiction
-                model.eval()
-
-                with torch.no_grad():
-                    predictions = model(tensor_data)
-                results[scenario['type']] = predictions.cpu().numpy().tolist()
-            except Exception as e:
-                logger.error(f"Scenario {scenario['type']} failed: {str(e)}")
-                results[scenario['type']] = None
-        return results
 
-    def apply_scenario(self, data: pd.DataFrame, scenario: Dict) -> pd.DataFrame:
-        """Applique un scénario de stress spécifique"""
+    @staticmethod
+    def scenario_shocks(scenario: Dict) -> Dict[str, Tuple[float, float]]:
+        """Choc colonne par colonne {colonne: (multiplicateur, additif)} d'un scénario.
+
+        Les types connus sont traduits en chocs; un scénario peut aussi déclarer
+        ses propres chocs: {'shocks': {colonne: {'multiply': m, 'add': a}}}.
+        Un type inconnu sans chocs est neutre.
+        """
+        shocks = {}
         scenario_type = scenario['type']
-        data = data.copy()
-        
+
         if scenario_type == 'market_crash':
-            # Augmentation de la volatilité
-            severity = scenario.get('severity', 1.5)
-            if 'riskAnalysis.volatility.annualized' in data.columns:
-                data['riskAnalysis.volatility.annualized'] = data['riskAnalysis.volatility.annualized'].astype(float) * severity
-        
+            # Baisse des prix et hausse de la volatilité
+            severity = scenario.get('severity', 0.5)
+            shocks['fundamentals.priceData.currentPrice'] = (1 - severity, 0.0)
+            shocks['riskAnalysis.volatility.annualized'] = (1 + severity, 0.0)
+            shocks['riskAnalysis.volatility.30d'] = (1 + severity, 0.0)
+
         elif scenario_type == 'liquidity_shock':
-            # Réduction de la liquidité
+            # Réduction de la liquidité, impact de marché accru
             factor = scenario.get('factor', 0.5)
-            if 'fundamentals.liquidity.avgDailyVolume' in data.columns:
-                data['fundamentals.liquidity.avgDailyVolume'] = data['fundamentals.liquidity.avgDailyVolume'].astype(float) * factor
-        
-        return data
+            shocks['fundamentals.liquidity.avgDailyVolume'] = (factor, 0.0)
+            shocks['fundamentals.liquidity.marketImpactScore'] = (1 / factor, 0.0)
 
-    
-    def _apply_market_crash(self, data, severity):
-        """Simule un krach boursier"""
-        crash_factor = 1 - severity
-        data['fundamentals.priceData.currentPrice'] *= crash_factor
-        data['riskAnalysis.volatility.annualized'] *= (1 + severity)
-        return data
-    
-    def _apply_liquidity_shock(self, data, factor):
-        """Simule un choc de liquidité"""
-        data['fundamentals.liquidity.avgDailyVolume'] /= factor
-        data['fundamentals.liquidity.marketImpactScore'] *= factor
+        for column, shock in scenario.get('shocks', {}).items():
+            shocks[column] = (shock.get('multiply', 1.0), shock.get('add', 0.0))
+        return shocks
+
+    @staticmethod
+    def factor_moves(scenario: Dict) -> Dict[str, float]:
+        """Mouvements des facteurs de marché d'un scénario (rendements), vide si aucun.
+
+        rate_increase: le facteur obligataire (agg) perd duration × hausse des taux.
+        Un scénario peut aussi déclarer {'factor_moves': {facteur: rendement}}.
+        """
+        moves = {}
+        if scenario['type'] == 'rate_increase':
+            moves['agg'] = -scenario.get('duration', 6.0) * scenario.get('increase', 0.01)
+        moves.update(scenario.get('factor_moves', {}))
+        return moves
+
+    def _scenario_shocks(self, scenario: Dict, base_data: pd.DataFrame,
+                         risk_model: Optional[ETFRiskModel]) -> Dict:
+        """Chocs colonne par colonne, y compris la réponse propre à chaque ETF aux mouvements de facteurs"""
+        moves = self.factor_moves(scenario)
+        if not moves:
+            return scenario['column_shocks']
+        if risk_model is None or len(risk_model) != len(base_data):
+            logger.warning(f"Scenario {scenario['type']} needs a risk model aligned on the data, "
+                           f"factor moves {moves} ignored")
+            return scenario['column_shocks']
+
+        returns = risk_model.conditional_returns(moves)
+        stressed = column_shocks(returns, base_data, self.column_sensitivities,
+                                 risk_model.reference_volatility(TRADING_DAYS))
+        shocks = dict(scenario['column_shocks'])
+        for column, values in stressed.items():
+            shocks[column] = (1.0, values[0] - base_data[column].to_numpy(dtype=np.float64))
+        return shocks
+
+    def run_all_scenarios(self, base_data: pd.DataFrame, feature_builder: ETFFeatureBuilder, model: nn.Module,
+                          device: torch.device, base_features: Optional[pd.DataFrame] = None,
+                          risk_model: Optional[ETFRiskModel] = None) -> Dict:
+        """Exécute tous les scénarios de stress en un seul passage batché.
+
+        Les features de tous les scénarios sont empilées en [scénarios, ETFs, features]
+        sans copie de base_data, puis notées par le même forward.
+
+        Args:
+            base_features: feature_builder.transform(base_data) s'il est déjà calculé
+            risk_model: Modèle de risque aligné sur base_data, requis par les scénarios
+                de facteurs (rate_increase)
+        """
+        if not self.scenarios:
+            return {}
+        try:
+            shocks = [self._scenario_shocks(scenario, base_data, risk_model) for scenario in self.scenarios]
+            stacked = feature_builder.transform_stressed(base_data, shocks, base_features=base_features)
+            predictions = self._batched_predict(model, stacked, device)
+        except Exception as e:
+            logger.error(f"Stress scenarios failed: {str(e)}")
+            return {scenario['type']: None for scenario in self.scenarios}
+
+        return {scenario['type']: predictions[i].tolist() for i, scenario in enumerate(self.scenarios)}
+
+    def _batched_predict(self, model: nn.Module, stacked: np.ndarray, device: torch.device) -> np.ndarray:
+        """Prédictions [scénarios, ETFs, 1] pour des features [scénarios, ETFs, features].
+
+        Les scénarios aux features identiques (chocs sans effet après normalisation
+        min-max, scénarios neutres) ne sont notés qu'une fois.
+        """
+        num_scenarios, num_etfs, num_features = stacked.shape
+        digests = [hashlib.blake2b(stacked[i].tobytes(), digest_size=16).digest() for i in range(num_scenarios)]
+        first_index = {}
+        inverse = np.array([first_index.setdefault(digest, len(first_index)) for digest in digests])
+        unique = stacked[[digests.index(digest) for digest in first_index]]
+        flat = torch.from_numpy(np.ascontiguousarray(unique).reshape(-1, num_features))
+
+        model.eval()
+        with torch.no_grad():
+            predictions = torch.cat([
+                model(chunk.to(device)).cpu()
+                for chunk in flat.split(self.max_batch_rows)
+            ])
+        return predictions.numpy().reshape(len(first_index), num_etfs, -1)[inverse]
+
+    def apply_scenario(self, data: pd.DataFrame, scenario: Dict) -> pd.DataFrame:
+        """Applique un scénario de stress spécifique (copie de data, pour inspection)"""
+        data = data.copy()
+        for column, (multiplier, additive) in self.scenario_shocks(scenario).items():
+            if column in data.columns:
+                data[column] = data[column].astype(float) * multiplier + additive
         return data
-    
+
     def _identify_impacted(self, original_data, stressed_scores):
         """Identifie les ETFs les plus affectés"""
         delta = original_data['score'] - stressed_scores
-        return delta.nlargest(5).to_dict()
\ No newline at end of file
+        return delta.nlargest(5).to_dict()
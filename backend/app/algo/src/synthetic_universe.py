@@ -0,0 +1,264 @@
+"""
+Univers d'ETFs synthétique au schéma d'etf_data_test.json, de 100 à 100 000 ETFs.
+
+Les holdings sont tirés dans un univers d'actifs commun, pondérés par capitalisation:
+les grandes capitalisations se retrouvent dans de nombreux ETFs (recouvrement réaliste
+du graphe ETF-actifs); les ETFs sectoriels et régionaux se recouvrent entre eux.
+"""
+
+import argparse
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import GRAPH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+COUNTRIES = ['US', 'GB', 'DE', 'FR', 'JP', 'CH', 'CN', 'IN', 'CA', 'AU']
+COUNTRY_WEIGHTS = [0.55, 0.06, 0.05, 0.05, 0.08, 0.04, 0.07, 0.04, 0.03, 0.03]
+REPLICATION_METHODS = ['Full Replication', 'Optimized Sampling', 'Physical', 'Active Management']
+ISSUERS = ['BlackRock', 'Vanguard', 'State Street', 'Invesco', 'Amundi', 'DWS', 'ARK Invest']
+COLLATERAL = ['AAA', 'AA', 'A']
+
+
+def _asset_universe(num_assets: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+    """Actifs: secteur, pays et capitalisation (loi de Pareto: quelques géants, une longue traîne)"""
+    sectors = np.array(GRAPH_CONFIG['sectors'])
+    return {
+        'asset_id': np.array([f"A{i:06d}-{c}" for i, c in enumerate(
+            rng.choice(COUNTRIES, size=num_assets, p=COUNTRY_WEIGHTS))]),
+        'sector': sectors[rng.integers(0, len(sectors), num_assets)],
+        'market_cap': rng.pareto(1.2, num_assets) + 1.0
+    }
+
+
+def _themes(assets: Dict[str, np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """(indices des actifs, CDF pondérée par capitalisation) par thème: marché large, secteurs, pays"""
+    countries = np.array([asset_id.rsplit('-', 1)[1] for asset_id in assets['asset_id']])
+    masks = [np.ones(len(countries), dtype=bool)]
+    masks += [assets['sector'] == sector for sector in np.unique(assets['sector'])]
+    masks += [countries == country for country in np.unique(countries)]
+
+    themes = []
+    for mask in masks:
+        indices = np.flatnonzero(mask)
+        cdf = np.cumsum(assets['market_cap'][indices])
+        themes.append((indices, cdf / cdf[-1]))
+    return themes
+
+
+def _draw_holdings(theme: Tuple[np.ndarray, np.ndarray], num_holdings: int,
+                   rng: np.random.Generator) -> np.ndarray:
+    """Holdings distincts d'un ETF (tirage pondéré par CDF, O(k log n) au lieu de O(n))"""
+    indices, cdf = theme
+    draws = np.searchsorted(cdf, rng.random(num_holdings * 2), side='right')
+    unique = np.unique(np.minimum(draws, len(indices) - 1))
+    return indices[rng.permutation(unique)[:num_holdings]]
+
+
+def generate_universe(num_etfs: int, seed: int = 0, num_assets: Optional[int] = None,
+                      holdings_range: Tuple[int, int] = (10, 60), history_days: int = 30) -> List[Dict]:
+    """Liste d'ETFs au format JSON brut (comme etf_data_test.json).
+
+    Args:
+        num_etfs: Nombre d'ETFs
+        seed: Graine (univers reproductible)
+        num_assets: Taille de l'univers d'actifs (défaut: 3 par ETF, entre 200 et 50 000)
+        holdings_range: Nombre de holdings par ETF (min, max)
+        history_days: Longueur des séries dailyReturns / historicalNav
+    """
+    rng = np.random.default_rng(seed)
+    num_assets = num_assets or int(np.clip(3 * num_etfs, 200, 50_000))
+    assets = _asset_universe(num_assets, rng)
+    themes = _themes(assets)
+    n = num_etfs
+
+    # Tirages vectorisés de tous les champs numériques
+    theme_idx = np.where(rng.random(n) < 0.4, 0, rng.integers(1, len(themes), n))
+    num_holdings = rng.integers(holdings_range[0], holdings_range[1] + 1, n)
+    beta = rng.normal(1.0, 0.25, n)
+    annual_vol = np.clip(0.16 * np.abs(beta) + rng.gamma(2.0, 0.03, n), 0.02, 0.9)
+    market = rng.normal(0.0003, 0.01, history_days)
+    daily_vol = annual_vol / np.sqrt(252)
+    idio = np.sqrt(np.clip(daily_vol ** 2 - (beta * 0.01) ** 2, 1e-8, None))
+    returns = beta[:, None] * market[None, :] + idio[:, None] * rng.standard_normal((n, history_days))
+    nav_start = rng.lognormal(4.0, 0.8, n)
+    navs = nav_start[:, None] * np.cumprod(1 + returns, axis=1)
+    price = navs[:, -1] * (1 + rng.normal(0, 0.002, n))
+    ter = np.round(rng.gamma(2.0, 0.0015, n), 5)
+    volume = np.round(rng.lognormal(12.5, 2.0, n))
+    spread = np.round(np.clip(0.5 / np.sqrt(volume), 0.0001, 0.05), 5)
+    creation = (np.datetime64('1993-01-22') + rng.integers(0, 10_500, n).astype('timedelta64[D]')).astype(str)
+    dates = (np.datetime64('2023-01-02') + np.arange(history_days).astype('timedelta64[D]')).astype(str)
+    corr_spx = np.clip(0.55 * beta + rng.normal(0, 0.15, n), -0.5, 0.999)
+    corr_agg = np.clip(rng.normal(0.1, 0.25, n), -0.6, 0.99)
+    corr_gld = np.clip(rng.normal(0.0, 0.2, n), -0.6, 0.99)
+    max_drawdown = -np.clip(annual_vol * rng.uniform(1.0, 2.5, n), 0.02, 0.95)
+    sentiment = np.clip(rng.normal(0.6, 0.15, (n, 3)), 0, 1)
+    percentile = rng.uniform(0, 1, (n, 3))
+    factors = rng.normal(0, 0.4, (n, 4))
+    sectors = GRAPH_CONFIG['sectors']
+
+    universe = []
+    for i in range(n):
+        held = _draw_holdings(themes[theme_idx[i]], int(num_holdings[i]), rng)
+        caps = assets['market_cap'][held]
+        weights = np.round(caps / caps.sum(), 6)
+        sector_weights = {}
+        for sector, weight in zip(assets['sector'][held], weights):
+            sector_weights[sector] = round(sector_weights.get(sector, 0.0) + float(weight), 6)
+        country_weights = {}
+        for asset_id, weight in zip(assets['asset_id'][held], weights):
+            country = asset_id.rsplit('-', 1)[1]
+            country_weights[country] = round(country_weights.get(country, 0.0) + float(weight), 6)
+        method = REPLICATION_METHODS[i % len(REPLICATION_METHODS)]
+        tracking_error = float(np.round(ter[i] * rng.uniform(1, 5), 5))
+
+        universe.append({
+            'etfId': i + 1,
+            'etfname': f"SYN{i + 1:06d}-US-USD",
+            'name': f"Synthetic ETF {i + 1}",
+            'metadata': {
+                'issuer': ISSUERS[i % len(ISSUERS)],
+                'description': 'Synthetic benchmark ETF',
+                'creationDate': creation[i],
+                'lastRebalanceDate': '2023-12-15'
+            },
+            'fundamentals': {
+                'priceData': {
+                    'currentPrice': round(float(price[i]), 2),
+                    'previousClose': round(float(navs[i, -2] if history_days > 1 else price[i]), 2),
+                    'bidAskSpread': float(spread[i]),
+                    'nav': round(float(navs[i, -1]), 2),
+                    'premiumDiscount': round(float(price[i] / navs[i, -1] - 1), 5),
+                    '52WeekHigh': round(float(navs[i].max() * 1.05), 2),
+                    '52WeekLow': round(float(navs[i].min() * 0.9), 2)
+                },
+                'costs': {
+                    'ter': float(ter[i]),
+                    'trackingDifference': round(float(-ter[i] + rng.normal(0, 0.0005)), 5),
+                    'trackingError': tracking_error,
+                    'lendingRevenue': round(float(rng.uniform(0, 0.001)), 5),
+                    'transactionCosts': round(float(rng.uniform(0, 0.001)), 5)
+                },
+                'liquidity': {
+                    'avgDailyVolume': float(volume[i]),
+                    'avgBidAskSpread': float(spread[i]),
+                    'impliedLiquidity': float(volume[i] * rng.uniform(2, 6)),
+                    'marketImpactScore': round(float(np.clip(1 - np.log10(volume[i] + 1) / 8, 0, 1)), 3)
+                }
+            },
+            'timeSeries': {
+                'dailyReturns': np.round(returns[i], 6).tolist(),
+                'historicalNav': [{'date': d, 'value': round(v, 4)} for d, v in zip(dates, navs[i].tolist())],
+                'trackingDifferenceHistory': [
+                    {'date': '2023-01', 'value': round(float(-ter[i] / 12), 6)},
+                    {'date': '2023-02', 'value': round(float(-ter[i] / 12), 6)}
+                ]
+            },
+            'portfolio': {
+                'holdings': [
+                    {
+                        'assetId': asset_id,
+                        'name': f"Asset {asset_id}",
+                        'weight': float(weight),
+                        'sector': sector,
+                        'country': asset_id.rsplit('-', 1)[1],
+                        'contributionToTrackingError': round(float(weight) * tracking_error, 7)
+                    }
+                    for asset_id, sector, weight in zip(assets['asset_id'][held], assets['sector'][held], weights)
+                ],
+                'characteristics': {
+                    'sectorWeights': sector_weights,
+                    'countryWeights': country_weights,
+                    'factorExposures': {
+                        'beta': round(float(beta[i]), 3),
+                        'size': round(float(factors[i, 0]), 3),
+                        'value': round(float(factors[i, 1]), 3),
+                        'momentum': round(float(factors[i, 2]), 3),
+                        'quality': round(float(factors[i, 3]), 3)
+                    }
+                }
+            },
+            'riskAnalysis': {
+                'volatility': {
+                    '30d': round(float(annual_vol[i] * rng.uniform(0.8, 1.2)), 4),
+                    '90d': round(float(annual_vol[i] * rng.uniform(0.9, 1.1)), 4),
+                    'annualized': round(float(annual_vol[i]), 4)
+                },
+                'drawdowns': {
+                    'maxDrawdown': round(float(max_drawdown[i]), 4),
+                    'avgDrawdown': round(float(max_drawdown[i] / 4), 4),
+                    'recoveryTimeDays': int(rng.integers(10, 400))
+                },
+                'correlations': {
+                    'spx': round(float(corr_spx[i]), 3),
+                    'agg': round(float(corr_agg[i]), 3),
+                    'gld': round(float(corr_gld[i]), 3)
+                },
+                'liquidityRisk': {
+                    'redemptionCost': round(float(spread[i] * 1.5), 5),
+                    'basketLiquidityScore': round(float(rng.uniform(0.3, 1.0)), 3)
+                }
+            },
+            'alternativeData': {
+                'sentiment': {
+                    'newsSentiment': round(float(sentiment[i, 0]), 3),
+                    'socialMediaSentiment': round(float(sentiment[i, 1]), 3),
+                    'analystConsensus': round(float(sentiment[i, 2]), 3)
+                },
+                'flows': {
+                    '30dNetFlow': float(np.round(rng.normal(0, 1) * volume[i] * price[i] * 0.5)),
+                    'ytdFlow': float(np.round(rng.normal(0.5, 1) * volume[i] * price[i] * 3))
+                },
+                'ownership': {
+                    'institutionalPercentage': round(float(rng.uniform(0.2, 0.95)), 3),
+                    'topHolder': ISSUERS[(i + 1) % len(ISSUERS)]
+                }
+            },
+            'replication': {
+                'method': method,
+                'optimization': {
+                    'samplingError': round(float(0.0 if method == 'Full Replication' else rng.uniform(0, 0.002)), 5),
+                    'numHoldings': int(len(held)),
+                    'coverage': round(float(1.0 if method == 'Full Replication' else rng.uniform(0.6, 1.0)), 3)
+                },
+                'lending': {
+                    'isLending': bool(i % 3),
+                    'lendingRevenue': round(float(rng.uniform(0, 0.001)), 5),
+                    'collateralQuality': COLLATERAL[i % len(COLLATERAL)]
+                }
+            },
+            'peerComparison': {
+                'avgTer': round(float(ter[i] * rng.uniform(0.8, 2.0)), 5),
+                'avgTrackingError': round(float(tracking_error * rng.uniform(0.8, 2.0)), 5),
+                'percentileRank': {
+                    'cost': round(float(percentile[i, 0]), 3),
+                    'liquidity': round(float(percentile[i, 1]), 3),
+                    'tracking': round(float(percentile[i, 2]), 3)
+                }
+            },
+            'system': {
+                'lastUpdated': '2023-12-20T16:00:00Z',
+                'dataSource': 'Synthetic',
+                'calculationMethodology': 'Synthetic'
+            }
+        })
+
+    logger.info(f"Synthetic universe: {n} ETFs over {num_assets} assets")
+    return universe
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un univers d'ETFs synthétique (JSON)")
+    parser.add_argument('num_etfs', type=int)
+    parser.add_argument('-o', '--output', default='etf_data_synthetic.json')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.output, 'w') as f:
+        json.dump(generate_universe(args.num_etfs, seed=args.seed), f)
+    print(f"{args.num_etfs} ETFs written to {args.output}")
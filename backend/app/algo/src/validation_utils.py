@@ -6,11 +6,17 @@ import pandas as pd
 from typing import Dict, Any, List
 import logging
 
-from sklearn.model_selection import TimeSeriesSplit
-
 logger = logging.getLogger(__name__)
 
 class ETFValidator:
+    # Motifs de rejet: bit i du code de motif (uint8) de chaque ETF
+    VALIDATION_REASONS = (
+        'missing_volatility_data',
+        'volatility_out_of_bounds',
+        'missing_ter_data',
+        'ter_too_high'
+    )
+    
     def __init__(self, thresholds: Dict[str, Any]):
         """Initialisation avec les seuils de validation"""
         self.thresholds = thresholds
@@ -27,7 +33,8 @@ class ETFValidator:
         Returns:
             Dict: Résultats de validation avec:
                 - risk_distribution: Distribution des risques
-                - validation_flags: ETFs validés/rejetés
+                - validation_flags: ETFs validés/rejetés, en colonnes (is_valid,
+                  reason_code bit à bit, reason_legend pour le décodage)
                 - metrics: Métriques calculées
         """
         try:
@@ -51,7 +58,13 @@ class ETFValidator:
                 )
             
             # 2. Marquage des ETFs valides/invalides
-            results['validation_flags'] = self._generate_validation_flags(ratings, etf_data)
+            flags = self._generate_validation_flags(ratings, etf_data)
+            results['validation_flags'] = {
+                'is_valid': flags['is_valid'].to_numpy(),
+                'reason_code': flags['reason_code'].to_numpy(),
+                'reason_legend': {1 << bit: reason for bit, reason in enumerate(self.VALIDATION_REASONS)},
+                'num_invalid': int((~flags['is_valid']).sum())
+            }
             
             # 3. Calcul des métriques globales
             results['metrics'] = self._compute_global_metrics(ratings)
@@ -82,46 +95,56 @@ class ETFValidator:
         }
     
     
-    def _generate_validation_flags(self, ratings: pd.DataFrame, etf_data: pd.DataFrame) -> List[Dict]:
-        """Génération des flags de validation sans utiliser d'identifiant"""
-        
-        flags = []
-        for i in range(len(ratings)):
-            rating_row = ratings.iloc[i]
-            etf_row = etf_data.iloc[i]
-            flag = {
-                'is_valid': True,
-                'reasons': []
-                }
-            
-            # Vérification de la volatilité
-            if 'volatility_bounds' in self.thresholds:
-                vol = etf_row.get('riskAnalysis.volatility.annualized')
-                if vol is None:
-                    flag['is_valid'] = False
-                    flag['reasons'].append('missing_volatility_data')
-                
-                else:
-                    bounds = self.thresholds['volatility_bounds']
-                    if not (bounds['low'] <= vol <= bounds['high']):
-                        flag['is_valid'] = False
-                        flag['reasons'].append('volatility_out_of_bounds')
-                        
-            
-            # Vérification du TER
-            if 'max_ter' in self.thresholds:
-                ter = etf_row.get('fundamentals.costs.ter')
-                if ter is None:
-                    flag['is_valid'] = False
-                    flag['reasons'].append('missing_ter_data')
-                elif ter > self.thresholds['max_ter']:
-                    flag['is_valid'] = False
-                    flag['reasons'].append('ter_too_high')
-            
-            flags.append(flag)
+    def _generate_validation_flags(self, ratings: pd.DataFrame, etf_data: pd.DataFrame) -> pd.DataFrame:
+        """Flags de validation en colonnes (ETFs appariés par position, sans identifiant).
 
+        Returns:
+            DataFrame: une colonne booléenne par motif de VALIDATION_REASONS,
+            reason_code (uint8, bit i = motif i) et is_valid
+        """
+        num_etfs = len(ratings)
+        etf_data = etf_data.iloc[:num_etfs]
+        checks = {}
+        
+        # Vérification de la volatilité (valeur absente ou NaN = donnée manquante)
+        if 'volatility_bounds' in self.thresholds:
+            vol = self._column(etf_data, 'riskAnalysis.volatility.annualized', num_etfs)
+            bounds = self.thresholds['volatility_bounds']
+            checks['missing_volatility_data'] = np.isnan(vol)
+            checks['volatility_out_of_bounds'] = ~np.isnan(vol) & ((vol < bounds['low']) | (vol > bounds['high']))
+        
+        # Vérification du TER
+        if 'max_ter' in self.thresholds:
+            ter = self._column(etf_data, 'fundamentals.costs.ter', num_etfs)
+            checks['missing_ter_data'] = np.isnan(ter)
+            checks['ter_too_high'] = ter > self.thresholds['max_ter']
+        
+        flags = pd.DataFrame({reason: checks.get(reason, np.zeros(num_etfs, dtype=bool))
+                              for reason in self.VALIDATION_REASONS})
+        reason_code = np.zeros(num_etfs, dtype=np.uint8)
+        for bit, reason in enumerate(self.VALIDATION_REASONS):
+            reason_code |= flags[reason].to_numpy().astype(np.uint8) << bit
+        flags['reason_code'] = reason_code
+        flags['is_valid'] = reason_code == 0
         return flags
 
+    @staticmethod
+    def _column(etf_data: pd.DataFrame, column: str, num_etfs: int) -> np.ndarray:
+        """Colonne en float64 (NaN si absente)"""
+        if column not in etf_data.columns:
+            return np.full(num_etfs, np.nan)
+        return pd.to_numeric(etf_data[column], errors='coerce').to_numpy(dtype=np.float64)
+
+    @classmethod
+    def decode_reasons(cls, reason_codes: np.ndarray) -> List[List[str]]:
+        """Motifs en clair pour chaque code (à la sérialisation uniquement)"""
+        reason_codes = np.asarray(reason_codes, dtype=np.uint8)
+        decoded = [[] for _ in range(len(reason_codes))]
+        for bit, reason in enumerate(cls.VALIDATION_REASONS):
+            for position in np.flatnonzero(reason_codes & (1 << bit)):
+                decoded[position].append(reason)
+        return decoded
+
 
     def _compute_global_metrics(self, ratings: pd.DataFrame) -> Dict:
         """Calcul des métriques globales"""
@@ -139,6 +162,8 @@ class ETFValidator:
     @staticmethod
     def time_series_cv(model, X, y, n_splits=5):
         """Validation croisée temporelle"""
+        from sklearn.model_selection import TimeSeriesSplit
+
         tscv = TimeSeriesSplit(n_splits=n_splits)
         scores = []
         
@@ -0,0 +1,59 @@
+# tests/benchmarks/test_attributions_benchmarks.py
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from attributions import ETFAttributionCache
+from explanations import ETFExplanationGenerator
+from semi_supervised_model import ETFSemiSupervisedModel
+
+NUM_ETFS = 2_000
+
+pytestmark = pytest.mark.benchmark(group='attributions')
+
+
+@pytest.fixture(scope='module')
+def model_and_features():
+    torch.manual_seed(0)
+    model = ETFSemiSupervisedModel(input_dim=25).eval()
+    features = pd.DataFrame(np.random.default_rng(0).random((NUM_ETFS, 25)).astype(np.float32),
+                            columns=[f"f{i}" for i in range(25)])
+    return model, features
+
+
+def test_deep_explainer(benchmark, model_and_features):
+    # Ancien chemin: DeepExplainer sur un fond de 50 ETFs (référence, lent)
+    model, features = model_and_features
+    generator = ETFExplanationGenerator(model=model)
+
+    def explain():
+        generator.initialize_shap(features.iloc[:50])
+        return generator.generate_shap_insights(features)
+
+    benchmark.pedantic(explain, rounds=1, iterations=1)
+
+
+@pytest.mark.parametrize('method', ['gradient_x_input', 'integrated_gradients'])
+def test_gradient_attributions(benchmark, model_and_features, method):
+    model, features = model_and_features
+
+    def explain():
+        # Cache vide à chaque tour: mesure du calcul des attributions
+        generator = ETFExplanationGenerator(model=model, attribution_method=method,
+                                            attribution_cache=ETFAttributionCache())
+        return generator.generate_shap_insights(features)
+
+    top_positive, _ = benchmark.pedantic(explain, rounds=5, iterations=1)
+    assert len(top_positive) == NUM_ETFS
+
+
+@pytest.mark.parametrize('method', ['gradient_x_input', 'integrated_gradients'])
+def test_cached_attributions(benchmark, model_and_features, method):
+    model, features = model_and_features
+    generator = ETFExplanationGenerator(model=model, attribution_method=method,
+                                        attribution_cache=ETFAttributionCache())
+    generator.generate_shap_insights(features)
+
+    top_positive, _ = benchmark(generator.generate_shap_insights, features)
+    assert len(top_positive) == NUM_ETFS
@@ -0,0 +1,32 @@
+# tests/benchmarks/test_backtesting_benchmarks.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtesting import WalkForwardBacktest
+from config import build_engine_config
+
+NUM_ETFS = 40
+NUM_DATES = 16
+HORIZON = 5
+
+pytestmark = pytest.mark.benchmark(group='backtest')
+
+
+def test_walk_forward_backtest(benchmark, tmp_path):
+    rng = np.random.default_rng(0)
+    prices_index = pd.bdate_range('2023-01-02', periods=NUM_DATES * HORIZON + HORIZON + 1)
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(0.005 * rng.standard_normal((len(prices_index), NUM_ETFS)), axis=0)),
+                          index=prices_index)
+    index = pd.MultiIndex.from_product([prices_index[:NUM_DATES * HORIZON:HORIZON], range(NUM_ETFS)])
+    features = pd.DataFrame(rng.random((len(index), 25)), index=index)
+
+    def run():
+        # Cache vide à chaque tour: prétraitement et entraînement des folds en parallèle
+        cache_dir = tmp_path / f"cache{len(list(tmp_path.iterdir()))}"
+        backtest = WalkForwardBacktest(build_engine_config(), horizon_days=HORIZON, train_dates=6, test_dates=2,
+                                       epochs=20, max_workers=2, cache_dir=str(cache_dir))
+        return backtest.run(features, prices)
+
+    results = benchmark.pedantic(run, rounds=1, iterations=1)
+    assert len(results) == (NUM_DATES - 6) // 2
@@ -0,0 +1,46 @@
+# tests/benchmarks/test_cpu_profile_benchmarks.py
+import pytest
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from advanced_loss import ETFCompositeLoss
+from memory_optimizer import PrefetchTensorLoader, autocast_context
+from semi_supervised_model import ETFSemiSupervisedModel
+
+pytestmark = pytest.mark.benchmark(group='cpu_profile')
+
+LOADERS = {
+    'dataloader': lambda X, y: DataLoader(TensorDataset(X, y), batch_size=64, shuffle=True),
+    'prefetch': lambda X, y: PrefetchTensorLoader(X, y, batch_size=64, shuffle=True),
+}
+
+
+@pytest.mark.parametrize('loader', list(LOADERS))
+def test_loader_iteration(benchmark, loader):
+    torch.manual_seed(0)
+    X, y = torch.randn(65536, 25), torch.rand(65536)
+    batches = LOADERS[loader](X, y)
+
+    num_samples = benchmark(lambda: sum(len(batch_X) for batch_X, _ in batches))
+    assert num_samples == len(X)
+
+
+@pytest.mark.parametrize('bf16', [False, True], ids=['fp32', 'bf16'])
+def test_training_epoch(benchmark, bf16):
+    torch.manual_seed(0)
+    X, y = torch.randn(8192, 25), torch.rand(8192)
+    model = ETFSemiSupervisedModel(input_dim=25)
+    loss_fn = ETFCompositeLoss(alpha=0.7, beta=0.3)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-3)
+
+    def epoch():
+        for batch_X, batch_y in PrefetchTensorLoader(X, y, batch_size=256, shuffle=True):
+            optimizer.zero_grad(set_to_none=True)
+            with autocast_context(torch.device('cpu'), bf16):
+                preds, vae_outputs = model.forward_all(batch_X)
+                vae_loss, supervised_loss = loss_fn(preds, batch_y, vae_outputs=vae_outputs,
+                                                    original_input=batch_X, return_supervised=True)
+            (supervised_loss + vae_loss).backward()
+            optimizer.step()
+
+    benchmark.pedantic(epoch, rounds=3, iterations=1, warmup_rounds=1)
@@ -0,0 +1,39 @@
+# tests/benchmarks/test_export_latency_benchmarks.py
+import numpy as np
+import pytest
+import torch
+
+from model_export import export_scoring_model
+from scoring_runtime import ScoringRuntime
+from semi_supervised_model import ETFSemiSupervisedModel
+
+pytestmark = pytest.mark.benchmark(group='export')
+
+BATCHES = {'batch_1': 1, 'batch_20k': 20_000}
+
+
+@pytest.fixture(scope='module')
+def runners(tmp_path_factory):
+    torch.manual_seed(0)
+    model = ETFSemiSupervisedModel(input_dim=25).eval()
+    directory = tmp_path_factory.mktemp('export')
+    export_scoring_model(model, str(directory / 'fp32.pt'))
+    export_scoring_model(model, str(directory / 'int8.pt'), quantize=True)
+
+    def eager(features):
+        with torch.no_grad():
+            return model(torch.from_numpy(features)).numpy()
+
+    return {
+        'eager': eager,
+        'torchscript': ScoringRuntime(str(directory / 'fp32.pt')).predict,
+        'torchscript-int8': ScoringRuntime(str(directory / 'int8.pt')).predict,
+    }
+
+
+@pytest.mark.parametrize('batch', list(BATCHES))
+@pytest.mark.parametrize('runner', ['eager', 'torchscript', 'torchscript-int8'])
+def test_scoring_latency(benchmark, runners, runner, batch):
+    features = np.random.default_rng(0).random((BATCHES[batch], 25)).astype(np.float32)
+    predictions = benchmark(runners[runner], features)
+    assert len(predictions) == len(features)
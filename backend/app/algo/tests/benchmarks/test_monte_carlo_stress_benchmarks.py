@@ -0,0 +1,39 @@
+# tests/benchmarks/test_monte_carlo_stress_benchmarks.py
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from config import MONTE_CARLO_STRESS, REQUIRED_COLUMNS
+from etf_feature_builder import ETFFeatureBuilder
+from monte_carlo_stress import ETFMonteCarloStress, ETFRiskModel
+from semi_supervised_model import ETFSemiSupervisedModel
+
+NUM_ETFS = 1_000
+
+pytestmark = pytest.mark.benchmark(group='stress')
+
+
+@pytest.mark.parametrize('method', ['monte_carlo', 'historical'])
+def test_score_quantiles(benchmark, method):
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({column: rng.random(NUM_ETFS) for column in REQUIRED_COLUMNS
+                         if column != 'metadata.creationDate'})
+    data['metadata.creationDate'] = pd.Timestamp('2005-01-01') + pd.to_timedelta(rng.integers(0, 7000, NUM_ETFS), 'D')
+    risk_model = ETFRiskModel(
+        correlations=rng.uniform(-0.3, 0.9, (NUM_ETFS, 3)) * [1.0, 0.5, 0.5],
+        volatilities=rng.uniform(0.05, 0.4, NUM_ETFS),
+        factors=MONTE_CARLO_STRESS['factors'],
+        factor_correlations=np.asarray(MONTE_CARLO_STRESS['factor_correlations']),
+        factor_volatilities=np.asarray(MONTE_CARLO_STRESS['factor_volatilities']))
+    history = pd.DataFrame(100 * np.exp(np.cumsum(0.01 * rng.standard_normal((750, NUM_ETFS)), axis=0)),
+                           index=pd.bdate_range('2020-01-01', periods=750))
+    torch.manual_seed(0)
+    model = ETFSemiSupervisedModel(input_dim=25)
+    stress = ETFMonteCarloStress(MONTE_CARLO_STRESS)
+
+    summary = benchmark.pedantic(
+        stress.run, args=(data, ETFFeatureBuilder(), model, torch.device('cpu'), risk_model),
+        kwargs={'history': history if method == 'historical' else None, 'method': method},
+        rounds=3, iterations=1)
+    assert len(summary) == NUM_ETFS
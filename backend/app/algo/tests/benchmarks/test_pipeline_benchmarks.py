@@ -0,0 +1,86 @@
+# tests/benchmarks/test_pipeline_benchmarks.py
+# Suite pytest-benchmark du pipeline sur un univers synthétique.
+# Tailles: ETF_BENCH_SIZES=100,1000,10000,100000 (défaut: 100)
+# Baselines et comparaison: make bench-baseline / make bench (à la racine du dépôt)
+import os
+
+import pytest
+import torch
+
+from config import build_engine_config
+from data_utils import DataPreprocessor
+from etf_scoring import ETFScoring
+from rating_model import ETFScoringEngine
+from synthetic_universe import generate_universe
+
+SIZES = [int(size) for size in os.environ.get('ETF_BENCH_SIZES', '100').split(',')]
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture(scope='module')
+def engine(tmp_path_factory):
+    config = build_engine_config()
+    config.update({'embedding_cache_dir': str(tmp_path_factory.mktemp('embeddings')), 'prometheus_metrics': False})
+    torch.manual_seed(0)
+    return ETFScoringEngine(config)
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=lambda size: f"{size}_etfs")
+def universe(request, engine):
+    """Univers brut et ses étapes intermédiaires, calculés une fois par taille"""
+    records = generate_universe(request.param, seed=0)
+    flattened = engine.data_pipeline.flatten_records(records)
+    processed = DataPreprocessor().process_numerical_data(flattened)
+    processed_data = engine.data_pipeline.process(processed.copy(), flatten=False)
+    features = engine.feature_builder.transform(processed_data)
+    graph = engine.graph_processor.build_graph_from_raw(records)
+    return {'size': request.param, 'records': records, 'processed': processed,
+            'processed_data': processed_data, 'features': features, 'graph': graph}
+
+
+def _run(benchmark, universe, function, *args, **kwargs):
+    """Moins de tours sur les grands univers"""
+    rounds = 10 if universe['size'] <= 1000 else 3
+    return benchmark.pedantic(function, args=args, kwargs=kwargs, rounds=rounds, iterations=1, warmup_rounds=1)
+
+
+def test_data_pipeline_process(benchmark, engine, universe):
+    result = _run(benchmark, universe, lambda: engine.data_pipeline.process(universe['processed'].copy(), flatten=False))
+    assert len(result) == universe['size']
+
+
+def test_feature_builder_transform(benchmark, engine, universe):
+    result = _run(benchmark, universe, engine.feature_builder.transform, universe['processed_data'])
+    assert result.shape == (universe['size'], engine.config['input_dim'])
+
+
+def test_build_graph_from_raw(benchmark, engine, universe):
+    graph = _run(benchmark, universe, engine.graph_processor.build_graph_from_raw, universe['records'])
+    assert graph.edge_index.shape[1] == sum(len(r['portfolio']['holdings']) for r in universe['records'])
+
+
+def test_gnn_forward(benchmark, engine, universe):
+    engine.gnn_model.eval()
+
+    def forward():
+        # Corrélations top-k: le mode dense est quadratique en nombre de nœuds (ETFs + actifs)
+        with torch.no_grad():
+            return engine.gnn_model(universe['graph'], correlation_mode='topk')
+
+    _run(benchmark, universe, forward)
+
+
+def test_scoring_predict(benchmark, engine, universe):
+    scoring = ETFScoring(model=engine.semi_supervised_model, gnn_model=engine.gnn_model, device=engine.device,
+                         monitor=engine.monitor, feature_selector=universe['features'],
+                         graph_data=universe['graph'], embedding_cache=None)
+    ratings = _run(benchmark, universe, scoring.predict, universe['features'])
+    assert len(ratings) == universe['size']
+
+
+def test_stress_scenarios(benchmark, engine, universe):
+    results = _run(benchmark, universe, engine.stress_tester.run_all_scenarios,
+                   universe['processed_data'], engine.feature_builder, engine.semi_supervised_model,
+                   engine.device, base_features=universe['features'])
+    assert all(scores is not None for scores in results.values())
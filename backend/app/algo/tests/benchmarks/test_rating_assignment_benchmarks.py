@@ -0,0 +1,26 @@
+# tests/benchmarks/test_rating_assignment_benchmarks.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from etf_scoring import ETFScoring
+
+NUM_ETFS = 100_000
+
+pytestmark = pytest.mark.benchmark(group='scoring')
+
+
+def test_rating_universe(benchmark):
+    scoring = ETFScoring.__new__(ETFScoring)
+    rng = np.random.default_rng(0)
+    scores = rng.random(NUM_ETFS)
+    features = rng.random((NUM_ETFS, 25)).astype(np.float32)
+    features[rng.random(features.shape) < 0.05] = np.nan
+
+    def rate():
+        ETFScoring._fill_median(features.copy())
+        ratings = scoring._assign_ratings(scores)
+        scoring._validate_ratings(pd.DataFrame({'normalized_score': scores, 'rating': ratings}))
+        return ratings
+
+    assert len(benchmark(rate)) == NUM_ETFS
@@ -0,0 +1,26 @@
+# tests/benchmarks/test_rule_explanations_benchmarks.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from explanations import ETFExplanationGenerator
+
+NUM_ETFS = 50_000
+
+pytestmark = pytest.mark.benchmark(group='explanations')
+
+
+def test_rule_explanations(benchmark):
+    rng = np.random.default_rng(0)
+    etf_data = pd.DataFrame({
+        'fundamentals.costs.ter': rng.uniform(0, 0.01, NUM_ETFS),
+        'fundamentals.liquidity.avgDailyVolume': rng.lognormal(14, 2, NUM_ETFS),
+        'riskAnalysis.volatility.annualized': rng.uniform(0.05, 0.5, NUM_ETFS),
+        'fundamentals.costs.trackingError': rng.uniform(0, 0.005, NUM_ETFS),
+        'riskAnalysis.drawdowns.maxDrawdown': rng.uniform(-0.5, 0, NUM_ETFS),
+        'portfolio.characteristics.topHoldingWeight': rng.uniform(0, 0.2, NUM_ETFS),
+    })
+    generator = ETFExplanationGenerator()
+
+    explanations = benchmark(generator.generate_explanations, etf_data, scores=None)
+    assert len(explanations['strengths']) == NUM_ETFS
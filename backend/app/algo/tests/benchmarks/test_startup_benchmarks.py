@@ -0,0 +1,17 @@
+# tests/benchmarks/test_startup_benchmarks.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'src')
+
+pytestmark = pytest.mark.benchmark(group='startup')
+
+
+@pytest.mark.parametrize('module', ['rating_model', 'scoring_runtime'])
+def test_cold_import(benchmark, module):
+    # Interpréteur neuf à chaque tour: temps de démarrage complet
+    benchmark.pedantic(subprocess.run, args=([sys.executable, '-c', f'import {module}'],),
+                       kwargs={'cwd': SRC_DIR, 'check': True}, rounds=3, iterations=1)
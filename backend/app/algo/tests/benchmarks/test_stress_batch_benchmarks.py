@@ -0,0 +1,47 @@
+# tests/benchmarks/test_stress_batch_benchmarks.py
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from config import REQUIRED_COLUMNS
+from etf_feature_builder import ETFFeatureBuilder
+from semi_supervised_model import ETFSemiSupervisedModel
+from stress_scenarios import ETFStressTester
+
+NUM_ETFS = 5_000
+NUM_SCENARIOS = 24
+
+pytestmark = pytest.mark.benchmark(group='stress')
+
+
+@pytest.fixture(scope='module')
+def stress_inputs():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({column: rng.random(NUM_ETFS) for column in REQUIRED_COLUMNS
+                         if column != 'metadata.creationDate'})
+    data['fundamentals.liquidity.avgDailyVolume'] = rng.lognormal(14, 2, NUM_ETFS)
+    data['riskAnalysis.volatility.annualized'] = rng.uniform(0.05, 0.5, NUM_ETFS)
+    data['metadata.creationDate'] = pd.Timestamp('2005-01-01') + pd.to_timedelta(rng.integers(0, 7000, NUM_ETFS), 'D')
+    scenarios = [{'type': f'liquidity_{i}', 'shocks': {
+        'fundamentals.liquidity.avgDailyVolume': {'multiply': 0.2 + 0.05 * i},
+        'fundamentals.costs.ter': {'add': 0.002 * i}}} for i in range(NUM_SCENARIOS - 2)]
+    scenarios += [{'type': 'market_crash', 'severity': 0.5}, {'type': 'liquidity_shock', 'factor': 0.3}]
+    return data, ETFStressTester(scenarios)
+
+
+def test_stacked_scenario_features(benchmark, stress_inputs):
+    data, tester = stress_inputs
+    feature_builder = ETFFeatureBuilder()
+    shocks = [scenario['column_shocks'] for scenario in tester.scenarios]
+
+    benchmark(feature_builder.transform_stressed, data, shocks)
+
+
+def test_run_all_scenarios(benchmark, stress_inputs):
+    data, tester = stress_inputs
+    torch.manual_seed(0)
+    model = ETFSemiSupervisedModel(input_dim=25)
+
+    results = benchmark(tester.run_all_scenarios, data, ETFFeatureBuilder(), model, torch.device('cpu'))
+    assert len(results) == NUM_SCENARIOS
@@ -0,0 +1,30 @@
+# tests/benchmarks/test_training_step_benchmarks.py
+import pytest
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from advanced_loss import ETFCompositeLoss
+from semi_supervised_model import ETFSemiSupervisedModel
+
+pytestmark = pytest.mark.benchmark(group='training')
+
+
+def test_fused_training_epoch(benchmark):
+    torch.manual_seed(0)
+    X = torch.randn(2048, 25)
+    y = torch.sigmoid(X @ torch.randn(25) / 5)
+    model = ETFSemiSupervisedModel(input_dim=25)
+    loss_fn = ETFCompositeLoss(alpha=0.7, beta=0.3)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-3)
+    loader = DataLoader(TensorDataset(X, y), batch_size=64, shuffle=True)
+
+    def epoch():
+        for batch_X, batch_y in loader:
+            optimizer.zero_grad(set_to_none=True)
+            preds, vae_outputs = model.forward_all(batch_X)
+            vae_loss, supervised_loss = loss_fn(preds, batch_y, vae_outputs=vae_outputs,
+                                                original_input=batch_X, return_supervised=True)
+            (supervised_loss + vae_loss).backward()
+            optimizer.step()
+
+    benchmark.pedantic(epoch, rounds=5, iterations=1, warmup_rounds=1)
@@ -0,0 +1,23 @@
+# tests/benchmarks/test_validation_flags_benchmarks.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from validation_utils import ETFValidator
+
+NUM_ETFS = 100_000
+THRESHOLDS = {'volatility_bounds': {'low': 0.05, 'high': 0.3}, 'max_ter': 0.01}
+
+pytestmark = pytest.mark.benchmark(group='validation')
+
+
+def test_validate_ratings(benchmark):
+    rng = np.random.default_rng(0)
+    ratings = pd.DataFrame({'normalized_score': rng.random(NUM_ETFS)})
+    etf_data = pd.DataFrame({
+        'riskAnalysis.volatility.annualized': rng.uniform(0, 0.4, NUM_ETFS),
+        'fundamentals.costs.ter': rng.uniform(0, 0.015, NUM_ETFS),
+    })
+
+    report = benchmark(ETFValidator(THRESHOLDS).validate_ratings, ratings, etf_data)
+    assert len(report['validation_flags']['is_valid']) == NUM_ETFS
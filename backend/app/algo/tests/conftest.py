@@ -0,0 +1,25 @@
+# tests/conftest.py
+# Les tests marqués @pytest.mark.benchmark (tests/benchmarks) sont ignorés par défaut.
+# Lancement: pytest -m benchmark, pytest --benchmark-only, ETF_BENCHMARKS=1 ou make bench
+import os
+
+import pytest
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: mesure de performance (pytest-benchmark), ignorée par défaut')
+
+
+def _benchmarks_requested(config) -> bool:
+    return ('benchmark' in (config.getoption('markexpr', '') or '')
+            or bool(config.getoption('benchmark_only', False))
+            or os.environ.get('ETF_BENCHMARKS', '').strip().lower() in ('1', 'true', 'yes', 'on'))
+
+
+def pytest_collection_modifyitems(config, items):
+    if _benchmarks_requested(config):
+        return
+    skip = pytest.mark.skip(reason="benchmark: lancer avec -m benchmark ou make bench")
+    for item in items:
+        if item.get_closest_marker('benchmark') is not None:
+            item.add_marker(skip)
@@ -1,8 +1,26 @@
 # tests/unit/components/test_data_pipeline.py
-from app.Tech.algo.src.data_pipeline import ETFDataPipeline
+import pandas as pd
+
+from data_pipeline import ETFDataPipeline
 
 def test_data_pipeline_handles_missing_values():
     pipeline = ETFDataPipeline()
     df = pd.DataFrame({'col1': [1, None, 3], 'col2': ['A', None, 'C']})
-    processed = pipeline.handle_missing_values(df)
-    assert processed.isna().sum().sum() == 0
\ No newline at end of file
+    processed = pipeline.handle_missing_and_encoding(df)
+    assert processed.isna().sum().sum() == 0
+    assert pipeline.num_cols == ['col1'] and pipeline.cat_cols == ['col2']
+    assert processed['col1'].iloc[[0, 2]].tolist() == [1.0, 3.0]
+    # Valeur manquante encodée comme la catégorie "Unknown", distincte de A et C
+    assert processed['col2'].nunique() == 3
+
+def test_flatten_records_follows_compiled_schema():
+    pipeline = ETFDataPipeline(schema_paths=['etfId', 'fundamentals.costs.ter', 'metadata.creationDate',
+                                             'riskAnalysis.volatility.30d'])
+    records = [
+        {'etfId': 1, 'fundamentals': {'costs': {'ter': 0.001}}, 'metadata': {'creationDate': '2000-05-15'}},
+        {'etfId': 2, 'fundamentals': {'costs': {'ter': None}}, 'metadata': {}},
+    ]
+    flat = pipeline.flatten_records(records)
+    assert list(flat.columns) == ['etfId', 'fundamentals.costs.ter', 'metadata.creationDate']
+    assert flat['etfId'].tolist() == [1, 2]
+    assert flat['fundamentals.costs.ter'].isna().tolist() == [False, True]
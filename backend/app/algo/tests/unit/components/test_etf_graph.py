@@ -0,0 +1,88 @@
+# tests/unit/components/test_etf_graph.py
+import torch
+
+from config import MODEL_CONFIG
+from etf_graph import ETFGraphProcessor, ETFGraphConfig
+
+
+def _processor():
+    return ETFGraphProcessor(ETFGraphConfig(
+        normalize_features=True,
+        etf_features=['fundamentals.priceData.currentPrice', 'fundamentals.costs.ter'],
+        asset_features=['sector', 'country'],
+        sectors=['Technology', 'Energy'],
+        edge_attributes=['weight'],
+        device='cpu'
+    ))
+
+
+def _etf(etf_id, price, assets):
+    return {
+        'etfId': etf_id,
+        'fundamentals': {'priceData': {'currentPrice': price}, 'costs': {'ter': 0.001 * etf_id}},
+        'portfolio': {'holdings': [{'assetId': a, 'weight': 0.5, 'sector': 'Energy'} for a in assets]}
+    }
+
+
+def _node_rows(processor, graph):
+    rows = {('etf', k): graph.x[v] for k, v in processor.etf_node_indices.items()}
+    rows.update({('asset', k): graph.x[v] for k, v in processor.asset_node_indices.items()})
+    return rows
+
+
+def test_add_etfs_matches_full_rebuild(monkeypatch):
+    monkeypatch.setitem(MODEL_CONFIG, 'gnn_input_dim', 4)
+    etfs = [_etf(1, 100.0, ['A', 'B']), _etf(2, 50.0, ['B']), _etf(3, 400.0, ['C'])]
+
+    full_processor = _processor()
+    full = full_processor.build_graph_from_raw(etfs)
+    processor = _processor()
+    graph = processor.add_etfs(processor.build_graph_from_raw(etfs[:2]), etfs[2:])
+
+    assert graph.num_edges == full.num_edges
+    assert graph.etf_ids == [1, 2, 3]
+    expected = _node_rows(full_processor, full)
+    for key, row in _node_rows(processor, graph).items():
+        assert torch.allclose(row, expected[key], atol=1e-6)
+
+
+def test_remove_etfs_drops_orphan_assets(monkeypatch):
+    monkeypatch.setitem(MODEL_CONFIG, 'gnn_input_dim', 4)
+    processor = _processor()
+    graph = processor.build_graph_from_raw([_etf(1, 100.0, ['A', 'B']), _etf(2, 50.0, ['B'])])
+
+    graph = processor.remove_etfs(graph, [1])
+
+    assert graph.etf_ids == [2]
+    assert graph.asset_ids == ['B']
+    assert graph.num_nodes == 2
+    assert graph.edge_index.tolist() == [[processor.etf_node_indices[2]], [processor.asset_node_indices['B']]]
+
+
+def test_malformed_feature_values_are_skipped(monkeypatch):
+    monkeypatch.setitem(MODEL_CONFIG, 'gnn_input_dim', 4)
+    malformed = _etf(2, {'value': 'n/a'}, ['B'])
+    malformed['fundamentals']['costs']['ter'] = 10 ** 400  # entier JSON hors de la plage float64
+    processor = _processor()
+
+    graph = processor.build_graph_from_raw([_etf(1, 100.0, ['A']), malformed])
+
+    assert graph.etf_ids == [1, 2]
+    etf_row = graph.x[processor.etf_node_indices[2]]
+    assert torch.isfinite(graph.x).all()
+    assert etf_row[:2].tolist() == [0.0, 0.0]
+
+
+def test_out_of_range_holding_values_are_skipped(monkeypatch):
+    monkeypatch.setitem(MODEL_CONFIG, 'gnn_input_dim', 4)
+    holder = _etf(2, 50.0, ['B', 'C'])
+    holder['portfolio']['holdings'][0]['weight'] = 10 ** 400
+    holder['portfolio']['holdings'][1]['country'] = -10 ** 400
+    processor = _processor()
+
+    graph = processor.build_graph_from_raw([_etf(1, 100.0, ['A']), holder])
+
+    assert graph.asset_ids == ['A', 'B', 'C']
+    assert graph.num_edges == 3
+    assert torch.isfinite(graph.x).all() and torch.isfinite(graph.edge_attr).all()
+    assert graph.edge_attr[:, 0].tolist() == [0.5, 0.0, 0.5]
@@ -0,0 +1,125 @@
+# tests/unit/components/test_gnn_model.py
+import pytest
+import torch
+import torch.nn.functional as F
+from torch_geometric.data import Data
+
+from config import MODEL_CONFIG
+from embedding_cache import ETFEmbeddingCache
+from etf_graph import ETFGraphConfig, ETFGraphProcessor
+from gnn_model import ETFGraphModel
+from neighbor_sampler import ETFNeighborSampler
+
+
+def _graph(num_nodes=40, num_etfs=15):
+    torch.manual_seed(0)
+    return Data(
+        x=torch.randn(num_nodes, 5),
+        edge_index=torch.randint(0, num_nodes, (2, 80)),
+        etf_index=torch.arange(num_etfs)
+    )
+
+
+def test_mean_correlation_matches_dense_matrix():
+    model = ETFGraphModel(input_dim=5, dropout=0.0)
+    embeddings, corr, _, _ = model(_graph())
+    assert torch.allclose(corr.mean(), model._mean_correlation(embeddings), atol=1e-6)
+
+
+def test_topk_neighbors_match_dense_etf_similarity():
+    model = ETFGraphModel(input_dim=5, dropout=0.0)
+    graph = _graph()
+    embeddings, (scores, indices), _, _ = model(graph, correlation_mode='topk', top_k=3, chunk_size=4)
+
+    etf_norm = F.normalize(embeddings[graph.etf_index], p=2, dim=1)
+    dense = etf_norm @ etf_norm.t()
+    dense.fill_diagonal_(float('-inf'))
+    expected_scores, expected_indices = dense.topk(3, dim=1)
+
+    assert scores.shape == (15, 3)
+    assert torch.allclose(scores, expected_scores, atol=1e-5)
+    assert torch.equal(indices, expected_indices)
+
+
+def test_correlations_skipped_when_not_requested():
+    model = ETFGraphModel(input_dim=5)
+    _, corr, _, _ = model(_graph(), correlation_mode=None)
+    assert corr is None
+
+
+def test_neighbor_sampler_respects_fan_out_and_graph_edges():
+    graph = _graph()
+    sampler = ETFNeighborSampler(graph.edge_index, graph.num_nodes, fan_out=[2, 2], seed=0)
+    batch = sampler.sample(torch.tensor([0, 3]), graph)
+
+    assert batch.n_id[:2].tolist() == [0, 3]
+    assert torch.equal(batch.x, graph.x[batch.n_id])
+    original_edges = set(map(tuple, graph.edge_index.t().tolist()))
+    for src, dst in batch.edge_index.t().tolist():
+        assert (int(batch.n_id[src]), int(batch.n_id[dst])) in original_edges
+    assert torch.bincount(batch.edge_index[1], minlength=batch.num_nodes).max() <= 2
+
+
+def test_neighbor_sampler_reaches_assets_from_etf_seeds(monkeypatch):
+    # Graphe biparti réel: les arêtes vont ETF -> actif, les graines ETF n'ont pas d'arête entrante
+    monkeypatch.setitem(MODEL_CONFIG, 'gnn_input_dim', 2)
+    processor = ETFGraphProcessor(ETFGraphConfig(
+        etf_features=['fundamentals.costs.ter'], asset_features=['sector'],
+        sectors=['Energy'], edge_attributes=['weight'], device='cpu'))
+    graph = processor.build_graph_from_raw([
+        {'etfId': i + 1, 'fundamentals': {'costs': {'ter': 0.001 * i}},
+         'portfolio': {'holdings': [{'assetId': f"A{(i + j) % 6}", 'weight': 0.5, 'sector': 'Energy'}
+                                    for j in range(3)]}}
+        for i in range(4)])
+    seeds = graph.etf_index[:2]
+
+    directed = ETFNeighborSampler(graph.edge_index, graph.num_nodes, fan_out=[10, 5], seed=0)
+    assert directed.sample(seeds, graph).edge_index.shape[1] == 0
+
+    batch = ETFNeighborSampler(graph.edge_index, graph.num_nodes, fan_out=[10, 5],
+                               undirected=True, seed=0).sample(seeds, graph)
+    into_seeds = batch.edge_index[1] < batch.batch_size
+    assert into_seeds.any()
+    assert set(batch.edge_index[1, into_seeds].tolist()) == {0, 1}
+    # Deuxième saut: les actifs ramènent les autres ETFs qui les détiennent
+    assert batch.num_nodes > 2 + 4
+
+
+def test_embedding_cache_reuses_rows_until_weights_change(tmp_path):
+    model = ETFGraphModel(input_dim=5)
+    graph = _graph()
+    graph.etf_ids = [f"etf{i}" for i in range(15)]
+    cache = ETFEmbeddingCache(str(tmp_path))
+
+    table = cache.get_or_compute(model, graph)
+    assert torch.allclose(table.as_tensor(graph.etf_ids), model.etf_embeddings(graph), atol=1e-6)
+    assert torch.equal(table.as_tensor(['etf3']), table.as_tensor(graph.etf_ids)[3:4])
+    assert model.training
+    assert ETFEmbeddingCache(str(tmp_path)).get(model, graph) is not None
+
+    with torch.no_grad():
+        model.gnn.lin.weight.add_(1.0)
+    assert cache.get(model, graph) is None
+
+
+def test_portfolio_weights_cover_etfs_with_or_without_cache(tmp_path):
+    model = ETFGraphModel(input_dim=5).eval()
+    graph = _graph()
+    graph.etf_ids = [f"etf{i}" for i in range(15)]
+
+    weights = model.predict_portfolio_weights(graph, embedding_cache=ETFEmbeddingCache(str(tmp_path)))
+
+    with torch.no_grad():
+        mu, _ = model.uncertainty_head(model.etf_embeddings(graph)).chunk(2, dim=1)
+    assert weights.shape == (15, 1)
+    assert torch.allclose(weights, F.softmax(mu, dim=0), atol=1e-6)
+    # Sans cache: mêmes poids, actifs exclus de la normalisation
+    assert torch.allclose(model.predict_portfolio_weights(graph), weights, atol=1e-6)
+
+
+def test_minibatch_training_rejects_misaligned_targets():
+    model = ETFGraphModel(input_dim=5)
+    optimizer = torch.optim.Adam(model.parameters())
+    with pytest.raises(ValueError, match="une cible par nœud ETF"):
+        model.train_minibatch(_graph(), torch.zeros(10), downstream_model=None, loss_fn=None,
+                              optimizer=optimizer, device=torch.device('cpu'))
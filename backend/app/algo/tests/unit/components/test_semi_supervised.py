@@ -0,0 +1,103 @@
+# tests/unit/components/test_semi_supervised.py
+import copy
+import gc
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from advanced_loss import ETFCompositeLoss
+from model_export import export_scoring_model
+from scoring_runtime import ScoringRuntime
+from semi_supervised_model import ETFSemiSupervisedModel
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'src')
+
+
+def _dataset(n=512, dim=25):
+    torch.manual_seed(0)
+    X = torch.randn(n, dim)
+    y = torch.sigmoid(X @ torch.randn(dim) / dim ** 0.5)
+    return X, y
+
+
+def _legacy_step(model, loss_fn, batch_X, batch_y):
+    """Ancienne étape: deux passages de l'encodeur et un gc.collect par batch"""
+    preds = model(batch_X, use_combined=False)
+    supervised_loss = loss_fn(preds, batch_y)
+    recon, mu, logvar = model(batch_X, supervised=False)
+    vae_loss = loss_fn(preds=preds, targets=batch_y, vae_outputs=(recon, mu, logvar), original_input=batch_X)
+    total_loss = supervised_loss + vae_loss
+    gc.collect()
+    return total_loss
+
+
+def _fused_step(model, loss_fn, batch_X, batch_y):
+    preds, vae_outputs = model.forward_all(batch_X)
+    vae_loss, supervised_loss = loss_fn(preds, batch_y, vae_outputs=vae_outputs,
+                                        original_input=batch_X, return_supervised=True)
+    return supervised_loss + vae_loss
+
+
+def _train_mse(step, model, X, y, epochs=2):
+    loss_fn = ETFCompositeLoss(alpha=0.7, beta=0.3)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-3)
+    loader = DataLoader(TensorDataset(X, y), batch_size=64, shuffle=True,
+                        generator=torch.Generator().manual_seed(0))
+    for _ in range(epochs):
+        for batch_X, batch_y in loader:
+            optimizer.zero_grad(set_to_none=True)
+            step(model, loss_fn, batch_X, batch_y).backward()
+            optimizer.step()
+
+    model.eval()
+    with torch.no_grad():
+        return torch.mean((model(X).squeeze(1) - y) ** 2).item()
+
+
+@pytest.fixture
+def model():
+    torch.manual_seed(0)
+    return ETFSemiSupervisedModel(input_dim=25).eval()
+
+
+@pytest.mark.parametrize('quantize, atol', [(False, 1e-5), (True, 3e-2)])
+def test_exported_model_matches_eager(model, tmp_path, quantize, atol):
+    path = str(tmp_path / 'scoring.pt')
+    export_scoring_model(model, path, quantize=quantize)
+
+    features = np.random.default_rng(0).random((1000, 25)).astype(np.float32)
+    with torch.no_grad():
+        expected = model(torch.from_numpy(features)).numpy().reshape(-1)
+
+    threads = torch.get_num_threads()
+    scores = ScoringRuntime(path, num_threads=threads + 1).predict(features, batch_size=256)
+    assert np.allclose(scores, expected, atol=atol)
+    assert torch.get_num_threads() == threads  # réglage global laissé au point d'entrée
+
+
+def test_runtime_does_not_import_training_dependencies(model, tmp_path):
+    path = str(tmp_path / 'scoring.pt')
+    export_scoring_model(model, path)
+
+    script = (
+        "import sys, numpy as np\n"
+        "from scoring_runtime import ScoringRuntime\n"
+        f"ScoringRuntime({path!r}).predict(np.zeros((2, 25)))\n"
+        "assert not {'shap', 'torch_geometric', 'sklearn'} & set(sys.modules), sys.modules.keys()\n"
+    )
+    subprocess.run([sys.executable, '-c', script], check=True, cwd=SRC_DIR)
+
+
+def test_fused_training_step_matches_legacy_loss():
+    X, y = _dataset()
+    torch.manual_seed(0)
+    initial = ETFSemiSupervisedModel(input_dim=25)
+
+    legacy_mse = _train_mse(_legacy_step, copy.deepcopy(initial), X, y)
+    fused_mse = _train_mse(_fused_step, copy.deepcopy(initial), X, y)
+    assert abs(fused_mse - legacy_mse) < 0.01
@@ -0,0 +1,69 @@
+# tests/unit/core/test_backtesting.py
+import os
+
+import numpy as np
+import pandas as pd
+
+from backtesting import _prepare_fold, _run_fold, forward_returns, walk_forward_folds
+from config import build_engine_config
+
+NUM_ETFS = 40
+NUM_DATES = 16
+HORIZON = 5
+
+
+def _panel():
+    """Panel synthétique: la feature 0 prédit le rendement futur"""
+    rng = np.random.default_rng(0)
+    prices_index = pd.bdate_range('2023-01-02', periods=NUM_DATES * HORIZON + HORIZON + 1)
+    dates = prices_index[:NUM_DATES * HORIZON:HORIZON]
+
+    signal = rng.standard_normal((NUM_DATES, NUM_ETFS))
+    daily = np.zeros((len(prices_index), NUM_ETFS))
+    for i, date in enumerate(dates):
+        start = prices_index.get_loc(date) + 1
+        daily[start:start + HORIZON] = 0.002 * signal[i] + 0.005 * rng.standard_normal((HORIZON, NUM_ETFS))
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(daily, axis=0)), index=prices_index)
+
+    index = pd.MultiIndex.from_product([dates, range(NUM_ETFS)])
+    features = pd.DataFrame(rng.random((len(index), 25)), index=index)
+    features[0] = signal.reshape(-1)
+    return features, prices
+
+
+def test_folds_respect_forward_horizon():
+    features, prices = _panel()
+    dates = features.index.get_level_values(0).unique()
+    returns = forward_returns(prices, dates, HORIZON)
+    folds = walk_forward_folds(dates, returns.attrs['end_dates'], train_dates=6, test_dates=2)
+
+    assert folds
+    for fold in folds:
+        assert len(fold['train']) == 6
+        assert max(returns.attrs['end_dates'][d] for d in fold['train']) <= fold['test'][0]
+
+    expanding = walk_forward_folds(dates, returns.attrs['end_dates'], train_dates=6, test_dates=2, expanding=True)
+    assert [fold['test'] for fold in expanding] == [fold['test'] for fold in folds]
+    assert all(len(fold['train']) >= 6 for fold in expanding)
+    assert all(len(a['train']) < len(b['train']) for a, b in zip(expanding, expanding[1:]))
+
+
+def test_fold_scores_predict_forward_returns(tmp_path):
+    features, prices = _panel()
+    dates = features.index.get_level_values(0).unique()
+    returns = forward_returns(prices, dates, HORIZON)
+    fold = walk_forward_folds(dates, returns.attrs['end_dates'], train_dates=12, test_dates=2)[0]
+    prepared = _prepare_fold(fold, features, returns, str(tmp_path))
+
+    result = _run_fold(build_engine_config(), fold, prepared, features.loc[fold['test']].index,
+                       returns.loc[fold['test']], epochs=20, seed=0, num_threads=1, top_fraction=0.2)
+
+    assert result['fold'] == 0 and result['num_train_samples'] == 12 * NUM_ETFS
+    assert -1 <= result['rank_ic'] <= 1 and 0 <= result['hit_rate'] <= 1
+    assert result['rank_ic'] > 0
+
+    # Prétraitement relu depuis le cache disque
+    assert len(os.listdir(tmp_path)) == 1
+    cached = _prepare_fold(fold, features, returns, str(tmp_path))
+    assert cached['X_test'].shape == (2 * NUM_ETFS, 25)
+    assert np.array_equal(cached['X_train'], prepared['X_train'])
@@ -0,0 +1,53 @@
+# tests/unit/core/test_engine_training.py
+import pandas as pd
+import numpy as np
+import pytest
+import torch
+from torch_geometric.data import Data
+
+from config import MODEL_CONFIG, build_engine_config
+from rating_model import ETFScoringEngine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    config = build_engine_config()
+    config.update({
+        'embedding_cache_dir': str(tmp_path / 'embeddings'),
+        'checkpoint_path': str(tmp_path / 'best.pt'),
+        'early_stopping_patience': 2,
+    })
+    return ETFScoringEngine(config)
+
+
+def test_training_stops_early_and_restores_best_checkpoint(engine):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((200, MODEL_CONFIG['input_dim'])))
+    y = pd.Series(rng.random(200))
+
+    metrics = engine.train(X, y, epochs=200)
+
+    assert metrics['stopped_early']
+    assert metrics['epochs_run'] == metrics['best_epoch'] + 2
+    assert len(engine.monitor.performance_metrics['epoch_val_loss']) == metrics['epochs_run']
+
+    checkpoint = torch.load(engine.config['checkpoint_path'])
+    for name, tensor in engine.semi_supervised_model.state_dict().items():
+        assert torch.equal(tensor, checkpoint['model_state'][name])
+
+
+def test_distributed_training_syncs_ranks(engine):
+    torch.manual_seed(0)
+    X = pd.DataFrame(np.random.default_rng(1).random((120, MODEL_CONFIG['input_dim'])))
+    y = pd.Series(np.random.default_rng(2).random(120))
+    graph = Data(x=torch.rand(150, MODEL_CONFIG['gnn_input_dim']),
+                 edge_index=torch.randint(0, 150, (2, 400)),
+                 etf_index=torch.arange(120))
+
+    metrics = engine.train_distributed(X, y, graph_data=graph, epochs=3, world_size=2)
+
+    assert metrics['world_size'] == 2
+    assert metrics['epochs_run'] <= 3 and 'gnn_loss' in metrics
+    state = torch.load(metrics['state_path'])
+    for name, tensor in engine.semi_supervised_model.state_dict().items():
+        assert torch.equal(tensor, state['model_state'][name])
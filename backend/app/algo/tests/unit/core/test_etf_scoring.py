@@ -0,0 +1,83 @@
+# tests/unit/core/test_etf_scoring.py
+import numpy as np
+import pandas as pd
+import torch
+
+from config import build_engine_config
+from data_utils import DataPreprocessor
+from embedding_cache import ETFEmbeddingCache
+from etf_scoring import ETFScoring
+from rating_model import ETFScoringEngine
+from synthetic_universe import generate_universe
+
+NUM_ETFS = 2_000
+
+
+def _legacy_pipeline(features: pd.DataFrame, scores: np.ndarray) -> pd.Series:
+    """Ancien chemin: fillna colonne par colonne, boucle if/elif, validation par iterrows"""
+    X = features.copy()
+    for col in X.columns:
+        if X[col].isnull().any():
+            X[col] = X[col].fillna(X[col].median())
+
+    ratings = []
+    for score in scores:
+        if score >= 0.9:
+            ratings.append('A+')
+        elif score >= 0.8:
+            ratings.append('A')
+        elif score >= 0.6:
+            ratings.append('B')
+        elif score >= 0.4:
+            ratings.append('C')
+        else:
+            ratings.append('D')
+    ratings = pd.Series(ratings)
+
+    results = pd.DataFrame({'normalized_score': scores, 'rating': ratings})
+    for _, row in results.iterrows():
+        min_score, max_score = ETFScoring.RATING_SCALE[row['rating']]
+        assert min_score <= row['normalized_score'] <= max_score
+    return X, ratings
+
+
+def test_vectorized_ratings_match_legacy_loop():
+    scoring = ETFScoring.__new__(ETFScoring)
+    rng = np.random.default_rng(0)
+    scores = np.concatenate([rng.random(NUM_ETFS - 5), [0.0, 0.4, 0.8, 0.9, 1.0]])
+    features = rng.random((NUM_ETFS, 25)).astype(np.float32)
+    features[rng.random(features.shape) < 0.05] = np.nan
+
+    filled = ETFScoring._fill_median(features.copy())
+    ratings = scoring._assign_ratings(scores)
+    scoring._validate_ratings(pd.DataFrame({'normalized_score': scores, 'rating': ratings}))
+    legacy_filled, legacy_ratings = _legacy_pipeline(pd.DataFrame(features), scores)
+
+    assert ratings.astype(str).tolist() == legacy_ratings.tolist()
+    assert np.allclose(filled, legacy_filled.to_numpy())
+
+
+def test_predict_with_embedding_cache_matches_gnn_forward(tmp_path):
+    config = build_engine_config()
+    config.update({'embedding_cache_dir': str(tmp_path / 'engine'), 'prometheus_metrics': False})
+    torch.manual_seed(0)
+    engine = ETFScoringEngine(config)
+    records = generate_universe(50, seed=0)
+    processed = DataPreprocessor().process_numerical_data(engine.data_pipeline.flatten_records(records))
+    features = engine.feature_builder.transform(engine.data_pipeline.process(processed, flatten=False))
+    graph = engine.graph_processor.build_graph_from_raw(records)
+    engine.semi_supervised_model.eval()
+    engine.gnn_model.eval()
+
+    def predict(gnn_model, embedding_cache):
+        return ETFScoring(model=engine.semi_supervised_model, gnn_model=gnn_model, device=engine.device,
+                          monitor=engine.monitor, feature_selector=features, graph_data=graph,
+                          embedding_cache=embedding_cache).predict(features)
+
+    cached = predict(engine.gnn_model, ETFEmbeddingCache(str(tmp_path / 'cache')))
+    forward = predict(engine.gnn_model, None)
+    main_only = predict(None, None)
+
+    assert len(cached) == len(forward) == 50
+    assert np.allclose(cached['raw_score'], forward['raw_score'], atol=1e-5)
+    assert not np.allclose(cached['raw_score'], main_only['raw_score'])
@@ -0,0 +1,125 @@
+# tests/unit/core/test_model_registry.py
+import threading
+
+import numpy as np
+import pytest
+import torch
+
+from config import MODEL_CONFIG, build_engine_config
+from model_registry import ModelRegistry
+from rating_model import ETFScoringEngine
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = build_engine_config()
+    config.update({
+        'embedding_cache_dir': str(tmp_path / 'embeddings'),
+        'model_registry_dir': str(tmp_path / 'registry'),
+        'prometheus_metrics': False,
+    })
+    return config
+
+
+def test_register_and_hot_swap(config):
+    torch.manual_seed(0)
+    source = ETFScoringEngine(config)
+    source.graph_processor.feature_stats = {'min': np.zeros(3), 'max': np.ones(3)}
+    version = source.register_model(tag='test')
+
+    torch.manual_seed(1)
+    target = ETFScoringEngine(config)
+    previous_model = target.semi_supervised_model
+    manifest = target.load_from_registry()
+
+    assert manifest['version'] == version == target.model_registry.latest()
+    assert manifest['feature_schema']['feature_columns'] == source.feature_builder.output_columns()
+    assert target.semi_supervised_model is not previous_model
+    assert target.explanation_generator.model is target.semi_supervised_model
+    assert target.monitor.model_version == version
+    np.testing.assert_array_equal(target.graph_processor.feature_stats['max'], np.ones(3))
+
+    X = torch.rand(8, MODEL_CONFIG['input_dim'])
+    source.semi_supervised_model.eval()
+    with torch.no_grad():
+        assert torch.equal(source.semi_supervised_model(X), target.semi_supervised_model(X))
+
+
+def test_concurrent_readers_never_see_mixed_versions(config):
+    # Deux versions dont le pipeline et les bornes du graphe portent la marque du modèle
+    versions = {}
+    for marker in (1.0, 2.0):
+        engine = ETFScoringEngine(config)
+        with torch.no_grad():
+            next(engine.semi_supervised_model.parameters()).fill_(marker)
+        engine.data_pipeline.marker = marker
+        engine.graph_processor.feature_stats = {'min': np.zeros(3), 'max': np.full(3, marker)}
+        versions[marker] = engine.model_registry.register(engine, promote=False)
+
+    target = ETFScoringEngine(config)
+    target.load_from_registry(versions[1.0])
+    stop, mixed, reads = threading.Event(), [], []
+
+    def read():
+        while not stop.is_set():
+            served = target.served
+            marker = float(next(served.semi_supervised_model.parameters()).flatten()[0])
+            if (served.data_pipeline.marker != marker
+                    or served.graph_processor.feature_stats['max'][0] != marker
+                    or served.explanation_generator.model is not served.semi_supervised_model):
+                mixed.append(marker)
+            reads.append(marker)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for i in range(20):
+        target.load_from_registry(versions[2.0 if i % 2 == 0 else 1.0])
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert not mixed
+    assert {1.0, 2.0} <= set(reads)
+    assert target.data_pipeline.marker == 1.0
+
+
+def test_swap_waits_for_training(config):
+    engine = ETFScoringEngine(config)
+    version = engine.register_model()
+    previous = engine.served
+    swapped = threading.Event()
+
+    with engine._model_lock:  # tenu par train() et run_full_analysis()
+        loader = threading.Thread(target=lambda: (engine.load_from_registry(version), swapped.set()))
+        loader.start()
+        assert not swapped.wait(0.5)
+        assert engine.served is previous
+    loader.join()
+    assert swapped.is_set() and engine.served is not previous
+
+
+def test_optimizer_state_and_schema_check(config):
+    engine = ETFScoringEngine(config)
+    registry = ModelRegistry(config['model_registry_dir'])
+    version = registry.register(engine, include_optimizer=True, promote=False)
+
+    assert registry.latest() is None
+    assert 'optimizer_state' in registry.load(version, inference_only=False)
+    assert 'optimizer_state' not in registry.load(version)
+
+    manifest = registry.manifest(version)
+    with pytest.raises(ValueError):
+        registry.check_compatible(manifest, config, manifest['feature_schema']['feature_columns'][:-1])
+
+
+def test_prune_keeps_latest(config):
+    engine = ETFScoringEngine(config)
+    registry = ModelRegistry(config['model_registry_dir'])
+    versions = [registry.register(engine, promote=False) for _ in range(4)]
+    registry.promote(versions[0])
+
+    removed = registry.prune(keep=2)
+
+    assert registry.versions() == [versions[0], versions[3]]
+    assert removed == versions[1:3]
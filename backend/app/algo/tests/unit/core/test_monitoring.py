@@ -0,0 +1,111 @@
+# tests/unit/core/test_monitoring.py
+import numpy as np
+import pytest
+
+from monitoring import ETFSystemMonitor, MetricRing
+
+
+def test_ring_buffer_keeps_latest_values_and_lifetime_aggregates():
+    ring = MetricRing(capacity=100)
+    values = np.random.default_rng(0).lognormal(size=10_000)
+    for i, value in enumerate(values):
+        ring.append(value, timestamp=float(i))
+
+    assert len(ring) == 100
+    timestamps, recent = ring.window()
+    np.testing.assert_array_equal(recent, values[-100:])
+    assert list(ring.window(since=9_990.0)[0]) == [float(i) for i in range(9_990, 10_000)]
+
+    summary = ring.summary()
+    assert summary['count'] == 10_000
+    assert np.isclose(summary['mean'], values.mean())
+    assert abs(summary['p95'] / np.quantile(values, 0.95) - 1) < 0.03
+
+
+def test_track_performance_is_bounded():
+    monitor = ETFSystemMonitor(capacity=10, log_capacity=20)
+    for epoch in range(50):
+        monitor.track_performance('epoch_val_loss', 1.0 / (epoch + 1))
+        monitor.log_operation_start('prediction')
+        monitor.log_operation_success('prediction')
+
+    assert len(monitor.performance_metrics['epoch_val_loss']) == 10
+    assert len(monitor.operations_log) == 20
+    assert len(monitor.get_recent_metrics()['epoch_val_loss']) == 10
+    assert monitor.health_check()['operations']['prediction']['count'] == 50
+
+
+def test_operation_duration_by_id():
+    monitor = ETFSystemMonitor()
+    monitor.log_operation_start('prediction', operation_id='a')
+    monitor.log_operation_start('prediction', operation_id='b')
+    monitor.log_operation_success('prediction', operation_id='a')
+    monitor.log_operation_failure('prediction', 'boom', operation_id='b')
+
+    assert monitor.operation_durations['prediction'].count == 2
+    assert monitor.get_operation_duration('prediction') > 0
+    assert monitor.get_operation_duration('unknown') == 0.0
+
+
+def test_prometheus_export():
+    monitor = ETFSystemMonitor()
+    monitor.track_performance('epoch-loss', 0.5)
+    monitor.log_operation_start('full_analysis')
+    monitor.log_operation_success('full_analysis')
+
+    text = monitor.to_prometheus()
+    assert '# TYPE etf_engine_epoch_loss summary' in text
+    assert 'etf_engine_epoch_loss_count 1' in text
+    assert 'etf_engine_operation_duration_seconds_count{operation="full_analysis"} 1' in text
+    assert 'etf_engine_memory_rss_bytes' in text
+
+
+def test_exporter_falls_back_to_text_without_prometheus_client(monkeypatch):
+    import metrics_exporter
+    monkeypatch.setattr(metrics_exporter, 'PROMETHEUS_AVAILABLE', False)
+    exporter = metrics_exporter.ETFMetricsExporter()
+    monitor = ETFSystemMonitor(exporter=exporter)
+    monitor.track_performance('epoch_val_loss', 0.25)
+    monitor.set_model_version('abc')
+
+    text = exporter.render(monitor)
+    assert 'etf_engine_epoch_val_loss_count 1' in text
+    assert 'etf_engine_model_info{version="abc"} 1' in text
+
+
+def test_exporter_publishes_engine_metrics():
+    prometheus_client = pytest.importorskip('prometheus_client')
+    from metrics_exporter import ETFMetricsExporter
+
+    registry = prometheus_client.CollectorRegistry()
+    monitor = ETFSystemMonitor(exporter=ETFMetricsExporter(registry=registry))
+    monitor.log_operation_start('full_analysis')
+    monitor.log_operation_success('full_analysis')
+    monitor.log_operation_start('prediction')
+    monitor.log_operation_failure('prediction', 'boom')
+    monitor.track_performance('epoch', 1)
+    monitor.track_performance('epoch_val_loss', 0.25)
+    monitor.track_performance('training_throughput', 2e4)
+    monitor.set_model_version('abc')
+
+    sample = registry.get_sample_value
+    assert sample('etf_engine_operation_duration_seconds_count', {'operation': 'full_analysis'}) == 1
+    assert sample('etf_engine_operation_failures_total', {'operation': 'prediction'}) == 1
+    assert sample('etf_engine_training_epochs_total') == 1
+    assert sample('etf_engine_epoch_loss', {'loss': 'val'}) == 0.25
+    assert sample('etf_engine_training_throughput_samples_per_second_count') == 1
+    assert sample('etf_engine_model_info', {'version': 'abc'}) == 1
+    assert sample('etf_engine_memory_rss_bytes') > 0
+
+
+def test_exporter_registers_instruments_in_each_new_registry():
+    prometheus_client = pytest.importorskip('prometheus_client')
+    from metrics_exporter import ETFMetricsExporter
+
+    # Registres successifs de courte durée: un id() peut être réattribué après collecte
+    for _ in range(20):
+        registry = prometheus_client.CollectorRegistry()
+        ETFMetricsExporter(registry=registry).observe_duration('prediction', 0.1)
+        assert registry.get_sample_value('etf_engine_operation_duration_seconds_count',
+                                         {'operation': 'prediction'}) == 1
+        del registry
@@ -0,0 +1,35 @@
+# tests/unit/core/test_startup.py
+import os
+import re
+import subprocess
+import sys
+
+import pandas as pd
+
+from config import REQUIRED_COLUMNS
+from etf_feature_builder import ETFFeatureBuilder
+
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'src')
+HEAVY_MODULES = ('shap', 'networkx', 'sklearn.ensemble', 'sklearn.impute')
+
+
+def test_output_columns_match_transform():
+    builder = ETFFeatureBuilder()
+    transformed = builder.transform(pd.DataFrame(columns=REQUIRED_COLUMNS))
+    assert builder.output_columns() == list(transformed.columns)
+    assert builder.output_dim == transformed.shape[1]
+
+
+def test_import_time_without_heavy_modules():
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import rating_model'],
+        cwd=SRC_DIR, capture_output=True, text=True, check=True)
+
+    imported = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)$', line)
+        if match:
+            imported[match.group(2)] = int(match.group(1))
+
+    assert 'rating_model' in imported
+    assert not [name for name in HEAVY_MODULES if name in imported]
@@ -0,0 +1,121 @@
+# tests/unit/utils/test_explanations.py
+import numpy as np
+import pandas as pd
+import pytest
+import torch
+
+from attributions import ETFAttributionCache, compute_attributions, top_k_features
+from explanations import ETFExplanationGenerator
+from semi_supervised_model import ETFSemiSupervisedModel
+
+
+def _model_and_features(num_etfs=64):
+    torch.manual_seed(0)
+    model = ETFSemiSupervisedModel(input_dim=25)
+    features = pd.DataFrame(np.random.default_rng(0).random((num_etfs, 25)).astype(np.float32),
+                            columns=[f"f{i}" for i in range(25)])
+    return model, features
+
+
+def _legacy_strengths(etf_data: pd.DataFrame, thresholds: dict) -> list:
+    """Ancien chemin: iterrows et row.get scalaires (points forts uniquement)"""
+    strengths = []
+    for _, row in etf_data.iterrows():
+        texts = []
+        ter = row.get('fundamentals.costs.ter', float('nan'))
+        if not np.isnan(ter) and ter < thresholds['ter_low']:
+            texts.append(f"Low fees (TER {ter*100:.2f}% < {thresholds['ter_low']*100:.2f}% percentile)")
+        liquidity = row.get('fundamentals.liquidity.avgDailyVolume', float('nan'))
+        if not np.isnan(liquidity) and liquidity > thresholds['liquidity_high']:
+            texts.append(f"High liquidity ({liquidity/1e6:.1f}M > {thresholds['liquidity_high']/1e6:.1f}M percentile)")
+        tracking_error = row.get('fundamentals.costs.trackingError', float('nan'))
+        if not np.isnan(tracking_error) and tracking_error < 0.002:
+            texts.append("Excellent tracking (error < 0.2%)")
+        strengths.append(" | ".join(texts) or "No significant strengths")
+    return strengths
+
+
+def test_integrated_gradients_completeness():
+    model, features = _model_and_features()
+    x = torch.from_numpy(features.to_numpy(copy=True))
+    attributions = compute_attributions(model, x, method='integrated_gradients', steps=64)
+    assert model.training  # mode d'origine restauré
+
+    model.eval()
+    with torch.no_grad():
+        delta = (model(x) - model(x.mean(dim=0, keepdim=True))).squeeze(1).numpy()
+    np.testing.assert_allclose(attributions.sum(axis=1), delta, atol=5e-3)
+
+
+def test_gradient_x_input_linear_model():
+    model = torch.nn.Linear(4, 1)
+    x = torch.randn(10, 4)
+    attributions = compute_attributions(model, x, method='gradient_x_input')
+    np.testing.assert_allclose(attributions, (x * model.weight.detach()).numpy(), rtol=1e-5)
+    assert all(p.requires_grad for p in model.parameters())
+
+
+@pytest.mark.parametrize('steps', [0, 1])
+def test_integrated_gradients_rejects_too_few_steps(steps):
+    model, features = _model_and_features(num_etfs=4)
+    with pytest.raises(ValueError, match="steps"):
+        compute_attributions(model, torch.from_numpy(features.to_numpy(copy=True)), steps=steps)
+
+
+def test_top_k_features_matches_argsort():
+    values = np.random.default_rng(1).standard_normal((200, 25))
+    top_pos, top_neg = top_k_features(values, k=3)
+    np.testing.assert_array_equal(top_pos, np.argsort(-values, axis=1)[:, :3])
+    np.testing.assert_array_equal(top_neg, np.argsort(values, axis=1)[:, :3])
+
+
+def test_attribution_cache_keyed_by_model_version():
+    model, features = _model_and_features()
+    cache = ETFAttributionCache()
+    first = cache.get_or_compute(model, features)
+    assert cache.get_or_compute(model, features) is first
+
+    with torch.no_grad():
+        model.supervised_head[-2].bias.add_(1.0)
+    assert cache.get_or_compute(model, features) is not first
+
+
+def test_generator_insights_without_shap():
+    model, features = _model_and_features(8)
+    positive, negative = ETFExplanationGenerator(model=model).generate_shap_insights(features, n_features=2)
+    assert len(positive) == len(negative) == 8
+    assert all(text.count('(+') == 2 for text in positive)
+
+
+def test_rule_explanations_over_frame():
+    etf_data = pd.DataFrame({
+        'fundamentals.costs.ter': np.linspace(0.001, 0.01, 11),
+        'fundamentals.liquidity.avgDailyVolume': np.linspace(1e6, 11e6, 11),
+        'riskAnalysis.volatility.annualized': np.linspace(0.1, 0.3, 11),
+        'fundamentals.costs.trackingError': [0.001] + [np.nan] * 10,
+        'riskAnalysis.drawdowns.maxDrawdown': [-0.1] * 10 + [-0.3],
+    })
+    explanations = ETFExplanationGenerator().generate_explanations(etf_data, scores=None)
+
+    assert explanations['strengths'][0] == "Low fees (TER 0.10% < 0.19% percentile) | Excellent tracking (error < 0.2%)"
+    assert explanations['strengths'][5] == "No significant strengths"
+    assert explanations['weaknesses'][10] == (
+        "High volatility (30.0% > 28.0% percentile) | High fees (TER 1.00% > 0.91% percentile)")
+    assert explanations['risk_analysis'][10] == "Significant drawdown risk (-30.0%)"
+    assert explanations['model_insights'] == [""] * 11
+
+
+def test_rule_strengths_match_row_loop():
+    rng = np.random.default_rng(0)
+    num_etfs = 2_000
+    etf_data = pd.DataFrame({
+        'fundamentals.costs.ter': rng.uniform(0, 0.01, num_etfs),
+        'fundamentals.liquidity.avgDailyVolume': rng.lognormal(14, 2, num_etfs),
+        'riskAnalysis.volatility.annualized': rng.uniform(0.05, 0.5, num_etfs),
+        'fundamentals.costs.trackingError': rng.uniform(0, 0.005, num_etfs),
+        'riskAnalysis.drawdowns.maxDrawdown': rng.uniform(-0.5, 0, num_etfs),
+    })
+    generator = ETFExplanationGenerator()
+
+    explanations = generator.generate_explanations(etf_data, scores=None)
+    assert explanations['strengths'] == _legacy_strengths(etf_data, generator.compute_dynamic_thresholds(etf_data))
@@ -0,0 +1,73 @@
+# tests/unit/utils/test_memory_optimizer.py
+import os
+
+import torch
+import torch.nn as nn
+
+from config import build_engine_config
+from memory_optimizer import (MemoryOptimizer, PrefetchTensorLoader, autocast_context, available_cpu_cores,
+                              configure_cpu_threads)
+from rating_model import ETFScoringEngine
+from semi_supervised_model import ETFSemiSupervisedModel
+
+
+def test_prefetch_loader_yields_each_row_once():
+    X = torch.arange(103, dtype=torch.float32).unsqueeze(1)
+    y = torch.arange(103, dtype=torch.float32)
+    loader = PrefetchTensorLoader(X, y, batch_size=10, shuffle=True, prefetch=2)
+
+    batches = list(loader)
+    assert len(batches) == len(loader) == 11
+    seen = torch.cat([batch_X.squeeze(1) for batch_X, _ in batches])
+    assert torch.equal(torch.sort(seen).values, y)
+    assert all(torch.equal(batch_X.squeeze(1), batch_y) for batch_X, batch_y in batches)
+
+    # Sortie anticipée: le thread de préchargement s'arrête proprement
+    for _ in loader:
+        break
+
+
+def test_cpu_batch_size_autotune_returns_a_candidate():
+    optimizer = MemoryOptimizer(device=torch.device('cpu'))
+    model = nn.Sequential(nn.Linear(25, 64), nn.ReLU(), nn.Linear(64, 1))
+
+    size = optimizer.calculate_adaptive_batch_size(
+        1000, torch.randn(25), model=model, candidates=[16, 64, 256, 4096])
+
+    assert size in (16, 64, 256)
+    assert all(p.grad is None for p in model.parameters())
+    assert optimizer.calculate_adaptive_batch_size(1000, torch.randn(25)) == 1000
+
+
+def test_bf16_autocast_matches_fp32():
+    torch.manual_seed(0)
+    X = torch.randn(1024, 25)
+    model = ETFSemiSupervisedModel(input_dim=25).eval()
+
+    with torch.no_grad():
+        reference = model(X)
+        with autocast_context(torch.device('cpu'), bf16=True):
+            reduced = model(X).float()
+
+    assert torch.allclose(reference, reduced, atol=2e-2)
+
+
+def test_engine_leaves_process_threads_alone(tmp_path):
+    threads = torch.get_num_threads()
+    config = build_engine_config()
+    config.update({'embedding_cache_dir': str(tmp_path), 'prometheus_metrics': False,
+                   'CPU_PROFILE': {**config['CPU_PROFILE'], 'intra_op_threads': threads + 1}})
+    ETFScoringEngine(config)
+    assert torch.get_num_threads() == threads
+
+
+def test_configure_cpu_threads_respects_omp_num_threads(monkeypatch):
+    threads = torch.get_num_threads()
+    try:
+        monkeypatch.setenv('OMP_NUM_THREADS', '1')
+        assert configure_cpu_threads()['intra_op_threads'] == 1
+        assert configure_cpu_threads(intra_op_threads=2)['intra_op_threads'] == 2
+    finally:
+        torch.set_num_threads(threads)
+    if hasattr(os, 'sched_getaffinity'):
+        assert 1 <= available_cpu_cores() <= len(os.sched_getaffinity(0))
@@ -0,0 +1,68 @@
+# tests/unit/utils/test_monte_carlo_stress.py
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import torch
+
+from config import MONTE_CARLO_STRESS, REQUIRED_COLUMNS, STRESS_SCENARIOS
+from etf_feature_builder import ETFFeatureBuilder
+from monte_carlo_stress import ETFMonteCarloStress, ETFRiskModel, nav_history
+from semi_supervised_model import ETFSemiSupervisedModel
+from stress_scenarios import ETFStressTester
+
+NUM_ETFS = 200
+RECORDS_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'src', 'etf_data_test.json')
+
+
+def _universe(num_etfs: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({column: rng.random(num_etfs) for column in REQUIRED_COLUMNS
+                         if column != 'metadata.creationDate'})
+    data['metadata.creationDate'] = pd.Timestamp('2005-01-01') + pd.to_timedelta(rng.integers(0, 7000, num_etfs), 'D')
+    return data
+
+
+def _risk_model(num_etfs: int) -> ETFRiskModel:
+    rng = np.random.default_rng(1)
+    return ETFRiskModel(
+        correlations=rng.uniform(-0.3, 0.9, (num_etfs, 3)) * [1.0, 0.5, 0.5],
+        volatilities=rng.uniform(0.05, 0.4, num_etfs),
+        factors=MONTE_CARLO_STRESS['factors'],
+        factor_correlations=np.asarray(MONTE_CARLO_STRESS['factor_correlations']),
+        factor_volatilities=np.asarray(MONTE_CARLO_STRESS['factor_volatilities']))
+
+
+def test_monte_carlo_score_quantiles():
+    torch.manual_seed(0)
+    model = ETFSemiSupervisedModel(input_dim=25)
+    data = _universe(NUM_ETFS)
+
+    summary = ETFMonteCarloStress(MONTE_CARLO_STRESS).run(data, ETFFeatureBuilder(), model, torch.device('cpu'),
+                                                          _risk_model(NUM_ETFS))
+
+    assert list(summary.columns) == ['base_score', 'score_mean', 'score_q1', 'score_q5', 'score_q50',
+                                     'expected_shortfall']
+    assert (summary['expected_shortfall'] <= summary['score_q1'] + 1e-6).all()
+    assert (summary['score_q1'] <= summary['score_q5']).all() and (summary['score_q5'] <= summary['score_q50']).all()
+    assert (summary['score_q1'] < summary['score_q50']).any()
+
+
+def test_historical_replay_and_rate_scenario_from_records():
+    with open(RECORDS_PATH) as f:
+        records = json.load(f)
+    torch.manual_seed(0)
+    model = ETFSemiSupervisedModel(input_dim=25)
+    data = _universe(len(records))
+    risk_model = ETFRiskModel.from_records(records, MONTE_CARLO_STRESS)
+
+    summary = ETFMonteCarloStress(MONTE_CARLO_STRESS).run(
+        data, ETFFeatureBuilder(), model, torch.device('cpu'), risk_model,
+        history=nav_history(records), method='historical')
+    assert len(summary) == len(records) and summary.notna().all().all()
+
+    tester = ETFStressTester(STRESS_SCENARIOS, column_sensitivities=MONTE_CARLO_STRESS['column_sensitivities'])
+    results = tester.run_all_scenarios(data, ETFFeatureBuilder(), model, torch.device('cpu'), risk_model=risk_model)
+    neutral = tester.run_all_scenarios(data, ETFFeatureBuilder(), model, torch.device('cpu'))
+    assert not np.allclose(results['rate_increase'], neutral['rate_increase'])
@@ -0,0 +1,43 @@
+# tests/unit/utils/test_profiling.py
+import json
+import time
+
+from profiling import PipelineProfiler, profiling_requested
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+def test_stages_and_collapsed_stacks(tmp_path):
+    profiler = PipelineProfiler(enabled=True, output_dir=str(tmp_path), sample_interval=0.001).start()
+    with profiler.stage('pipeline'):
+        _busy(0.05)
+    with profiler.stage('training'):
+        _busy(0.1)
+    report = profiler.finish()
+
+    assert profiler.finish() is report
+    stages = json.load(open(report['files']['stages']))
+    assert stages['training']['wall_s'] >= 0.1
+    assert stages['training']['cpu_s'] > 0
+    assert stages['training']['samples'] > stages['pipeline']['samples'] > 0
+
+    lines = open(report['files']['collapsed_stacks']).read().splitlines()
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any(line.startswith('training;') and 'test_profiling.py:_busy' in line for line in lines)
+
+
+def test_disabled_profiler_is_inert(tmp_path, monkeypatch):
+    monkeypatch.delenv('ETF_PROFILE', raising=False)
+    profiler = PipelineProfiler.from_config({'PROFILING': {'output_dir': str(tmp_path)}}).start()
+    with profiler.stage('pipeline'):
+        pass
+
+    assert profiler.finish() is None
+    assert not list(tmp_path.iterdir())
+
+    monkeypatch.setenv('ETF_PROFILE', '1')
+    assert profiling_requested({})
@@ -0,0 +1,54 @@
+# tests/unit/utils/test_stress_batch.py
+import numpy as np
+import pandas as pd
+import torch
+
+from config import REQUIRED_COLUMNS
+from etf_feature_builder import ETFFeatureBuilder
+from semi_supervised_model import ETFSemiSupervisedModel
+from stress_scenarios import ETFStressTester
+
+NUM_ETFS = 500
+NUM_SCENARIOS = 8
+
+
+def _universe() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({column: rng.random(NUM_ETFS) for column in REQUIRED_COLUMNS
+                         if column != 'metadata.creationDate'})
+    data['fundamentals.liquidity.avgDailyVolume'] = rng.lognormal(14, 2, NUM_ETFS)
+    data['riskAnalysis.volatility.annualized'] = rng.uniform(0.05, 0.5, NUM_ETFS)
+    data['metadata.creationDate'] = pd.Timestamp('2005-01-01') + pd.to_timedelta(rng.integers(0, 7000, NUM_ETFS), 'D')
+    return data
+
+
+def _scenarios() -> list:
+    scenarios = [{'type': f'liquidity_{i}', 'shocks': {
+        'fundamentals.liquidity.avgDailyVolume': {'multiply': 0.2 + 0.05 * i},
+        'fundamentals.costs.ter': {'add': 0.002 * i}}} for i in range(NUM_SCENARIOS - 2)]
+    return scenarios + [{'type': 'market_crash', 'severity': 0.5}, {'type': 'liquidity_shock', 'factor': 0.3}]
+
+
+def _legacy_run(tester, base_data, feature_builder, model):
+    """Ancien chemin: copie de la frame, transform et forward par scénario"""
+    results = {}
+    model.eval()
+    for scenario in tester.scenarios:
+        features = feature_builder.transform(tester.apply_scenario(base_data.copy(), scenario))
+        with torch.no_grad():
+            results[scenario['type']] = model(torch.tensor(features.values, dtype=torch.float32)).numpy()
+    return results
+
+
+def test_batched_stress_matches_per_scenario_loop():
+    torch.manual_seed(0)
+    model = ETFSemiSupervisedModel(input_dim=25)
+    base_data = _universe()
+    tester = ETFStressTester(_scenarios())
+
+    legacy = _legacy_run(tester, base_data, ETFFeatureBuilder(), model)
+    batched = tester.run_all_scenarios(base_data, ETFFeatureBuilder(), model, torch.device('cpu'))
+
+    assert set(batched) == set(legacy)
+    for name, predictions in legacy.items():
+        np.testing.assert_allclose(np.asarray(batched[name]), predictions, atol=1e-5)
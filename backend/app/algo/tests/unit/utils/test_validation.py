@@ -0,0 +1,61 @@
+# tests/unit/utils/test_validation.py
+import numpy as np
+import pandas as pd
+
+from validation_utils import ETFValidator
+
+THRESHOLDS = {'volatility_bounds': {'low': 0.05, 'high': 0.3}, 'max_ter': 0.01}
+
+
+def _legacy_flags(ratings: pd.DataFrame, etf_data: pd.DataFrame) -> list:
+    """Ancien chemin: boucle .iloc ligne à ligne et dict par ETF"""
+    flags = []
+    for i in range(len(ratings)):
+        etf_row = etf_data.iloc[i]
+        flag = {'is_valid': True, 'reasons': []}
+        vol = etf_row.get('riskAnalysis.volatility.annualized')
+        if not (THRESHOLDS['volatility_bounds']['low'] <= vol <= THRESHOLDS['volatility_bounds']['high']):
+            flag['is_valid'] = False
+            flag['reasons'].append('volatility_out_of_bounds')
+        if etf_row.get('fundamentals.costs.ter') > THRESHOLDS['max_ter']:
+            flag['is_valid'] = False
+            flag['reasons'].append('ter_too_high')
+        flags.append(flag)
+    return flags
+
+
+def test_validation_flags_reason_codes():
+    ratings = pd.DataFrame({'normalized_score': [0.9, 0.5, 0.2, 0.7]})
+    etf_data = pd.DataFrame({
+        'riskAnalysis.volatility.annualized': [0.1, 0.5, np.nan, 0.2],
+        'fundamentals.costs.ter': [0.002, 0.02, 0.005, np.nan],
+    })
+    report = ETFValidator(THRESHOLDS).validate_ratings(ratings, etf_data)['validation_flags']
+
+    assert report['is_valid'].tolist() == [True, False, False, False]
+    assert report['num_invalid'] == 3
+    assert ETFValidator.decode_reasons(report['reason_code']) == [
+        [], ['volatility_out_of_bounds', 'ter_too_high'], ['missing_volatility_data'], ['missing_ter_data']]
+    assert report['reason_legend'][2] == 'volatility_out_of_bounds'
+
+
+def test_validation_flags_without_thresholds_or_columns():
+    ratings = pd.DataFrame({'normalized_score': [0.9, 0.5]})
+    flags = ETFValidator({'max_ter': 0.01})._generate_validation_flags(ratings, pd.DataFrame(index=range(2)))
+    assert flags['missing_ter_data'].all() and not flags['volatility_out_of_bounds'].any()
+    assert flags['reason_code'].dtype == np.uint8
+
+
+def test_validation_flags_match_row_loop():
+    rng = np.random.default_rng(0)
+    num_etfs = 2_000
+    ratings = pd.DataFrame({'normalized_score': rng.random(num_etfs)})
+    etf_data = pd.DataFrame({
+        'riskAnalysis.volatility.annualized': rng.uniform(0, 0.4, num_etfs),
+        'fundamentals.costs.ter': rng.uniform(0, 0.015, num_etfs),
+    })
+
+    flags = ETFValidator(THRESHOLDS).validate_ratings(ratings, etf_data)['validation_flags']
+    legacy = _legacy_flags(ratings, etf_data)
+    assert flags['is_valid'].tolist() == [flag['is_valid'] for flag in legacy]
+    assert ETFValidator.decode_reasons(flags['reason_code']) == [flag['reasons'] for flag in legacy]